@@ -0,0 +1,256 @@
+"""
+Headless command line entry point for imports, depreciation calculation and reports.
+
+Usage examples:
+    python cli.py setup
+    python cli.py import investments imports/ --workers 4 --incremental
+    python cli.py import portfolio portfolio.xlsx
+    python cli.py calculate --workers 4 --batch-size 500
+    python cli.py report depreciation --output depreciation_report.xlsx
+    python cli.py snapshot snapshots/2025-01 --format parquet --calculate
+    python cli.py report importance --snapshot snapshots/2025-01
+    python cli.py cube --by branch year --measure investment --filter importance=Critical
+    python cli.py bench --projects 2000 --years 10
+
+Nothing here imports tkinter or Flask, so it runs on servers without a display. Services are imported
+inside the commands to keep startup fast.
+"""
+import argparse
+import os
+import sys
+import time
+
+# Ensure the project root is in sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_CHOICES = ("projects", "classifications", "investments", "depreciation_years", "portfolio")
+
+
+def _setup(args):
+    from db.database_service import DatabaseService
+
+    print(DatabaseService().setup_database())
+    return 0
+
+
+def _import(args):
+    from services.import_service import ImportService
+
+    if args.kind == "portfolio":
+        # A workbook with one sheet per part, or one file per part in import order
+        source = args.paths[0] if len(args.paths) == 1 else dict(zip(IMPORT_CHOICES, args.paths))
+        report = ImportService.import_portfolio(source, chunk_size=args.chunk_size, rejections_file=args.rejections)
+        print(f"[INFO] Imported rows: {report['rows']}, rejected: {report['rejected']}")
+        return 0
+
+    source = args.paths[0] if len(args.paths) == 1 else args.paths
+    reports = ImportService.import_files(
+        source,
+        args.kind,
+        max_workers=args.workers,
+        chunk_size=args.chunk_size,
+        incremental=args.incremental,
+        rejections_file=args.rejections,
+    )
+    failed = [report for report in reports if report["error"]]
+    print(f"[INFO] {len(reports)} files processed, {len(failed)} failed.")
+    return 1 if failed else 0
+
+
+def _calculate(args):
+    from services.project_service import ProjectService
+
+    if args.in_place:
+        ProjectService.calculate_depreciation_for_all_projects()
+        return 0
+
+    parameters = {"source": "cli", "workers": args.workers, "batch_size": args.batch_size}
+    run_id = ProjectService.calculate_depreciation_run(
+        parameters=parameters,
+        publish=not args.no_publish,
+        batch_size=args.batch_size,
+        workers=args.workers,
+    )
+    print(f"[INFO] Calculation run {run_id} finished.")
+    return 0
+
+
+def _report(args):
+    from services.project_service import ProjectService
+
+    if args.snapshot:
+        from services.snapshot_service import SnapshotService
+
+        snapshot = SnapshotService.open_snapshot(args.snapshot)
+        if args.kind == "depreciation":
+            SnapshotService.create_investment_depreciation_report(snapshot, args.output or "depreciation_report.xlsx")
+        else:
+            SnapshotService.group_projects_by_importance(snapshot, args.output or "importance_grouped_data.xlsx")
+        return 0
+
+    if args.kind == "depreciation":
+        ProjectService.create_investment_depreciation_report(args.output or "depreciation_report.xlsx", by_branch=args.by_branch)
+    else:
+        ProjectService.group_projects_by_importance(args.output or "importance_grouped_data.xlsx", by_branch=args.by_branch)
+    return 0
+
+
+def _snapshot(args):
+    from services.snapshot_service import SnapshotService
+
+    manifest = SnapshotService.export_snapshot(args.path, file_format=args.format)
+    if args.calculate:
+        # Stored in the snapshot, so later reports from it need not recalculate
+        SnapshotService.calculate_depreciations(SnapshotService.open_snapshot(args.path))
+    print(f"[INFO] Snapshot written to {args.path}: {manifest['tables']}")
+    return 0
+
+
+def _filter_value(value):
+    # Years and classification types are numbers; the other cube labels are text
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+def _cube(args):
+    from services.cube_service import CubeService
+
+    filters = {}
+    for item in args.filter:
+        dimension, _, value = item.partition("=")
+        filters.setdefault(dimension, []).append(_filter_value(value))
+
+    cube = CubeService.get_cube()
+    if not args.by:
+        print(f"{cube.total(args.measure, **filters):,.2f}")
+        return 0
+
+    for labels, total in sorted(cube.rollup(args.by, args.measure, **filters).items(), key=lambda item: str(item[0])):
+        labels = labels if isinstance(labels, tuple) else (labels,)
+        print("\t".join(str(label) for label in labels) + f"\t{total:,.2f}")
+    return 0
+
+
+def _bench(args):
+    """
+    Load a synthetic portfolio and time the import, calculation and report paths.
+    """
+    import pandas as pd
+
+    from db.database_service import DatabaseService
+    from services.project_service import ProjectService
+
+    db_service = DatabaseService()
+    db_service.setup_database()
+    db_service.save_depreciation_schedule(20, None, "Bench 20 %")
+    db_service.save_depreciation_schedule(None, 5, "Bench 5 years")
+    method_ids = [row["depreciation_id"] for row in db_service.execute_query(
+        "SELECT depreciation_id FROM depreciation_schedules ORDER BY depreciation_id", fetch=True
+    )]
+
+    project_ids = [f"BENCH-{number:06d}" for number in range(args.projects)]
+    years = [str(args.first_year + offset) for offset in range(args.years)]
+    projects = pd.DataFrame({
+        "project_id": project_ids,
+        "branch": "Bench",
+        "operations": "Bench",
+        "description": "Synthetic bench project",
+        "depreciation_method": [method_ids[number % len(method_ids)] for number in range(args.projects)],
+    })
+    investments = pd.DataFrame({"project_id": project_ids, **{year: 1000.0 for year in years}})
+    depreciation_years = pd.DataFrame({"project_id": project_ids, "depreciation_years": years[0]})
+
+    timings = {}
+    started = time.perf_counter()
+    with db_service.transaction():
+        db_service.save_projects_batch(ProjectService.prepare_project_batch(projects))
+        db_service.save_investments_batch(ProjectService.prepare_investment_batch(investments))
+        db_service.save_depreciation_years_batch(ProjectService.prepare_depreciation_year_batch(depreciation_years))
+    timings["import"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ProjectService.calculate_depreciation_run(parameters={"source": "bench"}, batch_size=args.batch_size, workers=args.workers)
+    timings["calculate"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    report_rows = sum(len(batch) for batch in db_service.iter_depreciation_reports(batch_size=args.batch_size))
+    timings["report"] = time.perf_counter() - started
+
+    from services.cube_service import CubeService
+
+    # The run already built the cube, so this only measures the rollup itself
+    started = time.perf_counter()
+    CubeService.get_cube(db_service).rollup(("importance", "branch", "year"))
+    timings["cube"] = time.perf_counter() - started
+
+    print(f"[INFO] Bench with {args.projects} projects x {args.years} years ({report_rows} report rows):")
+    for stage, seconds in timings.items():
+        print(f"[INFO]   {stage:<10} {seconds:8.2f}s")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Depreciation simulation without the GUI.")
+    parser.add_argument("--db-url", help="Database URL; overrides DATABASE_URL, e.g. sqlite:///simulation.db")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    setup_parser = subparsers.add_parser("setup", help="Create the database tables.")
+    setup_parser.set_defaults(handler=_setup)
+
+    import_parser = subparsers.add_parser("import", help="Import Excel, CSV or Parquet files.")
+    import_parser.add_argument("kind", choices=IMPORT_CHOICES)
+    import_parser.add_argument("paths", nargs="+", help="Files, directories or glob patterns; for 'portfolio' a workbook or four files in import order.")
+    import_parser.add_argument("--workers", type=int, default=None, help="Number of parser processes.")
+    import_parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per database batch.")
+    import_parser.add_argument("--incremental", action="store_true", help="Skip unchanged files and write only changed rows.")
+    import_parser.add_argument("--rejections", help="Write rejected rows to this .csv or .xlsx file.")
+    import_parser.set_defaults(handler=_import)
+
+    calculate_parser = subparsers.add_parser("calculate", help="Calculate depreciation for all projects.")
+    calculate_parser.add_argument("--workers", type=int, default=1, help="Number of projects calculated concurrently.")
+    calculate_parser.add_argument("--batch-size", type=int, default=200, help="Projects whose results are written per statement.")
+    calculate_parser.add_argument("--no-publish", action="store_true", help="Record the run without making it the current results.")
+    calculate_parser.add_argument("--in-place", action="store_true", help="Overwrite the current results project by project instead of recording a run.")
+    calculate_parser.set_defaults(handler=_calculate)
+
+    report_parser = subparsers.add_parser("report", help="Write an Excel report.")
+    report_parser.add_argument("kind", choices=("depreciation", "importance"))
+    report_parser.add_argument("--output", help="Output workbook path.")
+    report_parser.add_argument("--by-branch", action="store_true", help="Write one worksheet per branch.")
+    report_parser.add_argument("--snapshot", help="Read from a portfolio snapshot directory instead of the database.")
+    report_parser.set_defaults(handler=_report)
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="Export a portfolio snapshot for offline calculation and reports.")
+    snapshot_parser.add_argument("path", help="Directory the snapshot files are written to.")
+    snapshot_parser.add_argument("--format", choices=("arrow", "parquet"), default="arrow", help="Arrow IPC or Parquet files.")
+    snapshot_parser.add_argument("--calculate", action="store_true", help="Also calculate depreciation from the snapshot and store it there.")
+    snapshot_parser.set_defaults(handler=_snapshot)
+
+    cube_parser = subparsers.add_parser("cube", help="Query totals from the precomputed portfolio cube.")
+    cube_parser.add_argument("--by", nargs="*", default=[], choices=("importance", "type", "branch", "operations", "year"), help="Dimensions to roll up by.")
+    cube_parser.add_argument("--measure", choices=("depreciation", "investment"), default="depreciation")
+    cube_parser.add_argument("--filter", action="append", default=[], metavar="DIMENSION=VALUE", help="Keep only matching cells; may be repeated.")
+    cube_parser.set_defaults(handler=_cube)
+
+    bench_parser = subparsers.add_parser("bench", help="Time import, calculation and reporting on a synthetic portfolio.")
+    bench_parser.add_argument("--projects", type=int, default=1000)
+    bench_parser.add_argument("--years", type=int, default=10)
+    bench_parser.add_argument("--first-year", type=int, default=2020)
+    bench_parser.add_argument("--workers", type=int, default=1)
+    bench_parser.add_argument("--batch-size", type=int, default=200)
+    bench_parser.set_defaults(handler=_bench, db_url_default="sqlite:///:memory:")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # The bench runs against a throwaway in-memory database unless --db-url is given
+    db_url = args.db_url or getattr(args, "db_url_default", None)
+    if db_url:
+        # DatabaseService reads DATABASE_URL when it is created
+        os.environ["DATABASE_URL"] = db_url
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
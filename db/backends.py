@@ -0,0 +1,224 @@
+import re
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import lru_cache
+
+# Decimal values coming from Postgres rows or user input are stored as REAL in SQLite
+sqlite3.register_adapter(Decimal, float)
+
+
+class DatabaseBackend:
+    """
+    Base class for storage engines used by DatabaseService.
+    Queries are written in the Postgres dialect with %s placeholders; backends translate them as needed.
+    """
+    name = None
+    # Exception types signalling a broken connection rather than a failed statement
+    interface_errors = ()
+
+    def connect(self):
+        """
+        Open a connection as a context manager that commits on success and rolls back on error.
+        """
+        raise NotImplementedError
+
+    def execute(self, cur, query, params=None):
+        """
+        Execute a single statement on a cursor.
+        """
+        raise NotImplementedError
+
+    def execute_values(self, cur, query, rows, template=None):
+        """
+        Execute a statement containing a 'VALUES %s' placeholder for many rows at once.
+        """
+        raise NotImplementedError
+
+    def execute_script(self, cur, script):
+        """
+        Execute several semicolon-separated statements.
+        """
+        raise NotImplementedError
+
+    def begin_consistent_read(self, cur):
+        """
+        Start a read-only transaction in which every query sees the same snapshot of the data.
+        """
+        raise NotImplementedError
+
+    def iter_batches(self, conn, query, params=None, batch_size=1000):
+        """
+        Execute a query and yield its rows in lists of at most batch_size without materializing the full result.
+        """
+        raise NotImplementedError
+
+
+class PostgresBackend(DatabaseBackend):
+    name = "postgres"
+
+    def __init__(self, db_url):
+        import psycopg2
+        self.db_url = db_url
+        self.interface_errors = (psycopg2.InterfaceError,)
+
+    @contextmanager
+    def connect(self):
+        import psycopg2
+        from psycopg2.extras import RealDictCursor
+        conn = psycopg2.connect(self.db_url, cursor_factory=RealDictCursor)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def execute(self, cur, query, params=None):
+        cur.execute(query, params)
+
+    def execute_values(self, cur, query, rows, template=None):
+        # Use psycopg2's execute_values for efficient batch inserts
+        from psycopg2.extras import execute_values
+        execute_values(cur, query, rows, template=template)
+
+    def execute_script(self, cur, script):
+        cur.execute(script)
+
+    def begin_consistent_read(self, cur):
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+
+    def iter_batches(self, conn, query, params=None, batch_size=1000):
+        # A named cursor is a server-side cursor: rows are transferred batch by batch
+        cur = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cur.itersize = batch_size
+        try:
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cur.close()
+
+
+def _dict_row_factory(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+@lru_cache(maxsize=256)
+def _translate_sqlite(query, values_width=None):
+    """
+    Translate a Postgres-dialect query into SQLite syntax.
+    :param query: The query text.
+    :param values_width: Number of columns substituted for a 'VALUES %s' placeholder, if any.
+    :return: The translated query.
+    """
+    if values_width is not None:
+        # "(VALUES %s) AS data(a, b, c)" has no SQLite equivalent; select one row of named parameters instead
+        def derived_table(match):
+            columns = [column.strip() for column in match.group(2).split(",")]
+            selected = ", ".join(f"%s AS {column}" for column in columns)
+            return f"(SELECT {selected}) AS {match.group(1)}"
+
+        query = re.sub(r"\(\s*VALUES\s+%s\s*\)\s+AS\s+(\w+)\s*\(([^)]*)\)", derived_table, query, flags=re.IGNORECASE)
+        row_placeholder = "(" + ", ".join(["%s"] * values_width) + ")"
+        query = re.sub(r"VALUES\s+%s", f"VALUES {row_placeholder}", query, flags=re.IGNORECASE)
+
+    query = re.sub(r"\bSERIAL\s+PRIMARY\s+KEY\b", "INTEGER PRIMARY KEY AUTOINCREMENT", query, flags=re.IGNORECASE)
+    query = re.sub(r"\bBYTEA\b", "BLOB", query, flags=re.IGNORECASE)
+    # SQLite's LIKE is already case-insensitive for ASCII text
+    query = re.sub(r"\bILIKE\b", "LIKE", query, flags=re.IGNORECASE)
+    return query.replace("%s", "?")
+
+
+class SQLiteBackend(DatabaseBackend):
+    """
+    Embedded SQLite engine for offline simulations and benchmarks.
+    In-memory databases keep a single shared connection for the lifetime of the backend.
+    """
+    name = "sqlite"
+    interface_errors = (sqlite3.InterfaceError, sqlite3.ProgrammingError)
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._shared_conn = self._open() if path == ":memory:" else None
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = _dict_row_factory
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    @contextmanager
+    def connect(self):
+        with self._lock:
+            conn = self._shared_conn or self._open()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                if conn is not self._shared_conn:
+                    conn.close()
+
+    def execute(self, cur, query, params=None):
+        cur.execute(_translate_sqlite(query), tuple(params) if params else ())
+
+    def execute_values(self, cur, query, rows, template=None):
+        rows = [tuple(row) for row in rows]
+        if not rows:
+            return
+        cur.executemany(_translate_sqlite(query, len(rows[0])), rows)
+
+    def execute_script(self, cur, script):
+        cur.executescript(_translate_sqlite(script))
+
+    def iter_batches(self, conn, query, params=None, batch_size=1000):
+        cur = conn.cursor()
+        try:
+            self.execute(cur, query, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cur.close()
+
+    def begin_consistent_read(self, cur):
+        # A deferred transaction pins the read snapshot at its first SELECT
+        if not cur.connection.in_transaction:
+            cur.execute("BEGIN")
+
+
+# Backends are shared per URL so that in-memory SQLite databases survive between DatabaseService instances
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(db_url):
+    """
+    Return the storage backend for a database URL.
+    'sqlite:///path/to/file.db' and 'sqlite:///:memory:' select SQLite, anything else is treated as Postgres.
+    :param db_url: The database URL.
+    :return: A DatabaseBackend instance.
+    """
+    with _backends_lock:
+        backend = _backends.get(db_url)
+        if backend is None:
+            if db_url.startswith("sqlite:"):
+                path = re.sub(r"^sqlite:(//)?/?", "", db_url) or ":memory:"
+                backend = SQLiteBackend(path)
+            else:
+                backend = PostgresBackend(db_url)
+            _backends[db_url] = backend
+        return backend
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Sentinel returned by TTLCache.get when a key is missing or expired
+MISSING = object()
+
+
+class TTLCache:
+    """
+    A size-bounded LRU cache whose entries expire after a fixed time-to-live.
+    Shared between DatabaseService instances, so all access is guarded by a lock.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        """
+        :param maxsize: Maximum number of entries kept before the least recently used one is evicted.
+        :param ttl: Time-to-live of an entry in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up a key, counting a hit or a miss.
+        :param key: The cache key.
+        :return: The cached value, or MISSING if the key is absent or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entries when the cache is full.
+        :param key: The cache key.
+        :param value: The value to cache.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for a key, calling loader() and caching its result on a miss.
+        :param key: The cache key.
+        :param loader: A callable producing the value when it is not cached.
+        :return: The cached or freshly loaded value.
+        """
+        value = self.get(key)
+        if value is MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=None):
+        """
+        Remove a single key, or every entry when no key is given.
+        :param key: The cache key to remove.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """
+        :return: A dictionary with hit and miss counters and the current size.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+    def reset_stats(self):
+        """
+        Reset the hit and miss counters.
+        """
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+class DataVersions:
+    """
+    Per-table version counters, bumped after every committed write made through DatabaseService.
+    Caches of derived data key their entries on the versions of the tables they read, so an entry is
+    rebuilt only after one of those tables changed. Writes from other processes are not seen; the
+    caches' time-to-live bounds how long such changes can go unnoticed.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._key_versions = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def bump(self, *tables):
+        """
+        Record a write to one or more tables.
+        """
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def bump_keys(self, table, keys=None):
+        """
+        Record a write to individual rows of a table, e.g. single projects.
+        :param keys: The row keys written, or None when any row may have changed.
+        """
+        with self._lock:
+            if keys is None:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                return
+            for key in keys:
+                self._key_versions[(table, key)] = self._key_versions.get((table, key), 0) + 1
+
+    def get_key(self, table, key):
+        """
+        :return: A tuple that changes whenever bump_keys recorded a write to the row.
+        """
+        with self._lock:
+            return self._generations.get(table, 0), self._key_versions.get((table, key), 0)
+
+    def get(self, *tables):
+        """
+        :return: A tuple with the current version of each table, usable as part of a cache key.
+        """
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def snapshot(self):
+        """
+        :return: A dictionary with the versions of every table written so far.
+        """
+        with self._lock:
+            return dict(self._versions)
+
+
+# Shared by every DatabaseService instance in the process
+data_versions = DataVersions()
@@ -1,16 +1,399 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from contextlib import contextmanager
+from decimal import Decimal
+import json
+import re
 from dotenv import load_dotenv
 import os
+from db.backends import get_backend
+from db.cache import TTLCache, MISSING, data_versions
+from db.result_storage import RESULT_STORAGE, CURRENT_RUN_ID, pack_values, to_year_arrays, group_year_arrays, expand_year_arrays
 
 # Load environment variables
 load_dotenv()
 
+CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.getenv("DB_CACHE_TTL", "300"))
+
+# Tables written by a statement, used to bump their data versions
+WRITTEN_TABLE_PATTERN = re.compile(r"\b(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)\s+(\w+)", re.IGNORECASE)
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS depreciation_schedules (
+        depreciation_id SERIAL PRIMARY KEY,
+        depreciation_percentage NUMERIC,
+        depreciation_years INT,
+        method_description TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS projects (
+        project_id TEXT PRIMARY KEY,
+        branch TEXT,
+        operations TEXT,
+        description TEXT,
+        depreciation_method INT REFERENCES depreciation_schedules(depreciation_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS project_classifications (
+        project_id TEXT PRIMARY KEY REFERENCES projects(project_id),
+        importance INT,
+        type INT
+    );
+
+    CREATE TABLE IF NOT EXISTS classification_descriptions (
+        classification_id INT PRIMARY KEY,
+        description TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS investments (
+        project_id TEXT REFERENCES projects(project_id),
+        year INT,
+        investment_amount NUMERIC,
+        depreciation_start_year INT,
+        PRIMARY KEY (project_id, year)
+    );
+
+    CREATE TABLE IF NOT EXISTS calculated_depreciations (
+        project_id TEXT REFERENCES projects(project_id),
+        year INT,
+        depreciation_value NUMERIC,
+        remaining_value NUMERIC,
+        PRIMARY KEY (project_id, year)
+    );
+
+    CREATE TABLE IF NOT EXISTS calculated_depreciation_arrays (
+        project_id TEXT REFERENCES projects(project_id),
+        run_id INT NOT NULL DEFAULT 0,
+        start_year INT,
+        depreciation_values BYTEA,
+        remaining_values BYTEA,
+        PRIMARY KEY (project_id, run_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS calculation_runs (
+        run_id SERIAL PRIMARY KEY,
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP,
+        duration_seconds NUMERIC,
+        project_count INT,
+        error_count INT,
+        parameters TEXT,
+        status TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS calculation_run_results (
+        run_id INT REFERENCES calculation_runs(run_id),
+        project_id TEXT REFERENCES projects(project_id),
+        year INT,
+        depreciation_value NUMERIC,
+        remaining_value NUMERIC,
+        PRIMARY KEY (run_id, project_id, year)
+    );
+
+    CREATE TABLE IF NOT EXISTS import_hashes (
+        kind TEXT,
+        scope TEXT,
+        item TEXT,
+        content_hash TEXT,
+        imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (kind, scope, item)
+    );
+"""
+
+# Every table of the schema
+SCHEMA_TABLES = tuple(re.findall(r"CREATE TABLE IF NOT EXISTS (\w+)", SCHEMA_SQL))
+
+# Current state of each import kind, read in bulk to diff imports against; the key columns come first
+IMPORT_STATE_QUERIES = {
+    "projects": ("SELECT project_id, branch, operations, description, depreciation_method FROM projects", 1),
+    "classifications": ("SELECT project_id, importance, type FROM project_classifications", 1),
+    "investments": ("SELECT project_id, year, investment_amount FROM investments", 2),
+    "depreciation_years": ("SELECT project_id, year, depreciation_start_year FROM investments", 2),
+}
+
+# Year-level differences between two calculation runs; parameters are (base_run_id, other_run_id, tolerance, tolerance)
+RUN_DIFF_SQL = """
+    SELECT COALESCE(base.project_id, other.project_id) AS project_id,
+           COALESCE(base.year, other.year) AS year,
+           base.depreciation_value AS base_depreciation_value,
+           other.depreciation_value AS other_depreciation_value,
+           base.remaining_value AS base_remaining_value,
+           other.remaining_value AS other_remaining_value
+    FROM (SELECT project_id, year, depreciation_value, remaining_value FROM calculation_run_results WHERE run_id = %s) AS base
+    FULL OUTER JOIN (SELECT project_id, year, depreciation_value, remaining_value FROM calculation_run_results WHERE run_id = %s) AS other
+        ON base.project_id = other.project_id AND base.year = other.year
+    WHERE base.project_id IS NULL
+       OR other.project_id IS NULL
+       OR (base.depreciation_value IS NULL) <> (other.depreciation_value IS NULL)
+       OR (base.remaining_value IS NULL) <> (other.remaining_value IS NULL)
+       OR ABS(base.depreciation_value - other.depreciation_value) > %s
+       OR ABS(base.remaining_value - other.remaining_value) > %s
+"""
+
+# Investments and depreciations per (project_id, year); the filters and branch limit are used for keyset paging.
+# The NULL placeholders are cast because Postgres types a bare NULL inside a sub-select as text.
+REPORT_ROWS_SQL = """
+    SELECT project_id, year,
+           COALESCE(SUM(investment_amount), 0) AS investment_amount,
+           COALESCE(SUM(depreciation_value), 0) AS depreciation_value
+    FROM (
+        SELECT * FROM (
+            SELECT project_id, year, investment_amount, CAST(NULL AS NUMERIC) AS depreciation_value
+            FROM investments
+            {investments_filter}
+            {branch_limit}
+        ) AS investment_rows
+        UNION ALL
+        SELECT * FROM (
+            SELECT project_id, year, CAST(NULL AS NUMERIC) AS investment_amount, depreciation_value
+            FROM calculated_depreciations
+            {depreciations_filter}
+            {branch_limit}
+        ) AS depreciation_rows
+    ) AS combined
+    GROUP BY project_id, year
+"""
+
+# Investment and depreciation totals per project; {year_filter} is applied inside both branches so rows after
+# the cut-off year are never aggregated
+REPORT_TOTALS_SQL = """
+    SELECT projects.project_id, projects.branch, projects.operations, projects.description,
+           COALESCE(totals.investment_amount, 0) AS investment_amount,
+           COALESCE(totals.depreciation_value, 0) AS depreciation_value
+    FROM projects
+    LEFT JOIN (
+        SELECT project_id,
+               SUM(investment_amount) AS investment_amount,
+               SUM(depreciation_value) AS depreciation_value
+        FROM (
+            SELECT project_id, investment_amount, NULL AS depreciation_value
+            FROM investments
+            {year_filter}
+            UNION ALL
+            SELECT project_id, NULL AS investment_amount, depreciation_value
+            FROM calculated_depreciations
+            {year_filter}
+        ) AS combined
+        GROUP BY project_id
+    ) AS totals ON totals.project_id = projects.project_id
+    ORDER BY projects.project_id
+"""
+
+# Expressions of the grouping columns available to GROUPED_REPORT_SQL
+REPORT_KEY_EXPRESSIONS = {
+    "importance": "classification_descriptions.description",
+    "branch": "projects.branch",
+    "operations": "projects.operations",
+    "description": "projects.description",
+}
+
+# Grouped reports: the grouping columns and the table and column summed per year
+GROUPED_REPORTS = {
+    "depreciation": (("importance", "branch", "operations"), "calculated_depreciations", "depreciation_value"),
+    "importance": (("importance", "branch", "operations", "description"), "investments", "investment_amount"),
+}
+
+# Rows of a grouped report. Rows with a missing grouping value are left out, as the pandas reports drop
+# them when grouping.
+GROUPED_REPORT_ROWS_SQL = """
+    FROM projects
+    JOIN project_classifications ON project_classifications.project_id = projects.project_id
+    JOIN classification_descriptions ON classification_descriptions.classification_id = project_classifications.importance
+    JOIN {table} AS data ON data.project_id = projects.project_id
+    WHERE {not_null}
+"""
+
+# Yearly sums per group, sorted so a report writer can pivot them while streaming
+GROUPED_REPORT_SQL = """
+    SELECT {select_keys}, data.year, SUM(data.{value_column}) AS value
+""" + GROUPED_REPORT_ROWS_SQL + """
+    GROUP BY {group_keys}, data.year
+    ORDER BY {order_keys}, data.year
+"""
+
+# The year columns of a grouped report: only years of rows that are part of the report
+GROUPED_REPORT_YEARS_SQL = """
+    SELECT DISTINCT data.year
+""" + GROUPED_REPORT_ROWS_SQL + """
+    AND data.year IS NOT NULL
+    ORDER BY data.year
+"""
+
+# Columns the paginated project search may return
+PROJECT_SEARCH_FIELDS = ("project_id", "branch", "operations", "description", "depreciation_method")
+
+# Calculated depreciations for export, with optional project dimensions; {source} is the result table
+# or the compact arrays, {dimensions} the extra columns and {where} the filters
+DEPRECIATION_EXPORT_SQL = """
+    SELECT {columns}{dimensions}
+    FROM {source} AS data
+    JOIN projects ON projects.project_id = data.project_id
+    LEFT JOIN project_classifications ON project_classifications.project_id = data.project_id
+    LEFT JOIN classification_descriptions ON classification_descriptions.classification_id = project_classifications.importance
+    WHERE {where}
+    ORDER BY {order}
+"""
+
+EXPORT_DIMENSION_COLUMNS = {
+    "branch": "projects.branch",
+    "operations": "projects.operations",
+    "importance": "classification_descriptions.description",
+    "type": "project_classifications.type",
+}
+
+
+def _project_search_filter(project_id=None, branch=None, operations=None, description=None):
+    """
+    Build the WHERE conditions shared by the project searches.
+    :return: A tuple (conditions, params) where conditions is a list of SQL fragments.
+    """
+    conditions, params = [], []
+    if project_id:
+        conditions.append("project_id = %s")
+        params.append(project_id)
+    for column, value in (("branch", branch), ("operations", operations), ("description", description)):
+        if value:
+            conditions.append(f"{column} ILIKE %s")
+            params.append(f"%{value}%")
+    return conditions, params
+
+
+def _combine_report_rows(investments, depreciations):
+    """
+    Sum investment and depreciation rows per (project_id, year) like the report SQL does.
+    :return: A list of dictionaries sorted by project_id and year.
+    """
+    combined = {}
+    for row in investments:
+        entry = combined.setdefault((row['project_id'], row['year']), {"investment_amount": 0, "depreciation_value": 0})
+        entry["investment_amount"] += row['investment_amount'] or 0
+    for row in depreciations:
+        entry = combined.setdefault((row['project_id'], row['year']), {"investment_amount": 0, "depreciation_value": 0})
+        entry["depreciation_value"] += row['depreciation_value'] or 0
+    return [{"project_id": project_id, "year": year, **values} for (project_id, year), values in sorted(combined.items())]
+
+
+def _rechunk(pages, batch_size):
+    """
+    Re-slice an iterable of row lists into lists of exactly batch_size rows (the last may be shorter).
+    """
+    buffer = []
+    for page in pages:
+        buffer.extend(page)
+        while len(buffer) >= batch_size:
+            yield buffer[:batch_size]
+            buffer = buffer[batch_size:]
+    if buffer:
+        yield buffer
+
+
+def _report_records(batch):
+    """
+    Convert a batch of report tuples to a NumPy record array.
+    """
+    import numpy as np
+    return np.rec.fromrecords(
+        [(project_id, year, float(investment), float(depreciation)) for project_id, year, investment, depreciation in batch],
+        dtype=[("project_id", object), ("year", "i4"), ("investment_amount", "f8"), ("depreciation_value", "f8")],
+    )
+
+
 class DatabaseService:
-    def __init__(self):
-        self.db_url = os.getenv("DATABASE_URL")
+    # Read-through caches shared by all DatabaseService instances
+    project_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+    method_details_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+    depreciation_methods_cache = TTLCache(maxsize=1, ttl=CACHE_TTL)
+
+    def __init__(self, db_url=None, result_storage=None):
+        """
+        :param db_url: Database URL; defaults to DATABASE_URL. Use 'sqlite:///file.db' or 'sqlite:///:memory:' for the embedded engine.
+        :param result_storage: 'rows' or 'compact'; defaults to DEPRECIATION_RESULT_STORAGE.
+        """
+        self.db_url = db_url or os.getenv("DATABASE_URL")
         if not self.db_url:
             raise ValueError("DATABASE_URL is not set in environment variables.")
+        self.backend = get_backend(self.db_url)
+        self.result_storage = result_storage or RESULT_STORAGE
+        if self.result_storage not in ("rows", "compact"):
+            raise ValueError(f"Unknown depreciation result storage: {self.result_storage}")
+        self._active_cursor = None
+        self._pending_writes = set()
+        # Project IDs whose cached rows are dropped at the commit; None drops every project
+        self._pending_projects = set()
+
+    def _written(self, *tables):
+        """
+        Bump the data versions of written tables; inside transaction() this waits until the commit.
+        """
+        if self._active_cursor is not None:
+            self._pending_writes.update(tables)
+        else:
+            data_versions.bump(*tables)
+
+    def _written_by(self, query):
+        # "ON CONFLICT ... DO UPDATE SET" is not a write to a table called SET
+        tables = {table.lower() for table in WRITTEN_TABLE_PATTERN.findall(query)} - {"set"}
+        if tables:
+            self._written(*tables)
+
+    @contextmanager
+    def _cursor(self):
+        """
+        Yield a cursor. Inside transaction() the transaction's cursor is reused; otherwise a new
+        connection is opened and committed when the block exits cleanly.
+        """
+        if self._active_cursor is not None:
+            yield self._active_cursor
+            return
+
+        with self.backend.connect() as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run every query issued through this DatabaseService inside one connection and transaction.
+        The transaction commits when the block exits cleanly and rolls back on error.
+        """
+        if self._active_cursor is not None:
+            # Nested blocks join the outer transaction
+            yield self
+            return
+
+        self._pending_writes = set()
+        self._pending_projects = set()
+        with self._cursor() as cur:
+            self._active_cursor = cur
+            try:
+                yield self
+            finally:
+                self._active_cursor = None
+
+        # Only reached after the commit; a rolled back transaction leaves the versions and caches unchanged
+        if self._pending_writes:
+            data_versions.bump(*self._pending_writes)
+            self._pending_writes = set()
+        if self._pending_projects is None or self._pending_projects:
+            pending, self._pending_projects = self._pending_projects, set()
+            self._invalidate_projects(None if pending is None else sorted(pending))
+
+    def fetch_consistent(self, queries):
+        """
+        Run several read queries against one consistent snapshot of the database.
+        :param queries: A dictionary mapping names to SQL queries.
+        :return: A dictionary mapping the same names to lists of result rows.
+        """
+        results = {}
+        with self._cursor() as cur:
+            self.backend.begin_consistent_read(cur)
+            for name, query in queries.items():
+                self.backend.execute(cur, query)
+                results[name] = cur.fetchall()
+                print(f"[DEBUG] Read {len(results[name])} rows for {name}.")
+        return results
 
     def execute_query(self, query, params=None, fetch=False):
         """
@@ -24,15 +407,15 @@ class DatabaseService:
         print(f"With parameters: {params}")
         try:
             # Create a new connection for each query
-            with psycopg2.connect(self.db_url, cursor_factory=RealDictCursor) as conn:
-                with conn.cursor() as cur:
-                    cur.execute(query, params)
-                    if fetch:
-                        results = cur.fetchall()
-                        print(f"Query results: {results}")
-                        return results
-                    conn.commit()
-        except psycopg2.InterfaceError as e:
+            with self._cursor() as cur:
+                self.backend.execute(cur, query, params)
+                if fetch:
+                    results = cur.fetchall()
+                    print(f"Query results: {results}")
+            self._written_by(query)
+            if fetch:
+                return results
+        except self.backend.interface_errors as e:
             print(f"[ERROR] Database connection issue: {e}")
             raise
         except Exception as e:
@@ -44,52 +427,9 @@ class DatabaseService:
         Set up the database by creating new tables only if they do not already exist.
         """
         try:
-            conn = psycopg2.connect(self.db_url)
-            cur = conn.cursor()
-
             # Create tables only if they do not already exist
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS depreciation_schedules (
-                    depreciation_id SERIAL PRIMARY KEY,
-                    depreciation_percentage NUMERIC,
-                    depreciation_years INT,
-                    method_description TEXT
-                );
-
-                CREATE TABLE IF NOT EXISTS projects (
-                    project_id TEXT PRIMARY KEY,
-                    branch TEXT,
-                    operations TEXT,
-                    description TEXT,
-                    depreciation_method INT REFERENCES depreciation_schedules(depreciation_id)
-                );
-
-                CREATE TABLE IF NOT EXISTS project_classifications (
-                    project_id TEXT PRIMARY KEY REFERENCES projects(project_id),
-                    importance INT,
-                    type INT
-                );
-
-                CREATE TABLE IF NOT EXISTS investments (
-                    project_id TEXT REFERENCES projects(project_id),
-                    year INT,
-                    investment_amount NUMERIC,
-                    depreciation_start_year INT,
-                    PRIMARY KEY (project_id, year)
-                );
-
-                CREATE TABLE IF NOT EXISTS calculated_depreciations (
-                    project_id TEXT REFERENCES projects(project_id),
-                    year INT,
-                    depreciation_value NUMERIC,
-                    remaining_value NUMERIC,
-                    PRIMARY KEY (project_id, year)
-                );
-            """)
-
-            conn.commit()
-            cur.close()
-            conn.close()
+            with self._cursor() as cur:
+                self.backend.execute_script(cur, SCHEMA_SQL)
 
             return "Database setup completed successfully!"
 
@@ -135,6 +475,7 @@ class DatabaseService:
         """
         params = (project.project_id, project.branch, project.operations, project.description, project.depreciation_method)
         self.execute_query(query, params)
+        self.invalidate_project_cache([project.project_id])
 
     def save_investments(self, project_id, investments):
         """
@@ -170,6 +511,29 @@ class DatabaseService:
             params = (project_id, year, amount, start_year)
             self.execute_query(query, params)
 
+    def save_investment_details_batch(self, project_id, investments):
+        """
+        Save or update all investment details of a project in one statement and one transaction.
+        :param project_id: The ID of the project.
+        :param investments: A dictionary where the key is the year and the value is a tuple of (investment_amount, depreciation_start_year).
+        """
+        query = """
+            INSERT INTO investments (project_id, year, investment_amount, depreciation_start_year)
+            VALUES %s
+            ON CONFLICT (project_id, year) DO UPDATE
+            SET investment_amount = EXCLUDED.investment_amount,
+                depreciation_start_year = EXCLUDED.depreciation_start_year;
+        """
+        rows = [(project_id, year, amount, start_year) for year, (amount, start_year) in investments.items()]
+        try:
+            with self._cursor() as cur:
+                self.backend.execute_values(cur, query, rows)
+            self._written_by(query)
+            print(f"[DEBUG] Saved {len(rows)} investment years for project {project_id} in batch.")
+        except Exception as e:
+            print(f"[ERROR] Failed to save investment details for project {project_id}: {e}")
+            raise
+
     def save_yearly_investments(self, project_id, investments):
         """
         Save yearly investments for a given project ID without requiring depreciation_start_year.
@@ -267,49 +631,16 @@ class DatabaseService:
             insert_params = (depreciation_percentage, depreciation_years, method_description)
             self.execute_query(insert_query, insert_params)
 
+        # Method descriptions and every project's method details may have changed
+        DatabaseService.depreciation_methods_cache.invalidate()
+        DatabaseService.method_details_cache.invalidate()
+
     def create_tables(self):
         """
         Create all necessary tables in the database.
         """
-        query_create_tables = """
-            CREATE TABLE IF NOT EXISTS depreciation_schedules (
-                depreciation_id SERIAL PRIMARY KEY,
-                depreciation_percentage NUMERIC,
-                depreciation_years INT,
-                method_description TEXT
-            );
-
-            CREATE TABLE IF NOT EXISTS projects (
-                project_id TEXT PRIMARY KEY,
-                branch TEXT,
-                operations TEXT,
-                description TEXT,
-                depreciation_method INT REFERENCES depreciation_schedules(depreciation_id)
-            );
-
-            CREATE TABLE IF NOT EXISTS project_classifications (
-                project_id TEXT PRIMARY KEY REFERENCES projects(project_id),
-                importance INT,
-                type INT
-            );
-
-            CREATE TABLE IF NOT EXISTS investments (
-                project_id TEXT REFERENCES projects(project_id),
-                year INT,
-                investment_amount NUMERIC,
-                depreciation_start_year INT,
-                PRIMARY KEY (project_id, year)
-            );
-
-            CREATE TABLE IF NOT EXISTS calculated_depreciations (
-                project_id TEXT REFERENCES projects(project_id),
-                year INT,
-                depreciation_value NUMERIC,
-                remaining_value NUMERIC,
-                PRIMARY KEY (project_id, year)
-            );
-        """
-        self.execute_query(query_create_tables)
+        with self._cursor() as cur:
+            self.backend.execute_script(cur, SCHEMA_SQL)
 
     def load_project(self, project_id):
         """
@@ -317,10 +648,19 @@ class DatabaseService:
         :param project_id: The ID of the project to load.
         :return: A dictionary containing project details or None if not found.
         """
+        cached = DatabaseService.project_cache.get(project_id)
+        if cached is not MISSING:
+            return dict(cached)
+
         query = "SELECT * FROM projects WHERE project_id = %s"
         params = (project_id,)
         results = self.execute_query(query, params, fetch=True)
-        return results[0] if results else None
+        if not results:
+            return None
+
+        project = dict(results[0])
+        DatabaseService.project_cache.set(project_id, project)
+        return dict(project)
 
     def search_projects(self, project_id=None, branch=None, operations=None, description=None):
         """
@@ -331,34 +671,62 @@ class DatabaseService:
         :param description: Filter by description.
         :return: A list of projects matching the filters.
         """
-        query = "SELECT * FROM projects WHERE TRUE"
-        params = []
+        conditions, params = _project_search_filter(project_id, branch, operations, description)
+        query = " AND ".join(["SELECT * FROM projects WHERE TRUE", *conditions])
+        return self.execute_query(query, params, fetch=True)
 
-        if project_id:
-            query += " AND project_id = %s"
-            params.append(project_id)
-        if branch:
-            query += " AND branch ILIKE %s"
-            params.append(f"%{branch}%")
-        if operations:
-            query += " AND operations ILIKE %s"
-            params.append(f"%{operations}%")
-        if description:
-            query += " AND description ILIKE %s"
-            params.append(f"%{description}%")
+    def search_projects_page(self, fields=None, after=None, limit=100, with_total=False, **filters):
+        """
+        Fetch one page of matching projects, ordered by project_id and resumed after the last ID of the previous page.
+        Each page is an index range scan, so deep pages cost the same as the first one.
+        :param fields: The columns to return, a subset of PROJECT_SEARCH_FIELDS; project_id is always included.
+        :param after: The project_id the previous page ended with, or None for the first page.
+        :param limit: Maximum number of projects on the page.
+        :param with_total: Also count every matching project.
+        :param filters: project_id, branch, operations and description as in search_projects.
+        :return: A dictionary with items, next_cursor (None on the last page) and, if requested, total.
+        """
+        fields = list(fields or PROJECT_SEARCH_FIELDS)
+        unknown = [field for field in fields if field not in PROJECT_SEARCH_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown project fields: {', '.join(unknown)}")
+        if "project_id" not in fields:
+            fields.insert(0, "project_id")
 
-        return self.execute_query(query, params, fetch=True)
+        conditions, params = _project_search_filter(**filters)
+        where = " AND ".join(["TRUE", *conditions])
+        page_where, page_params = where, list(params)
+        if after is not None:
+            page_where += " AND project_id > %s"
+            page_params.append(after)
+
+        # One extra row tells whether another page follows
+        query = f"SELECT {', '.join(fields)} FROM projects WHERE {page_where} ORDER BY project_id LIMIT %s"
+        with self._cursor() as cur:
+            self.backend.execute(cur, query, [*page_params, limit + 1])
+            rows = cur.fetchall()
+            page = {"items": rows[:limit], "next_cursor": rows[limit - 1]['project_id'] if len(rows) > limit else None}
+            if with_total:
+                self.backend.execute(cur, f"SELECT COUNT(*) AS total FROM projects WHERE {where}", params)
+                page["total"] = cur.fetchone()['total']
+        return page
 
     def fetch_depreciation_methods(self):
         """
         Fetches depreciation method descriptions along with their IDs from the database.
         :return: A dictionary where keys are 'depreciation_id' and values are 'method_description'.
         """
+        cached = DatabaseService.depreciation_methods_cache.get("all")
+        if cached is not MISSING:
+            return dict(cached)
+
         try:
             query = "SELECT depreciation_id, method_description FROM depreciation_schedules"
             results = self.execute_query(query, fetch=True)
             # Convert the list of dictionaries to a dictionary with depreciation_id as key and method_description as value
-            return {row['depreciation_id']: row['method_description'] for row in results}
+            methods = {row['depreciation_id']: row['method_description'] for row in results}
+            DatabaseService.depreciation_methods_cache.set("all", methods)
+            return dict(methods)
         except Exception as e:
             print(f"Error fetching depreciation methods: {e}")
             return {}
@@ -369,10 +737,15 @@ class DatabaseService:
         :param project_id: The ID of the project.
         :return: True if calculated depreciations exist, False otherwise.
         """
-        query = "SELECT EXISTS (SELECT 1 FROM calculated_depreciations WHERE project_id = %s AND remaining_value IS NOT NULL)"
+        if self.result_storage == "compact":
+            query = "SELECT EXISTS (SELECT 1 FROM calculated_depreciation_arrays WHERE project_id = %s AND run_id = %s) AS has_depreciations"
+            result = self.execute_query(query, (project_id, CURRENT_RUN_ID), fetch=True)
+            return bool(result[0]['has_depreciations']) if result else False
+
+        query = "SELECT EXISTS (SELECT 1 FROM calculated_depreciations WHERE project_id = %s AND remaining_value IS NOT NULL) AS has_depreciations"
         params = (project_id,)
         result = self.execute_query(query, params, fetch=True)
-        return result[0]['exists'] if result else False
+        return bool(result[0]['has_depreciations']) if result else False
 
     def get_depreciation_method_details(self, project_id):
         """
@@ -380,6 +753,10 @@ class DatabaseService:
         :param project_id: The ID of the project.
         :return: A dictionary containing depreciation_percentage and depreciation_years.
         """
+        cached = DatabaseService.method_details_cache.get(project_id)
+        if cached is not MISSING:
+            return dict(cached) if cached is not None else None
+
         query = """
             SELECT depreciation_percentage, depreciation_years 
             FROM depreciation_schedules 
@@ -391,7 +768,11 @@ class DatabaseService:
         """
         params = (project_id,)
         result = self.execute_query(query, params, fetch=True)
-        return result[0] if result else None
+        details = dict(result[0]) if result else None
+        if details is not None:
+            DatabaseService.method_details_cache.set(project_id, details)
+            return dict(details)
+        return None
 
     def save_calculated_depreciations(self, project_id, df):
         """
@@ -410,30 +791,35 @@ class DatabaseService:
         if not {'year', 'depreciation', 'remaining asset value'}.issubset(df.columns):
             raise ValueError("Missing required columns in the DataFrame: 'year', 'depreciation', 'remaining asset value'")
 
+        if df.empty:
+            print(f"[INFO] No calculated depreciations to save for project {project_id}.")
+            return
+
+        if self.result_storage == "compact":
+            rows = zip(df["year"].tolist(), df["depreciation"].tolist(), df["remaining asset value"].tolist())
+            self.save_calculated_depreciation_arrays([(project_id, *to_year_arrays(rows))])
+            return
+
         query = """
             INSERT INTO calculated_depreciations (project_id, year, depreciation_value, remaining_value)
-            VALUES (%s, %s, %s, %s)
+            VALUES %s
             ON CONFLICT (project_id, year) DO UPDATE
             SET depreciation_value = EXCLUDED.depreciation_value,
                 remaining_value = EXCLUDED.remaining_value;
         """
+        rows = [
+            (project_id, int(year), float(depreciation), float(remaining_value))
+            for year, depreciation, remaining_value in zip(df["year"].tolist(), df["depreciation"].tolist(), df["remaining asset value"].tolist())
+        ]
 
-        for index, row in df.iterrows():
-            try:
-                year = int(row["year"])
-                depreciation = float(row["depreciation"])
-                remaining_value = float(row["remaining asset value"])
-
-                params = (
-                    project_id,
-                    year,
-                    depreciation,
-                    remaining_value
-                )
-
-                self.execute_query(query, params)
-            except Exception as e:
-                print(f"[ERROR] Failed to save row {index}: {e}")
+        # Write all years in one statement instead of one connection per row
+        try:
+            with self._cursor() as cur:
+                self.backend.execute_values(cur, query, rows)
+            self._written_by(query)
+        except Exception as e:
+            print(f"[ERROR] Failed to save calculated depreciations for project {project_id}: {e}")
+            raise
 
     def fetch_report_data(self, project_id: str):
         """
@@ -441,6 +827,9 @@ class DatabaseService:
         :param project_id: The ID of the project.
         :return: A list of dictionaries containing year, investment amount, and depreciation value.
         """
+        if self.result_storage == "compact":
+            return self._compact_report(project_id)
+
         query = """
             SELECT year, 
                    COALESCE(SUM(investment_amount), 0) AS investment_amount,
@@ -466,6 +855,9 @@ class DatabaseService:
         :param project_id: The ID of the project.
         :return: A list of dictionaries containing year, investment amount, and depreciation value.
         """
+        if self.result_storage == "compact":
+            return self._compact_report(project_id)
+
         query = """
             SELECT year, 
                    COALESCE(SUM(investment_amount), 0) AS investment_amount,
@@ -490,6 +882,9 @@ class DatabaseService:
         Fetch all investments and depreciations across all projects.
         :return: A list of dictionaries containing project ID, year, investment amount, and depreciation value.
         """
+        if self.result_storage == "compact":
+            return self._compact_report()
+
         query = """
             SELECT project_id, year, 
                    COALESCE(SUM(investment_amount), 0) AS investment_amount,
@@ -506,6 +901,541 @@ class DatabaseService:
         """
         return self.execute_query(query, fetch=True)
 
+    def get_report_totals(self, last_year=None, by_year=False):
+        """
+        Aggregate investments and depreciations per project, up to and including last_year, in one query.
+        :param last_year: The last year included, or None for every year.
+        :param by_year: Return one row per project and year instead of one row per project.
+        :return: A list of dictionaries with project_id, branch, operations, description, (year,) investment_amount and depreciation_value.
+        """
+        year_filter = "WHERE year <= %s" if last_year is not None else ""
+        if by_year:
+            query = """
+                SELECT report.project_id, projects.branch, projects.operations, projects.description,
+                       report.year, report.investment_amount, report.depreciation_value
+                FROM ({report}) AS report
+                JOIN projects ON projects.project_id = report.project_id
+                ORDER BY report.project_id, report.year
+            """.format(report=REPORT_ROWS_SQL.format(investments_filter=year_filter, depreciations_filter=year_filter, branch_limit=""))
+        else:
+            query = REPORT_TOTALS_SQL.format(year_filter=year_filter)
+        params = (last_year, last_year) if last_year is not None else None
+
+        with self._cursor() as cur:
+            self.backend.execute(cur, query, params)
+            rows = cur.fetchall()
+
+        if self.result_storage == "compact":
+            # The depreciation branch above found no rows; add the totals of the compact results
+            depreciations = {}
+            for row in self.get_all_calculated_depreciations():
+                if last_year is None or row['year'] <= last_year:
+                    key = (row['project_id'], row['year']) if by_year else row['project_id']
+                    depreciations[key] = depreciations.get(key, 0) + (row['depreciation_value'] or 0)
+            if by_year:
+                # Years with depreciation but no investment have no report row yet
+                attributes = {row['project_id']: row for row in rows}
+                known = {(row['project_id'], row['year']) for row in rows}
+                projects = {row['project_id']: row for row in self.get_projects_data()}
+                for project_id, year in depreciations.keys() - known:
+                    project = attributes.get(project_id) or projects.get(project_id)
+                    if project is not None:
+                        rows.append({
+                            "project_id": project_id, "branch": project['branch'], "operations": project['operations'],
+                            "description": project['description'], "year": year, "investment_amount": 0, "depreciation_value": 0,
+                        })
+                rows.sort(key=lambda row: (row['project_id'], row['year']))
+            for row in rows:
+                key = (row['project_id'], row['year']) if by_year else row['project_id']
+                row['depreciation_value'] = float(row['depreciation_value'] or 0) + depreciations.get(key, 0)
+
+        print(f"[DEBUG] Read {len(rows)} report total rows up to {last_year or 'the last year'}.")
+        return rows
+
+    def get_report_years(self, report):
+        """
+        Fetch the years present in a grouped report, in order.
+        :param report: A GROUPED_REPORTS key, 'depreciation' or 'importance'.
+        """
+        keys, table, _ = GROUPED_REPORTS[report]
+        query = GROUPED_REPORT_YEARS_SQL.format(
+            table=table,
+            not_null=" AND ".join(f"{REPORT_KEY_EXPRESSIONS[key]} IS NOT NULL" for key in keys),
+        )
+        with self._cursor() as cur:
+            self.backend.execute(cur, query)
+            return [row['year'] for row in cur.fetchall()]
+
+    def iter_grouped_report(self, report, split_by=None, batch_size=5000):
+        """
+        Stream the yearly sums of a grouped report from a server-side cursor.
+        :param report: A GROUPED_REPORTS key, 'depreciation' or 'importance'.
+        :param split_by: A grouping column to sort by first, e.g. 'branch' for one sheet per branch.
+        :param batch_size: Number of rows fetched per round trip.
+        :return: A generator of dictionaries with the grouping columns, year and value, sorted by the grouping columns.
+        """
+        keys, table, value_column = GROUPED_REPORTS[report]
+        order = [split_by, *[key for key in keys if key != split_by]] if split_by else list(keys)
+        query = GROUPED_REPORT_SQL.format(
+            select_keys=", ".join(f"{REPORT_KEY_EXPRESSIONS[key]} AS {key}" for key in keys),
+            value_column=value_column,
+            table=table,
+            not_null=" AND ".join(f"{REPORT_KEY_EXPRESSIONS[key]} IS NOT NULL" for key in keys),
+            group_keys=", ".join(REPORT_KEY_EXPRESSIONS[key] for key in keys),
+            order_keys=", ".join(REPORT_KEY_EXPRESSIONS[key] for key in order),
+        )
+        for rows in self.stream_query(query, batch_size=batch_size):
+            yield from rows
+
+    def save_calculated_depreciation_arrays(self, results, run_id=CURRENT_RUN_ID):
+        """
+        Save calculated depreciations in the compact format, one row per project.
+        :param results: A list of tuples (project_id, start_year, depreciation_values, remaining_values).
+        :param run_id: The calculation run the results belong to; 0 holds the current results.
+        """
+        query = """
+            INSERT INTO calculated_depreciation_arrays (project_id, run_id, start_year, depreciation_values, remaining_values)
+            VALUES %s
+            ON CONFLICT (project_id, run_id) DO UPDATE
+            SET start_year = EXCLUDED.start_year,
+                depreciation_values = EXCLUDED.depreciation_values,
+                remaining_values = EXCLUDED.remaining_values;
+        """
+        rows = [
+            (project_id, run_id, start_year, pack_values(depreciation_values), pack_values(remaining_values))
+            for project_id, start_year, depreciation_values, remaining_values in results
+        ]
+        try:
+            with self._cursor() as cur:
+                self.backend.execute_values(cur, query, rows)
+            self._written_by(query)
+            print(f"[DEBUG] Saved compact depreciation results for {len(rows)} projects.")
+        except Exception as e:
+            print(f"[ERROR] Failed to save compact depreciation results: {e}")
+            raise
+
+    def get_calculated_depreciations(self, project_id, run_id=CURRENT_RUN_ID):
+        """
+        Fetch the calculated depreciations of a project, whichever storage format is in use.
+        :param project_id: The ID of the project.
+        :param run_id: The calculation run to read from the compact table.
+        :return: A list of dictionaries containing year, depreciation_value and remaining_value.
+        """
+        if self.result_storage == "compact":
+            query = """
+                SELECT start_year, depreciation_values, remaining_values
+                FROM calculated_depreciation_arrays
+                WHERE project_id = %s AND run_id = %s
+            """
+            result = self.execute_query(query, (project_id, run_id), fetch=True)
+            if not result:
+                return []
+            row = result[0]
+            return expand_year_arrays(row['start_year'], row['depreciation_values'], row['remaining_values'])
+
+        query = """
+            SELECT year, depreciation_value, remaining_value
+            FROM calculated_depreciations
+            WHERE project_id = %s
+            ORDER BY year
+        """
+        return self.execute_query(query, (project_id,), fetch=True)
+
+    def get_all_calculated_depreciations(self, run_id=CURRENT_RUN_ID):
+        """
+        Fetch calculated depreciations of every project, whichever storage format is in use.
+        :param run_id: The calculation run to read from the compact table.
+        :return: A list of dictionaries containing project_id, year, depreciation_value and remaining_value.
+        """
+        if self.result_storage == "compact":
+            query = """
+                SELECT project_id, start_year, depreciation_values, remaining_values
+                FROM calculated_depreciation_arrays
+                WHERE run_id = %s
+                ORDER BY project_id
+            """
+            rows = []
+            with self._cursor() as cur:
+                self.backend.execute(cur, query, (run_id,))
+                for row in cur:
+                    for result in expand_year_arrays(row['start_year'], row['depreciation_values'], row['remaining_values']):
+                        result['project_id'] = row['project_id']
+                        rows.append(result)
+            return rows
+
+        query = "SELECT project_id, year, depreciation_value, remaining_value FROM calculated_depreciations ORDER BY project_id, year"
+        return self.execute_query(query, fetch=True)
+
+    def _compact_report(self, project_id=None):
+        """
+        Combine investments with compact depreciation results into the report row shape.
+        :param project_id: Restrict the report to one project, or None for every project.
+        """
+        if project_id is None:
+            investments = self.execute_query("SELECT project_id, year, investment_amount FROM investments", fetch=True)
+            depreciations = self.get_all_calculated_depreciations()
+        else:
+            investments = [
+                dict(row, project_id=project_id)
+                for row in self.execute_query("SELECT year, investment_amount FROM investments WHERE project_id = %s", (project_id,), fetch=True)
+            ]
+            depreciations = [dict(row, project_id=project_id) for row in self.get_calculated_depreciations(project_id)]
+
+        report = _combine_report_rows(investments, depreciations)
+        if project_id is not None:
+            for row in report:
+                del row['project_id']
+        return report
+
+    def compact_calculated_depreciations(self):
+        """
+        Move the per-year calculated_depreciations rows into the compact per-project table, in one transaction.
+        Only allowed with compact result storage; otherwise the moved results would no longer be read.
+        :return: The number of projects converted.
+        """
+        if self.result_storage != "compact":
+            raise ValueError("Calculated depreciations can only be compacted with compact result storage.")
+
+        with self.transaction():
+            rows = self.execute_query("SELECT project_id, year, depreciation_value, remaining_value FROM calculated_depreciations ORDER BY project_id, year", fetch=True)
+
+            results = group_year_arrays(rows)
+            if results:
+                self.save_calculated_depreciation_arrays(results)
+                self.execute_query("DELETE FROM calculated_depreciations")
+
+        print(f"[INFO] Compacted {len(rows)} calculated depreciation rows into {len(results)} project rows.")
+        return len(results)
+
+    def start_calculation_run(self, parameters=None):
+        """
+        Record the start of a calculation run.
+        :param parameters: A JSON-serializable dictionary describing the run.
+        :return: The new run ID.
+        """
+        query = """
+            INSERT INTO calculation_runs (parameters, status)
+            VALUES (%s, %s)
+            RETURNING run_id
+        """
+        result = self.execute_query(query, (json.dumps(parameters or {}, default=str), "running"), fetch=True)
+        return result[0]['run_id']
+
+    def save_calculation_run_results(self, run_id, results):
+        """
+        Append results to a calculation run. Runs are never updated in place, so this is a pure insert.
+        :param run_id: The ID of the calculation run.
+        :param results: A list of tuples (project_id, year, depreciation_value, remaining_value).
+        """
+        query = """
+            INSERT INTO calculation_run_results (run_id, project_id, year, depreciation_value, remaining_value)
+            VALUES %s
+        """
+        rows = [(run_id, project_id, year, depreciation, remaining) for project_id, year, depreciation, remaining in results]
+        try:
+            with self._cursor() as cur:
+                self.backend.execute_values(cur, query, rows)
+            self._written_by(query)
+            print(f"[DEBUG] Appended {len(rows)} results to calculation run {run_id}.")
+        except Exception as e:
+            print(f"[ERROR] Failed to save results of calculation run {run_id}: {e}")
+            raise
+
+    def finish_calculation_run(self, run_id, duration_seconds, project_count, error_count=0, status="completed"):
+        """
+        Record the outcome of a calculation run.
+        """
+        query = """
+            UPDATE calculation_runs
+            SET finished_at = CURRENT_TIMESTAMP,
+                duration_seconds = %s,
+                project_count = %s,
+                error_count = %s,
+                status = %s
+            WHERE run_id = %s
+        """
+        self.execute_query(query, (duration_seconds, project_count, error_count, status, run_id))
+
+    def get_calculation_runs(self, limit=None):
+        """
+        Fetch calculation run metadata, newest first.
+        :param limit: Maximum number of runs to return.
+        :return: A list of dictionaries with the calculation_runs columns.
+        """
+        query = "SELECT * FROM calculation_runs ORDER BY run_id DESC"
+        params = None
+        if limit is not None:
+            query += " LIMIT %s"
+            params = (limit,)
+        runs = self.execute_query(query, params, fetch=True)
+        for run in runs:
+            run['parameters'] = json.loads(run['parameters']) if run['parameters'] else {}
+        return runs
+
+    def _check_diffable_runs(self, base_run_id, other_run_id):
+        """
+        Raise if a run's per-year results were compacted; diffing it would report every row as removed.
+        """
+        runs = self.execute_query(
+            "SELECT run_id FROM calculation_runs WHERE status = %s AND (run_id = %s OR run_id = %s)",
+            ("compacted", base_run_id, other_run_id), fetch=True
+        )
+        if runs:
+            compacted = ", ".join(str(run['run_id']) for run in runs)
+            raise ValueError(f"Calculation runs {compacted} were compacted and can no longer be diffed.")
+
+    def diff_calculation_runs(self, base_run_id, other_run_id, tolerance=0.005):
+        """
+        Compare two calculation runs year by year in SQL.
+        :param base_run_id: The run to compare against.
+        :param other_run_id: The run being compared.
+        :param tolerance: Absolute difference below which values are considered equal.
+        :return: A list of dictionaries for each (project_id, year) that was added, removed or changed.
+        :raises ValueError: If either run was compacted.
+        """
+        self._check_diffable_runs(base_run_id, other_run_id)
+        query = RUN_DIFF_SQL + " ORDER BY project_id, year"
+        return self.execute_query(query, (base_run_id, other_run_id, tolerance, tolerance), fetch=True)
+
+    def diff_calculation_run_projects(self, base_run_id, other_run_id, tolerance=0.005):
+        """
+        Summarize the differences between two calculation runs per project.
+        :return: A list of dictionaries with project_id, changed_years, first_changed_year and last_changed_year.
+        :raises ValueError: If either run was compacted.
+        """
+        self._check_diffable_runs(base_run_id, other_run_id)
+        query = f"""
+            SELECT project_id,
+                   COUNT(*) AS changed_years,
+                   MIN(year) AS first_changed_year,
+                   MAX(year) AS last_changed_year
+            FROM ({RUN_DIFF_SQL}) AS differences
+            GROUP BY project_id
+            ORDER BY project_id
+        """
+        return self.execute_query(query, (base_run_id, other_run_id, tolerance, tolerance), fetch=True)
+
+    def publish_calculation_run(self, run_id):
+        """
+        Make a run's results the current calculated depreciations.
+        :param run_id: The ID of the calculation run.
+        """
+        if self.result_storage == "compact":
+            rows = self.execute_query(
+                "SELECT project_id, year, depreciation_value, remaining_value FROM calculation_run_results WHERE run_id = %s ORDER BY project_id, year",
+                (run_id,), fetch=True
+            )
+            self.save_calculated_depreciation_arrays(group_year_arrays(rows))
+            return
+
+        # A single set-based upsert instead of one statement per project-year
+        query = """
+            INSERT INTO calculated_depreciations (project_id, year, depreciation_value, remaining_value)
+            SELECT project_id, year, depreciation_value, remaining_value
+            FROM calculation_run_results
+            WHERE run_id = %s
+            ON CONFLICT (project_id, year) DO UPDATE
+            SET depreciation_value = EXCLUDED.depreciation_value,
+                remaining_value = EXCLUDED.remaining_value;
+        """
+        self.execute_query(query, (run_id,))
+
+    def compact_calculation_runs(self, keep_last=5):
+        """
+        Convert the per-year results of all but the most recent runs into compact per-project rows.
+        :param keep_last: Number of most recent runs whose per-year results are kept for diffing.
+        :return: The IDs of the runs that were compacted.
+        """
+        runs = self.execute_query(
+            "SELECT run_id FROM calculation_runs WHERE status = %s ORDER BY run_id DESC",
+            ("completed",), fetch=True
+        )
+        run_ids = [run['run_id'] for run in runs[keep_last:]]
+
+        for run_id in run_ids:
+            rows = self.execute_query(
+                "SELECT project_id, year, depreciation_value, remaining_value FROM calculation_run_results WHERE run_id = %s ORDER BY project_id, year",
+                (run_id,), fetch=True
+            )
+            results = group_year_arrays(rows)
+
+            with self._cursor() as cur:
+                if results:
+                    self.backend.execute_values(cur, """
+                        INSERT INTO calculated_depreciation_arrays (project_id, run_id, start_year, depreciation_values, remaining_values)
+                        VALUES %s
+                        ON CONFLICT (project_id, run_id) DO NOTHING;
+                    """, [(project_id, run_id, start_year, pack_values(depreciations), pack_values(remaining))
+                          for project_id, start_year, depreciations, remaining in results])
+                self.backend.execute(cur, "DELETE FROM calculation_run_results WHERE run_id = %s", (run_id,))
+                self.backend.execute(cur, "UPDATE calculation_runs SET status = %s WHERE run_id = %s", ("compacted", run_id))
+            self._written("calculation_run_results", "calculated_depreciation_arrays", "calculation_runs")
+
+        print(f"[INFO] Compacted {len(run_ids)} calculation runs.")
+        return run_ids
+
+    def prune_calculation_runs(self, keep_last=20):
+        """
+        Delete all but the most recent calculation runs together with their results.
+        :param keep_last: Number of most recent runs to keep.
+        :return: The IDs of the deleted runs.
+        """
+        runs = self.execute_query("SELECT run_id FROM calculation_runs ORDER BY run_id DESC", fetch=True)
+        run_ids = [run['run_id'] for run in runs[keep_last:]]
+
+        with self._cursor() as cur:
+            for run_id in run_ids:
+                self.backend.execute(cur, "DELETE FROM calculation_run_results WHERE run_id = %s", (run_id,))
+                self.backend.execute(cur, "DELETE FROM calculated_depreciation_arrays WHERE run_id = %s", (run_id,))
+                self.backend.execute(cur, "DELETE FROM calculation_runs WHERE run_id = %s", (run_id,))
+        self._written("calculation_run_results", "calculated_depreciation_arrays", "calculation_runs")
+
+        print(f"[INFO] Pruned {len(run_ids)} calculation runs.")
+        return run_ids
+
+    def stream_query(self, query, params=None, batch_size=1000):
+        """
+        Execute a read query through a server-side cursor and yield its rows in batches.
+        :param query: SQL query to execute.
+        :param params: Parameters for the query.
+        :param batch_size: Maximum number of rows per batch.
+        :return: A generator of lists of result rows.
+        """
+        with self.backend.connect() as conn:
+            yield from self.backend.iter_batches(conn, query, params, batch_size)
+
+    def iter_depreciation_export(self, first_year=None, last_year=None, branch=None, with_dimensions=False, batch_size=5000):
+        """
+        Stream the current calculated depreciations through a server-side cursor, sorted by project_id and year.
+        :param first_year: Leave out earlier years.
+        :param last_year: Leave out later years.
+        :param branch: Only export projects of this branch.
+        :param with_dimensions: Add the branch, operations, importance description and type of each project.
+        :param batch_size: Rows fetched from the server per round trip.
+        :return: A generator of lists of dictionaries with project_id, year, depreciation_value, remaining_value
+            and, if requested, the dimension columns.
+        """
+        dimensions = "".join(f", {expression} AS {name}" for name, expression in EXPORT_DIMENSION_COLUMNS.items()) if with_dimensions else ""
+        conditions, params = ["TRUE"], []
+        if branch:
+            conditions.append("projects.branch = %s")
+            params.append(branch)
+
+        if self.result_storage != "compact":
+            for column, operator, year in (("data.year", ">=", first_year), ("data.year", "<=", last_year)):
+                if year is not None:
+                    conditions.append(f"{column} {operator} %s")
+                    params.append(year)
+            query = DEPRECIATION_EXPORT_SQL.format(
+                columns="data.project_id, data.year, data.depreciation_value, data.remaining_value",
+                dimensions=dimensions,
+                source="calculated_depreciations",
+                where=" AND ".join(conditions),
+                order="data.project_id, data.year",
+            )
+            yield from self.stream_query(query, params, batch_size)
+            return
+
+        # Compact rows hold every year of a project, so the year range is applied while expanding them
+        conditions.append("data.run_id = %s")
+        params.append(CURRENT_RUN_ID)
+        query = DEPRECIATION_EXPORT_SQL.format(
+            columns="data.project_id, data.start_year, data.depreciation_values, data.remaining_values",
+            dimensions=dimensions,
+            source="calculated_depreciation_arrays",
+            where=" AND ".join(conditions),
+            order="data.project_id",
+        )
+        dimension_names = list(EXPORT_DIMENSION_COLUMNS) if with_dimensions else []
+        for rows in self.stream_query(query, params, batch_size):
+            yield [
+                {"project_id": row['project_id'], **result, **{name: row[name] for name in dimension_names}}
+                for row in rows
+                for result in expand_year_arrays(row['start_year'], row['depreciation_values'], row['remaining_values'])
+                if (first_year is None or result['year'] >= first_year) and (last_year is None or result['year'] <= last_year)
+            ]
+
+    def iter_depreciation_reports(self, batch_size=1000, as_records=False, use_cursor=False):
+        """
+        Stream the rows of get_all_depreciation_reports in fixed-size batches using constant memory.
+        Pages are fetched by (project_id, year) keyset, or through one server-side cursor if use_cursor is set.
+        :param batch_size: Number of rows per batch; only the last batch may be smaller.
+        :param as_records: Yield NumPy record arrays instead of lists of tuples.
+        :param use_cursor: Read through a server-side cursor instead of keyset pagination.
+        :return: A generator of batches of (project_id, year, investment_amount, depreciation_value).
+        """
+        if self.result_storage == "compact":
+            pages = self._iter_compact_report_pages(batch_size)
+        elif use_cursor:
+            pages = (
+                [(row['project_id'], row['year'], row['investment_amount'], row['depreciation_value']) for row in rows]
+                for rows in self.stream_query(REPORT_ROWS_SQL.format(investments_filter="", depreciations_filter="", branch_limit="") + " ORDER BY project_id, year", batch_size=batch_size)
+            )
+        else:
+            pages = self._iter_keyset_report_pages(batch_size)
+
+        for batch in _rechunk(pages, batch_size):
+            yield _report_records(batch) if as_records else batch
+
+    def _iter_keyset_report_pages(self, batch_size):
+        last_key = None
+        while True:
+            if last_key is None:
+                key_filter, key_params = "", []
+            else:
+                key_filter, key_params = "WHERE (project_id, year) > (%s, %s)", list(last_key)
+            # Limiting each branch by its primary key keeps every page an index range scan
+            query = REPORT_ROWS_SQL.format(
+                investments_filter=key_filter,
+                depreciations_filter=key_filter,
+                branch_limit="ORDER BY project_id, year LIMIT %s",
+            ) + " ORDER BY project_id, year LIMIT %s"
+            params = [*key_params, batch_size, *key_params, batch_size, batch_size]
+
+            with self._cursor() as cur:
+                self.backend.execute(cur, query, params)
+                rows = cur.fetchall()
+            if not rows:
+                return
+            yield [(row['project_id'], row['year'], row['investment_amount'], row['depreciation_value']) for row in rows]
+            if len(rows) < batch_size:
+                return
+            last_key = (rows[-1]['project_id'], rows[-1]['year'])
+
+    def _iter_compact_report_pages(self, batch_size):
+        # Compact results are keyed by project, so page over project IDs instead
+        last_project_id = None
+        while True:
+            if last_project_id is None:
+                query, params = "SELECT project_id FROM projects ORDER BY project_id LIMIT %s", (batch_size,)
+            else:
+                query, params = "SELECT project_id FROM projects WHERE project_id > %s ORDER BY project_id LIMIT %s", (last_project_id, batch_size)
+            project_ids = [row['project_id'] for row in self.execute_query(query, params, fetch=True)]
+            if not project_ids:
+                return
+
+            bounds = (project_ids[0], project_ids[-1])
+            investments = self.execute_query(
+                "SELECT project_id, year, investment_amount FROM investments WHERE project_id BETWEEN %s AND %s",
+                bounds, fetch=True
+            )
+            arrays = self.execute_query(
+                "SELECT project_id, start_year, depreciation_values, remaining_values FROM calculated_depreciation_arrays WHERE run_id = %s AND project_id BETWEEN %s AND %s",
+                (CURRENT_RUN_ID, *bounds), fetch=True
+            )
+            depreciations = [
+                dict(result, project_id=row['project_id'])
+                for row in arrays
+                for result in expand_year_arrays(row['start_year'], row['depreciation_values'], row['remaining_values'])
+            ]
+            yield [
+                (row['project_id'], row['year'], row['investment_amount'], row['depreciation_value'])
+                for row in _combine_report_rows(investments, depreciations)
+            ]
+            if len(project_ids) < batch_size:
+                return
+            last_project_id = project_ids[-1]
+
     def get_projects_data(self):
         """
         Fetch all data from the projects table.
@@ -514,30 +1444,77 @@ class DatabaseService:
         query = "SELECT * FROM projects"
         return self.execute_query(query, fetch=True)
 
-    def save_investments_batch(self, investments):
+    def save_investments_batch(self, investments, accumulate=False):
         """
         Save multiple investments in the database in a single batch.
         :param investments: A list of tuples (project_id, year, investment_amount).
-        """
-        query = """
-            INSERT INTO investments (project_id, year, investment_amount)
-            VALUES %s
-            ON CONFLICT (project_id, year) DO UPDATE
-            SET investment_amount = EXCLUDED.investment_amount;
-        """
+        :param accumulate: Add the amounts to already stored amounts instead of replacing them.
+        """
+        if accumulate:
+            query = """
+                INSERT INTO investments (project_id, year, investment_amount)
+                VALUES %s
+                ON CONFLICT (project_id, year) DO UPDATE
+                SET investment_amount = investments.investment_amount + EXCLUDED.investment_amount;
+            """
+        else:
+            query = """
+                INSERT INTO investments (project_id, year, investment_amount)
+                VALUES %s
+                ON CONFLICT (project_id, year) DO UPDATE
+                SET investment_amount = EXCLUDED.investment_amount;
+            """
         try:
-            # Use psycopg2's execute_values for efficient batch inserts
-            from psycopg2.extras import execute_values
-            with psycopg2.connect(self.db_url, cursor_factory=RealDictCursor) as conn:
-                with conn.cursor() as cur:
-                    print(f"[DEBUG] Attempting to save {len(investments)} investments in batch.")
-                    execute_values(cur, query, investments)
-                    conn.commit()
-                    print(f"[DEBUG] Successfully saved {len(investments)} investments in batch.")
+            with self._cursor() as cur:
+                print(f"[DEBUG] Attempting to save {len(investments)} investments in batch.")
+                self.backend.execute_values(cur, query, investments)
+            self._written_by(query)
+            print(f"[DEBUG] Successfully saved {len(investments)} investments in batch.")
         except Exception as e:
             print(f"[ERROR] Failed to save investments batch: {e}")
             raise
 
+    @contextmanager
+    def staged_investments(self):
+        """
+        Collect investments batch by batch in a temporary table and merge them into the investments table when
+        the block exits, all in one transaction. Amounts of duplicate (project_id, year) pairs across batches are
+        summed and replace the stored amounts, so duplicates need not be tracked in memory.
+        :return: A context manager yielding a function that stages a list of tuples (project_id, year, investment_amount).
+        """
+        with self.transaction():
+            # A shared SQLite connection or a pooled Postgres connection can still hold the table of a failed
+            # import, since SQLite does not roll back the CREATE; reuse it without the old rows
+            self.execute_query("""
+                CREATE TEMPORARY TABLE IF NOT EXISTS staged_investments (
+                    project_id TEXT,
+                    year INT,
+                    investment_amount NUMERIC
+                )
+            """)
+            self.execute_query("DELETE FROM staged_investments")
+
+            def stage(investments):
+                with self._cursor() as cur:
+                    self.backend.execute_values(cur, "INSERT INTO staged_investments (project_id, year, investment_amount) VALUES %s", investments)
+                print(f"[DEBUG] Staged {len(investments)} investments.")
+
+            yield stage
+
+            # SQLite needs the WHERE clause to tell the upsert's ON CONFLICT apart from a join constraint
+            query = """
+                INSERT INTO investments (project_id, year, investment_amount)
+                SELECT project_id, year, SUM(investment_amount)
+                FROM staged_investments
+                WHERE TRUE
+                GROUP BY project_id, year
+                ON CONFLICT (project_id, year) DO UPDATE
+                SET investment_amount = EXCLUDED.investment_amount;
+            """
+            self.execute_query(query)
+            self.execute_query("DROP TABLE staged_investments")
+            print("[INFO] Merged staged investments.")
+
     def save_project_classifications(self, classifications):
         """
         Save or update project classifications in the database.
@@ -578,15 +1555,13 @@ class DatabaseService:
             # Log the number of projects being saved
             print(f"[INFO] Attempting to save {len(projects)} projects in batch.")
 
-            # Use psycopg2's execute_values for efficient batch inserts
-            from psycopg2.extras import execute_values
-            with psycopg2.connect(self.db_url, cursor_factory=RealDictCursor) as conn:
-                with conn.cursor() as cur:
-                    execute_values(cur, query, projects)
-                    conn.commit()
+            with self._cursor() as cur:
+                self.backend.execute_values(cur, query, projects)
+            self._written_by(query)
 
             # Log success
             print(f"[INFO] Successfully saved {len(projects)} projects in batch.")
+            self.invalidate_project_cache([project[0] for project in projects])
         except Exception as e:
             print(f"[ERROR] Failed to save projects batch: {e}")
             raise
@@ -603,11 +1578,9 @@ class DatabaseService:
             WHERE investments.project_id = data.project_id AND investments.year = data.year;
         """
         try:
-            from psycopg2.extras import execute_values
-            with psycopg2.connect(self.db_url, cursor_factory=RealDictCursor) as conn:
-                with conn.cursor() as cur:
-                    execute_values(cur, query, depreciation_years_data, template=None)
-                    conn.commit()
+            with self._cursor() as cur:
+                self.backend.execute_values(cur, query, depreciation_years_data)
+            self._written_by(query)
         except Exception as e:
             print(f"[ERROR] Failed to save depreciation years batch: {e}")
             raise
@@ -625,13 +1598,11 @@ class DatabaseService:
                 type = EXCLUDED.type;
         """
         try:
-            from psycopg2.extras import execute_values
-            with psycopg2.connect(self.db_url, cursor_factory=RealDictCursor) as conn:
-                with conn.cursor() as cur:
-                    print(f"[DEBUG] Attempting to save {len(classifications)} project classifications in batch.")
-                    execute_values(cur, query, classifications)
-                    conn.commit()
-                    print(f"[DEBUG] Successfully saved {len(classifications)} project classifications in batch.")
+            with self._cursor() as cur:
+                print(f"[DEBUG] Attempting to save {len(classifications)} project classifications in batch.")
+                self.backend.execute_values(cur, query, classifications)
+            self._written_by(query)
+            print(f"[DEBUG] Successfully saved {len(classifications)} project classifications in batch.")
         except Exception as e:
             print(f"[ERROR] Failed to save project classifications batch: {e}")
             raise
@@ -642,8 +1613,20 @@ class DatabaseService:
         :return: A list of project IDs.
         """
         query = "SELECT project_id FROM projects"
-        results = self.execute_query(query, fetch=True)
-        return [row['project_id'] for row in results]
+        # Read directly rather than through execute_query, which logs every row
+        with self._cursor() as cur:
+            self.backend.execute(cur, query)
+            return [row['project_id'] for row in cur.fetchall()]
+
+    def get_all_investments(self):
+        """
+        Fetch the investment amounts of every project.
+        :return: A list of dictionaries containing project_id, year and investment_amount.
+        """
+        query = "SELECT project_id, year, investment_amount FROM investments"
+        with self._cursor() as cur:
+            self.backend.execute(cur, query)
+            return cur.fetchall()
 
     def get_project_classifications(self):
         """
@@ -651,4 +1634,99 @@ class DatabaseService:
         :return: A list of dictionaries containing project_id, importance, and type.
         """
         query = "SELECT project_id, importance, type FROM project_classifications"
-        return self.execute_query(query, fetch=True)
\ No newline at end of file
+        return self.execute_query(query, fetch=True)
+
+    def get_import_state(self, kind):
+        """
+        Read the stored rows of an import kind in bulk.
+        :param kind: One of the IMPORT_STATE_QUERIES keys, e.g. 'investments'.
+        :return: A dictionary mapping key tuples to value tuples, e.g. (project_id, year) -> (investment_amount,).
+        """
+        query, key_width = IMPORT_STATE_QUERIES[kind]
+        state = {}
+        with self._cursor() as cur:
+            self.backend.execute(cur, query)
+            for row in cur.fetchall():
+                values = tuple(float(value) if isinstance(value, Decimal) else value for value in row.values())
+                state[values[:key_width]] = values[key_width:]
+        print(f"[DEBUG] Read {len(state)} stored {kind} rows.")
+        return state
+
+    def get_import_hashes(self, kind, scope):
+        """
+        Fetch the content hashes recorded by earlier imports.
+        :param kind: The import kind, e.g. 'investments'.
+        :param scope: 'file' for whole files or 'project' for the rows of one project.
+        :return: A dictionary mapping file paths or project IDs to hashes.
+        """
+        query = "SELECT item, content_hash FROM import_hashes WHERE kind = %s AND scope = %s"
+        with self._cursor() as cur:
+            self.backend.execute(cur, query, (kind, scope))
+            return {row['item']: row['content_hash'] for row in cur.fetchall()}
+
+    def save_import_hashes(self, kind, scope, hashes):
+        """
+        Record content hashes of imported files or projects.
+        :param kind: The import kind, e.g. 'investments'.
+        :param scope: 'file' or 'project'.
+        :param hashes: A dictionary mapping file paths or project IDs to hashes.
+        """
+        if not hashes:
+            return
+        query = """
+            INSERT INTO import_hashes (kind, scope, item, content_hash)
+            VALUES %s
+            ON CONFLICT (kind, scope, item) DO UPDATE
+            SET content_hash = EXCLUDED.content_hash,
+                imported_at = CURRENT_TIMESTAMP;
+        """
+        with self._cursor() as cur:
+            self.backend.execute_values(cur, query, [(kind, scope, item, content_hash) for item, content_hash in hashes.items()])
+
+    def invalidate_project_cache(self, project_ids=None):
+        """
+        Drop cached project rows and depreciation method details.
+        :param project_ids: The project IDs to invalidate, or None to clear the caches entirely.
+        """
+        if self._active_cursor is not None:
+            # Readers keep the old rows, and the old ETags, until the transaction commits
+            if project_ids is None or self._pending_projects is None:
+                self._pending_projects = None
+            else:
+                self._pending_projects.update(project_ids)
+            return
+        DatabaseService._invalidate_projects(project_ids)
+
+    @staticmethod
+    def _invalidate_projects(project_ids):
+        # Per-project versions let API clients revalidate a single project without a query
+        data_versions.bump_keys("projects", project_ids)
+        if project_ids is None:
+            DatabaseService.project_cache.invalidate()
+            DatabaseService.method_details_cache.invalidate()
+            return
+
+        for project_id in project_ids:
+            DatabaseService.project_cache.invalidate(project_id)
+            DatabaseService.method_details_cache.invalidate(project_id)
+
+    def invalidate_caches(self):
+        """
+        Drop every cached read and bump the data versions of every table, e.g. after the tables were cleared
+        outside DatabaseService.
+        """
+        self._written(*SCHEMA_TABLES)
+        self.invalidate_project_cache()
+        DatabaseService.depreciation_methods_cache.invalidate()
+
+    @staticmethod
+    def cache_stats():
+        """
+        Report hit and miss counters of the read-through caches.
+        :return: A dictionary keyed by cache name.
+        """
+        return {
+            "projects": DatabaseService.project_cache.stats(),
+            "method_details": DatabaseService.method_details_cache.stats(),
+            "depreciation_methods": DatabaseService.depreciation_methods_cache.stats(),
+        }
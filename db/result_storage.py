@@ -0,0 +1,81 @@
+import math
+import os
+import struct
+
+# "rows" keeps one calculated_depreciations row per (project, year);
+# "compact" stores one calculated_depreciation_arrays row per project and run
+RESULT_STORAGE = os.getenv("DEPRECIATION_RESULT_STORAGE", "rows")
+
+# Run ID holding the current results in the compact table
+CURRENT_RUN_ID = 0
+
+
+def pack_values(values):
+    """
+    Pack a sequence of floats into little-endian float64 bytes for a bytea column.
+    Missing values are stored as NaN.
+    :param values: A sequence of floats or None.
+    :return: The packed bytes.
+    """
+    values = [math.nan if value is None else float(value) for value in values]
+    return struct.pack(f"<{len(values)}d", *values)
+
+
+def unpack_values(data):
+    """
+    Unpack bytes written by pack_values.
+    :param data: bytes or a memoryview as returned by the database driver.
+    :return: A list of floats, with NaN for missing values.
+    """
+    data = bytes(data)
+    return list(struct.unpack(f"<{len(data) // 8}d", data))
+
+
+def to_year_arrays(rows):
+    """
+    Convert per-year results into a start year and dense arrays covering every year in between.
+    :param rows: An iterable of (year, depreciation_value, remaining_value) tuples.
+    :return: A tuple (start_year, depreciation_values, remaining_values); start_year is None for no rows.
+    """
+    by_year = {int(year): (depreciation, remaining) for year, depreciation, remaining in rows}
+    if not by_year:
+        return None, [], []
+
+    start_year, end_year = min(by_year), max(by_year)
+    depreciation_values, remaining_values = [], []
+    for year in range(start_year, end_year + 1):
+        depreciation, remaining = by_year.get(year, (None, None))
+        depreciation_values.append(depreciation)
+        remaining_values.append(remaining)
+    return start_year, depreciation_values, remaining_values
+
+
+def group_year_arrays(rows):
+    """
+    Group per-year result rows by project into compact arrays.
+    :param rows: An iterable of dictionaries with project_id, year, depreciation_value and remaining_value.
+    :return: A list of tuples (project_id, start_year, depreciation_values, remaining_values).
+    """
+    per_project = {}
+    for row in rows:
+        per_project.setdefault(row['project_id'], []).append((row['year'], row['depreciation_value'], row['remaining_value']))
+    return [(project_id, *to_year_arrays(project_rows)) for project_id, project_rows in per_project.items()]
+
+
+def expand_year_arrays(start_year, depreciation_data, remaining_data):
+    """
+    Expand a compact result row back into per-year dictionaries, skipping padding gaps.
+    :return: A list of dictionaries with year, depreciation_value and remaining_value.
+    """
+    rows = []
+    depreciation_values = unpack_values(depreciation_data)
+    remaining_values = unpack_values(remaining_data)
+    for offset, (depreciation, remaining) in enumerate(zip(depreciation_values, remaining_values)):
+        if math.isnan(remaining):
+            continue
+        rows.append({
+            "year": start_year + offset,
+            "depreciation_value": None if math.isnan(depreciation) else depreciation,
+            "remaining_value": remaining,
+        })
+    return rows
@@ -5,6 +5,7 @@ from tkinter import messagebox
 import os
 import psycopg2
 from dotenv import load_dotenv
+from db.database_service import DatabaseService
 
 # Load environment variables
 load_dotenv()
@@ -51,6 +52,9 @@ def clean_database():
             cur.close()
             conn.close()
 
+            # Cached projects, reports and the portfolio cube would still show the dropped data
+            DatabaseService().invalidate_caches()
+
             update_status("Database cleaning completed successfully!")
 
         except Exception as e:
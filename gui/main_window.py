@@ -1,9 +1,11 @@
 import tkinter as tk
 from tkinter import ttk
+from tkinter import messagebox
 from .save_project_window import open_save_project_window
 from .open_project_window import open_open_project_window
 from .setup_window import setup_database_window, setup_depreciation_window
 from services.project_service import ProjectService  # Import the ProjectService class
+from services.job_service import JobService
 import os
 import psycopg2
 from dotenv import load_dotenv
@@ -14,6 +16,30 @@ load_dotenv()
 # Global variable for the last depreciation calculation year, changed in the future
 last_depreciation_year = None
 
+# Milliseconds between checks of a background job's state
+JOB_POLL_INTERVAL_MS = 500
+
+def run_job(widget, title, job_type, **parameters):
+    """
+    Run a report or calculation on the job worker pool and tell the user when it has finished.
+    The job's state is polled from the Tk event loop, so the window stays responsive meanwhile.
+    :param widget: Any widget of the running application, used to schedule the polling.
+    :param title: The title of the message shown when the job finishes.
+    :param job_type: One of the JobService job types.
+    """
+    job = JobService.submit(job_type, **parameters)
+
+    def poll():
+        if not job.finished:
+            widget.after(JOB_POLL_INTERVAL_MS, poll)
+        elif job.state == "completed":
+            messagebox.showinfo(title, f"Finished in {job.duration_seconds:.1f} s." + (f"\nSaved to {job.output_path}" if job.output_path else ""))
+        else:
+            messagebox.showerror(title, f"Failed: {job.error}")
+
+    widget.after(JOB_POLL_INTERVAL_MS, poll)
+    return job
+
 def connect_to_db():
     try:
         db_url = os.getenv("DATABASE_URL")
@@ -126,7 +152,7 @@ def open_generate_report_window():
     def generate_report():
         try:
             selected_year = int(year_combobox.get())
-            ProjectService.generate_report(transform=True, last_year=selected_year)
+            run_job(report_window.master, "Generate Report", "project_report", transform=True, last_year=selected_year)
             report_window.destroy()
         except ValueError:
             error_label.config(text="Please select a valid year.")
@@ -178,6 +204,7 @@ def main_window():
     investment_menu.add_command(label="Read Project Classifications from Excel", command=ProjectService.read_project_classifications_from_excel)
     investment_menu.add_command(label="Read Investments from Excel", command=ProjectService.read_investments_from_excel)
     investment_menu.add_command(label="Read Depreciation Years from Excel", command=ProjectService.read_depreciation_years_from_excel)
+    investment_menu.add_command(label="Import Portfolio Workbook", command=ProjectService.read_portfolio_from_excel)
     menu_bar.add_cascade(label="Investment Projects", menu=investment_menu)
 
     # Add Setup and Maintenance menu
@@ -188,7 +215,7 @@ def main_window():
 
     # Add Depreciation Calculation menu
     depreciation_menu = tk.Menu(menu_bar, tearoff=0)
-    depreciation_menu.add_command(label="Calculate Depreciation", command=ProjectService.calculate_depreciation_for_all_projects)
+    depreciation_menu.add_command(label="Calculate Depreciation", command=lambda: run_job(root, "Calculate Depreciation", "calculation", in_place=True))
     depreciation_menu.add_command(label="Define Last Depreciation Calculation Year", command=define_last_depreciation_year)
     menu_bar.add_cascade(label="Depreciation Calculation", menu=depreciation_menu)
 
@@ -197,11 +224,11 @@ def main_window():
     
     reporting_menu.add_command(
         label="Create Investment Depreciation Report",
-        command=ProjectService.create_investment_depreciation_report
+        command=lambda: run_job(root, "Investment Depreciation Report", "depreciation_report")
     )
     reporting_menu.add_command(
         label="Group Projects by Importance",
-        command=ProjectService.group_projects_by_importance
+        command=lambda: run_job(root, "Group Projects by Importance", "importance_report")
     )
     menu_bar.add_cascade(label="Reporting", menu=reporting_menu)
 
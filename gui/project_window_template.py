@@ -1,3 +1,4 @@
+import threading
 import tkinter as tk
 from tkinter import ttk
 from services.project_service import DatabaseService
@@ -119,6 +120,17 @@ def display_project_window(project):
             checkbox.grid(row=9, column=idx + 1, padx=5, pady=5)
             investment_checkboxes.append((investment["year"], var))
 
+        # Fetch whether depreciations are calculated for the project
+        has_depreciations = db_service.has_calculated_depreciations(project['project_id'])
+
+        # Recalculate on save by default when the project already has calculated depreciations
+        recalculate_var = tk.BooleanVar(value=has_depreciations)
+        recalculate_checkbox = ttk.Checkbutton(details_frame, text="Recalculate depreciations on save", variable=recalculate_var)
+        recalculate_checkbox.grid(row=10, column=0, columnspan=len(investments) + 1, sticky=tk.W, padx=5, pady=5)
+
+        save_status_label = ttk.Label(details_frame, text="")
+        save_status_label.grid(row=14, column=0, columnspan=len(investments) + 1, sticky=tk.W, padx=5, pady=5)
+
         def save_changes():
             updated_investments = {}
             for (year, entry), (_, var) in zip(investment_entries, investment_checkboxes):
@@ -127,16 +139,39 @@ def display_project_window(project):
                 except ValueError:
                     updated_investments[year] = (0.0, None)
 
+            recalculate = recalculate_var.get()
             print(f"Saving updated investments for project ID {project['project_id']}: {updated_investments}")
-            db_service.save_investment_details(project['project_id'], updated_investments)
-            print("Investments and depreciation start years updated successfully.")
+            save_changes_button.config(state="disabled")
+            save_status_label.config(text="Saving...")
+
+            # Set by the worker thread; Tk widgets may only be touched from the main thread, which polls it
+            outcome = {}
+
+            def poll():
+                if not project_window.winfo_exists():
+                    return
+                if "message" not in outcome:
+                    project_window.after(100, poll)
+                    return
+                save_changes_button.config(state="normal")
+                save_status_label.config(text=outcome["message"])
+
+            def worker():
+                try:
+                    ProjectService.save_project_investments(project['project_id'], updated_investments, recalculate=recalculate)
+                    print("Investments and depreciation start years updated successfully.")
+                    outcome["message"] = "Changes saved and depreciations recalculated." if recalculate else "Changes saved."
+                except Exception as e:
+                    print(f"[ERROR] Failed to save investments for project ID {project['project_id']}: {e}")
+                    outcome["message"] = f"Save failed: {e}"
+
+            # Run the database round trip off the Tk thread so the window stays responsive
+            threading.Thread(target=worker, daemon=True).start()
+            project_window.after(100, poll)
 
         save_changes_button = ttk.Button(details_frame, text="Save Changes", command=save_changes)
         save_changes_button.grid(row=11, column=0, columnspan=len(investments) + 1, pady=10)
 
-        # Fetch whether depreciations are calculated for the project
-        has_depreciations = db_service.has_calculated_depreciations(project['project_id'])
-
         # Set button text based on depreciation status
         button_text = "Recalculate Depreciations" if has_depreciations else "No Depreciations Calculated"
 
@@ -12,12 +12,64 @@ FLASK_URL = os.getenv("FLASK_URL", "http://127.0.0.1:5000")
 
 # run.py
 from gui.main_window import main_window
-from flask import Flask, jsonify, request
-from services.project_service import ProjectService
-from db.database_service import DatabaseService
+import hashlib
+import json
+import time
+from decimal import Decimal
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context, url_for
+from models.project_model import Project
+from services.project_service import ProjectService, BULK_PROJECT_BATCH_SIZE
+from services.job_service import JobService
+from services.export_service import ExportService, EXPORT_FORMATS
+from db.database_service import DatabaseService, CACHE_TTL
+from db.cache import TTLCache, data_versions
 
 app = Flask(__name__)
 
+# Serialized report payloads, keyed on the request and the data versions they were built from
+REPORT_CACHE = TTLCache(maxsize=int(os.getenv("REPORT_CACHE_SIZE", "64")), ttl=CACHE_TTL)
+
+# Tables the project totals report reads
+REPORT_TABLES = ("projects", "investments", "calculated_depreciations", "calculated_depreciation_arrays")
+
+def make_etag(*parts):
+    """
+    Build an ETag from data versions and request parameters. The versions only see writes made by this
+    process, so the tag also changes once per cache time-to-live to pick up changes made elsewhere.
+    With caching disabled (a time-to-live of 0) the tag changes on every request.
+    """
+    epoch = int(time.time() // CACHE_TTL) if CACHE_TTL > 0 else time.time_ns()
+    return hashlib.sha1(repr((*parts, epoch)).encode("utf-8")).hexdigest()
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+def json_default(value):
+    # NUMERIC columns arrive as Decimal from Postgres
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def cached_report(tables, build):
+    """
+    Answer a report request from the report cache, or with 304 when the client's copy is still current.
+    Neither path touches the database unless the tables the report reads were written to.
+    :param tables: The tables the report reads.
+    :param build: A callable returning the JSON-serializable payload.
+    """
+    key = (request.path, tuple(sorted(request.args.items(multi=True))))
+    etag = make_etag(key, data_versions.get(*tables))
+    if etag in request.if_none_match:
+        return not_modified(etag)
+
+    body = REPORT_CACHE.get_or_load((key, etag), lambda: json.dumps(build(), default=json_default))
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 @app.route('/api/projects', methods=['POST'])
 def create_project():
     data = request.json
@@ -26,24 +78,135 @@ def create_project():
             project_id=data['project_id'],
             branch=data['branch'],
             operations=data['operations'],
-            description=data['description']
+            description=data['description'],
+            depreciation_method=data.get('depreciation_method')
         )
         ProjectService.save_to_database(project)
         return jsonify({"message": "Project saved successfully."}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def iter_ndjson(stream):
+    """
+    Parse an NDJSON body line by line without reading it whole; malformed lines become ValueError items.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"line {line_number}: invalid JSON: {e}")
+
+@app.route('/api/projects/bulk', methods=['POST'])
+def create_projects_bulk():
+    """
+    Save many projects at once. The body is either a JSON array, answered with a JSON summary, or NDJSON
+    (one project per line), answered with one NDJSON result per line as each batch is written.
+    """
+    batch_size = request.args.get('batch_size', default=BULK_PROJECT_BATCH_SIZE, type=int)
+
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        def generate():
+            for result in ProjectService.save_projects_bulk(iter_ndjson(request.stream), batch_size=batch_size):
+                yield json.dumps(result) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        return jsonify({"error": "Expected a JSON array of projects or an application/x-ndjson body."}), 400
+    try:
+        results = list(ProjectService.save_projects_bulk(items, batch_size=batch_size))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    counts = {status: sum(1 for result in results if result["status"] == status) for status in ("saved", "rejected", "failed")}
+    status_code = 201 if counts["saved"] == len(results) else 207
+    return jsonify({**counts, "results": results}), status_code
+
 @app.route('/api/projects/<project_id>', methods=['GET'])
 def get_project(project_id):
+    etag = make_etag("project", project_id, data_versions.get_key("projects", project_id))
+    if etag in request.if_none_match:
+        return not_modified(etag)
     try:
         project = ProjectService.load_from_database(project_id)
         if project:
-            return jsonify(project.__dict__), 200
+            response = jsonify(project.__dict__)
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response, 200
         else:
             return jsonify({"error": "Project not found."}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/projects/<project_id>/depreciation', methods=['POST'])
+def calculate_project_depreciation(project_id):
+    if DatabaseService().load_project(project_id) is None:
+        return jsonify({"error": "Project not found."}), 404
+    try:
+        df = ProjectService.recalculate_project(project_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    schedule = [
+        {"year": int(year), "investment_amount": float(investment), "depreciation": float(depreciation), "remaining_value": float(remaining)}
+        for year, investment, depreciation, remaining in zip(
+            df["year"].tolist(), df["investment amount"].tolist(), df["depreciation"].tolist(), df["remaining asset value"].tolist()
+        )
+    ]
+    return jsonify({"project_id": project_id, "schedule": schedule}), 200
+
+@app.route('/api/depreciation/runs', methods=['POST'])
+def start_depreciation_run():
+    """
+    Start a portfolio-wide calculation run in the background. The returned job ID is polled at
+    /api/depreciation/runs/<job_id>; the run ID appears in the job details once the run has started.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        batch_size = int(data.get('batch_size', 200))
+        workers = int(data.get('workers', 1))
+        if batch_size < 1 or workers < 1:
+            raise ValueError("batch_size and workers must be at least 1.")
+        publish = data.get('publish', True)
+        # bool("false") is True, so strings are not accepted
+        if not isinstance(publish, bool):
+            raise ValueError("publish must be true or false.")
+        job = JobService.submit(
+            "calculation",
+            publish=publish,
+            batch_size=batch_size,
+            workers=workers,
+            parameters={"source": "api", **(data.get('parameters') or {})},
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    status_url = f"/api/depreciation/runs/{job.job_id}"
+    return jsonify({"job_id": job.job_id, "status_url": status_url, **job.to_dict()}), 202, {"Location": status_url}
+
+@app.route('/api/depreciation/runs', methods=['GET'])
+def list_depreciation_runs():
+    limit = request.args.get('limit', default=20, type=int)
+    try:
+        return jsonify(DatabaseService().get_calculation_runs(limit=limit)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/depreciation/runs/<job_id>', methods=['GET'])
+def get_depreciation_run(job_id):
+    job = JobService.get_job(job_id)
+    if job is None or job.job_type != "calculation":
+        return jsonify({"error": "Calculation job not found."}), 404
+    status = job.to_dict()
+    # Shown while the run is in progress: projects done, projects per second, error count and run ID
+    status["run_id"] = job.details.get("run_id")
+    return jsonify(status), 200
+
 @app.route('/api/database/setup', methods=['POST'])
 def setup_database():
     try:
@@ -54,34 +217,138 @@ def setup_database():
 
 @app.route('/api/projects/search', methods=['GET'])
 def search_projects():
-    project_id = request.args.get('project_id')
-    branch = request.args.get('branch')
-    operations = request.args.get('operations')
-    description = request.args.get('description')
+    """
+    Search projects one page at a time. Pass the returned next_cursor as 'after' to get the next page;
+    'fields' is a comma-separated column list and 'total=true' adds the number of matching projects.
+    """
+    filters = {name: request.args.get(name) for name in ('project_id', 'branch', 'operations', 'description')}
+    fields = request.args.get('fields')
 
     try:
-        query = "SELECT * FROM projects WHERE TRUE"
-        params = []
-
-        if project_id:
-            query += " AND project_id = %s"
-            params.append(project_id)
-        if branch:
-            query += " AND branch ILIKE %s"
-            params.append(f"%{branch}%")
-        if operations:
-            query += " AND operations ILIKE %s"
-            params.append(f"%{operations}%")
-        if description:
-            query += " AND description ILIKE %s"
-            params.append(f"%{description}%")
-
-        db_service = DatabaseService()
-        results = db_service.execute_query(query, params, fetch=True)
-        return jsonify(results), 200
+        page = ProjectService.search_projects_page(
+            fields=[field.strip() for field in fields.split(',') if field.strip()] if fields else None,
+            after=request.args.get('after'),
+            limit=request.args.get('limit'),
+            with_total=request.args.get('total', '').lower() in ('1', 'true', 'yes'),
+            **filters,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    if page["next_cursor"] is not None:
+        args = {name: value for name, value in request.args.items() if name != 'after'}
+        page["next"] = url_for('search_projects', after=page["next_cursor"], **args)
+    return jsonify(page), 200
+
+@app.route('/api/exports/depreciations', methods=['GET'])
+def export_depreciations():
+    """
+    Stream every calculated depreciation as NDJSON (format=ndjson) or CSV (format=csv), optionally limited
+    to first_year..last_year and a branch, with project dimensions if dimensions=true. The response is
+    gzip-compressed on the fly when the client accepts it.
+    """
+    file_format = request.args.get('format', 'ndjson')
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported export format: {file_format}"}), 400
+
+    chunks = ExportService.iter_depreciations(
+        file_format,
+        first_year=request.args.get('first_year', type=int),
+        last_year=request.args.get('last_year', type=int),
+        branch=request.args.get('branch'),
+        with_dimensions=request.args.get('dimensions', '').lower() in ('1', 'true', 'yes'),
+    )
+    # The body depends on Accept-Encoding, so shared caches must not serve it to other clients
+    headers = {"Content-Disposition": f"attachment; filename=calculated_depreciations.{file_format}", "Vary": "Accept-Encoding"}
+    if request.accept_encodings["gzip"] > 0:
+        chunks = ExportService.gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[file_format], headers=headers)
+
+@app.route('/api/reports/totals', methods=['GET'])
+def report_totals():
+    """
+    Investment and depreciation totals per project up to last_year, per year if by_year=true.
+    """
+    last_year = request.args.get('last_year', type=int)
+    by_year = request.args.get('by_year', '').lower() in ('1', 'true', 'yes')
+    try:
+        return cached_report(REPORT_TABLES, lambda: DatabaseService().get_report_totals(last_year=last_year, by_year=by_year))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/reports/cube', methods=['GET'])
+def report_cube():
+    """
+    Roll up the portfolio cube, e.g. ?by=branch,year&measure=investment&importance=High.
+    Every other cube dimension given as a parameter (repeatable) filters the cells.
+    """
+    from services.cube_service import CubeService, CUBE_DIMENSIONS, CUBE_TABLES
+
+    by = [dimension.strip() for dimension in request.args.get('by', '').split(',') if dimension.strip()]
+    measure = request.args.get('measure', 'depreciation')
+    # Years and classification types are numbers; the other labels are text
+    filters = {
+        dimension: [int(value) if dimension in ("year", "type") and value.lstrip("-").isdigit() else value for value in request.args.getlist(dimension)]
+        for dimension in CUBE_DIMENSIONS if dimension in request.args
+    }
+
+    def build():
+        cube = CubeService.get_cube()
+        if not by:
+            return {"measure": measure, "total": cube.total(measure, **filters)}
+        totals = cube.rollup(by, measure, **filters)
+        return {
+            "measure": measure,
+            "by": by,
+            "rows": [
+                {**dict(zip(by, labels if isinstance(labels, tuple) else (labels,))), "value": value}
+                for labels, value in totals.items()
+            ],
+        }
+
+    try:
+        return cached_report(CUBE_TABLES, build)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    data = request.get_json(silent=True) or {}
+    try:
+        job = JobService.submit(data.get('type'), **(data.get('parameters') or {}))
+        return jsonify(job.to_dict()), 202, {"Location": f"/api/jobs/{job.job_id}"}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    limit = request.args.get('limit', default=50, type=int)
+    jobs = JobService.list_jobs(state=request.args.get('state'), limit=limit)
+    return jsonify([job.to_dict() for job in jobs]), 200
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = JobService.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/api/jobs/<job_id>/output', methods=['GET'])
+def get_job_output(job_id):
+    job = JobService.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    if job.state != "completed" or not job.output_path:
+        return jsonify({"error": f"Job has no output yet (state: {job.state})."}), 409
+    return send_file(job.output_path, as_attachment=True)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "ok"}), 200
@@ -0,0 +1,339 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from db.cache import data_versions
+from db.database_service import DatabaseService
+from services.project_service import ProjectService
+
+# Dimensions of the cube in axis order; year is always the last axis
+CATEGORY_DIMENSIONS = ("importance", "type", "branch", "operations")
+CUBE_DIMENSIONS = (*CATEGORY_DIMENSIONS, "year")
+
+# Measures, stored along the first axis of the cube
+CUBE_MEASURES = ("depreciation", "investment")
+
+# Tables the cube is derived from; a write to any of them outside CubeService makes the cube stale
+CUBE_TABLES = (
+    "projects", "project_classifications", "classification_descriptions",
+    "investments", "calculated_depreciations", "calculated_depreciation_arrays",
+)
+
+
+def _label(value):
+    # Projects without a classification have NaN labels, which never compare equal
+    if pd.isna(value):
+        return None
+    # Plain Python labels keep rollup keys hashable and JSON-serializable
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class PortfolioCube:
+    """
+    Depreciation and investment totals precomputed by importance, type, branch, operations and year.
+    The totals are held in one dense NumPy array with a dictionary of labels per dimension, so slices
+    and rollups never touch the result tables. Each project's contribution is kept as well, which lets
+    a recalculated project replace its old totals without rebuilding the cube.
+    """
+
+    def __init__(self, first_year=None):
+        self.labels = {dimension: [] for dimension in CATEGORY_DIMENSIONS}
+        self.positions = {dimension: {} for dimension in CATEGORY_DIMENSIONS}
+        self.first_year = first_year
+        self.values = np.zeros((len(CUBE_MEASURES), 0, 0, 0, 0, 0))
+        self.versions = None
+        self.db_url = None
+        self._projects = {}
+        self._lock = threading.RLock()
+
+    @property
+    def years(self):
+        if self.first_year is None:
+            return []
+        return list(range(self.first_year, self.first_year + self.values.shape[-1]))
+
+    def _grow(self, axis, before=0, after=0):
+        padding = [(0, 0)] * self.values.ndim
+        padding[axis] = (before, after)
+        self.values = np.pad(self.values, padding)
+
+    def _position(self, dimension, label):
+        """
+        Return the axis position of a category label, adding the label when it is new.
+        """
+        positions = self.positions[dimension]
+        if label not in positions:
+            positions[label] = len(self.labels[dimension])
+            self.labels[dimension].append(label)
+            self._grow(1 + CATEGORY_DIMENSIONS.index(dimension), after=1)
+        return positions[label]
+
+    def _year_positions(self, years):
+        """
+        Return the axis positions of an array of years, widening the year axis to cover them.
+        """
+        if len(years) == 0:
+            return years
+        first, last = int(years.min()), int(years.max())
+        if self.first_year is None:
+            self.first_year = first
+        if first < self.first_year:
+            self._grow(-1, before=self.first_year - first)
+            # Contributions store positions relative to the first year
+            shift = self.first_year - first
+            self._projects = {
+                project_id: (cell, year_positions + shift, values)
+                for project_id, (cell, year_positions, values) in self._projects.items()
+            }
+            self.first_year = first
+        end = self.first_year + self.values.shape[-1] - 1
+        if last > end:
+            self._grow(-1, after=last - end)
+        return years - self.first_year
+
+    def _add(self, cell, year_positions, values, sign=1.0):
+        for measure in range(len(CUBE_MEASURES)):
+            np.add.at(self.values[(measure, *cell)], year_positions, sign * values[measure])
+
+    def set_project(self, project_id, dimensions, years, depreciations, investments):
+        """
+        Replace a project's contribution to the totals.
+        :param project_id: The ID of the project.
+        :param dimensions: A dictionary with the project's importance, type, branch and operations.
+        :param years: The years of the project's results.
+        :param depreciations: The depreciation per year.
+        :param investments: The investment amount per year.
+        """
+        years = np.asarray(years, dtype=np.int64)
+        values = np.nan_to_num(np.vstack([
+            np.asarray(depreciations, dtype=float),
+            np.asarray(investments, dtype=float),
+        ]))
+        with self._lock:
+            self.remove_project(project_id)
+            cell = tuple(self._position(dimension, _label(dimensions.get(dimension))) for dimension in CATEGORY_DIMENSIONS)
+            year_positions = self._year_positions(years)
+            self._add(cell, year_positions, values)
+            self._projects[project_id] = (cell, year_positions, values)
+
+    def remove_project(self, project_id):
+        """
+        Subtract a project's contribution, e.g. after the project was deleted.
+        """
+        with self._lock:
+            contribution = self._projects.pop(project_id, None)
+            if contribution is not None:
+                self._add(*contribution, sign=-1.0)
+
+    def _select(self, measure, filters):
+        """
+        Take the measure's sub-array matching the filters.
+        :return: A tuple (array, labels) where labels holds the remaining labels of every dimension.
+        """
+        if measure not in CUBE_MEASURES:
+            raise ValueError(f"Unknown measure: {measure}")
+        unknown = set(filters) - set(CUBE_DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions: {', '.join(sorted(unknown))}")
+
+        array = self.values[CUBE_MEASURES.index(measure)]
+        labels = {**{dimension: list(self.labels[dimension]) for dimension in CATEGORY_DIMENSIONS}, "year": self.years}
+        for axis, dimension in enumerate(CUBE_DIMENSIONS):
+            if dimension not in filters:
+                continue
+            wanted = filters[dimension]
+            if not isinstance(wanted, (list, tuple, set)):
+                wanted = [wanted]
+            selected = [label for label in labels[dimension] if label in wanted]
+            positions = [labels[dimension].index(label) for label in selected]
+            array = array.take(positions, axis=axis)
+            labels[dimension] = selected
+        return array, labels
+
+    def total(self, measure="depreciation", **filters) -> float:
+        """
+        Sum a measure over every cell matching the filters.
+        :param measure: 'depreciation' or 'investment'.
+        :param filters: Dimension values to keep, e.g. branch="North" or year=[2024, 2025].
+        """
+        with self._lock:
+            array, _ = self._select(measure, filters)
+            return float(array.sum())
+
+    def rollup(self, by, measure="depreciation", **filters) -> dict:
+        """
+        Sum a measure by one or more dimensions.
+        :param by: A dimension name or a sequence of dimension names, e.g. ("branch", "year").
+        :param measure: 'depreciation' or 'investment'.
+        :param filters: Dimension values to keep, e.g. importance="Critical".
+        :return: A dictionary mapping labels (a tuple of labels for several dimensions) to non-zero totals.
+        """
+        single = isinstance(by, str)
+        by = (by,) if single else tuple(by)
+        unknown = set(by) - set(CUBE_DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions: {', '.join(sorted(unknown))}")
+
+        with self._lock:
+            array, labels = self._select(measure, filters)
+            axes = [CUBE_DIMENSIONS.index(dimension) for dimension in by]
+            summed = array.sum(axis=tuple(axis for axis in range(len(CUBE_DIMENSIONS)) if axis not in axes))
+            # The summed array keeps the cube's axis order; reorder it to the requested one
+            summed = np.transpose(summed, np.argsort(np.argsort(axes)))
+            totals = {}
+            for index in zip(*np.nonzero(summed)):
+                key = tuple(labels[dimension][position] for dimension, position in zip(by, index))
+                totals[key[0] if single else key] = float(summed[index])
+            return totals
+
+    def frame(self, rows, measure="depreciation", **filters) -> pd.DataFrame:
+        """
+        Return a rollup as a pivot with one column per year, like the Excel reports.
+        :param rows: The dimensions forming the index, e.g. ("importance", "branch", "operations").
+        """
+        rows = (rows,) if isinstance(rows, str) else tuple(rows)
+        totals = self.rollup((*rows, "year"), measure, **filters)
+        series = pd.Series(totals, dtype=float)
+        if series.empty:
+            return pd.DataFrame(index=pd.MultiIndex.from_arrays([[] for _ in rows], names=rows))
+        series.index.names = [*rows, "year"]
+        return series.unstack("year", fill_value=0.0).sort_index()
+
+
+class CubeService:
+    # The cube of the current results, rebuilt after a full calculation run and patched per project
+    cube = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def build_cube(dimensions: pd.DataFrame, results: pd.DataFrame) -> PortfolioCube:
+        """
+        Build a cube from per-year results.
+        :param dimensions: The portfolio dimension frame (see ProjectService.build_portfolio_dimensions).
+        :param results: A DataFrame with project_id, year, depreciation and investment columns.
+        """
+        cube = PortfolioCube()
+        merged = results.merge(dimensions[["project_id", *CATEGORY_DIMENSIONS]], on="project_id", how="inner")
+        if merged.empty:
+            return cube
+
+        years = merged["year"].to_numpy(dtype=np.int64)
+        cube._year_positions(np.array([years.min(), years.max()]))
+        depreciations = merged["depreciation"].to_numpy(dtype=float)
+        investments = merged["investment"].to_numpy(dtype=float)
+        for project_id, index in merged.groupby("project_id", sort=False, observed=True).indices.items():
+            first = merged.iloc[index[0]]
+            cube.set_project(
+                project_id,
+                {dimension: first[dimension] for dimension in CATEGORY_DIMENSIONS},
+                years[index],
+                depreciations[index],
+                investments[index],
+            )
+        print(f"[INFO] Built portfolio cube for {len(cube._projects)} projects with shape {cube.values.shape}.")
+        return cube
+
+    @staticmethod
+    def load_results(db_service) -> pd.DataFrame:
+        """
+        Read the current depreciations and investments per project and year.
+        :return: A DataFrame with project_id, year, depreciation and investment columns.
+        """
+        depreciations = pd.DataFrame(db_service.get_all_calculated_depreciations(), columns=["project_id", "year", "depreciation_value"])
+        investments = pd.DataFrame(db_service.get_all_investments(), columns=["project_id", "year", "investment_amount"])
+        results = depreciations.merge(investments, on=["project_id", "year"], how="outer")
+        return pd.DataFrame({
+            "project_id": results["project_id"],
+            "year": results["year"].astype("int64"),
+            "depreciation": pd.to_numeric(results["depreciation_value"], errors="coerce").fillna(0.0),
+            "investment": pd.to_numeric(results["investment_amount"], errors="coerce").fillna(0.0),
+        })
+
+    @staticmethod
+    def _stamp(cube, db_service):
+        cube.db_url = db_service.db_url
+        cube.versions = data_versions.get(*CUBE_TABLES)
+        CubeService.cube = cube
+        return cube
+
+    @staticmethod
+    def current_versions():
+        """
+        :return: The data versions of the tables the cube is derived from. Capture them before writing a
+            project's results and pass them to update_project.
+        """
+        return data_versions.get(*CUBE_TABLES)
+
+    @staticmethod
+    def get_cube(db_service=None) -> PortfolioCube:
+        """
+        Return the cube of the current results, rebuilding it from the database only when the tables it is
+        derived from were written to by something other than CubeService.
+        :param db_service: An optional DatabaseService to read through.
+        """
+        db_service = db_service or DatabaseService()
+        with CubeService._lock:
+            cube = CubeService.cube
+            if cube is not None and cube.db_url == db_service.db_url and cube.versions == data_versions.get(*CUBE_TABLES):
+                return cube
+
+            print("[INFO] Portfolio cube is missing or stale, rebuilding it from the database.")
+            cube = CubeService.build_cube(ProjectService.get_portfolio_dimensions(db_service), CubeService.load_results(db_service))
+            return CubeService._stamp(cube, db_service)
+
+    @staticmethod
+    def publish_results(results: pd.DataFrame, db_service=None) -> PortfolioCube:
+        """
+        Replace the cube after a full recalculation, from the results already in memory.
+        Call this after the results were written so the cube is stamped with the new data versions.
+        :param results: A DataFrame with project_id, year, depreciation and investment columns.
+        """
+        db_service = db_service or DatabaseService()
+        with CubeService._lock:
+            cube = CubeService.build_cube(ProjectService.get_portfolio_dimensions(db_service), results)
+            return CubeService._stamp(cube, db_service)
+
+    @staticmethod
+    def update_project(project_id: str, df: pd.DataFrame, db_service=None, versions=None):
+        """
+        Patch the cube after one project was recalculated and its results written.
+        Nothing is done when no cube has been built yet; the first query builds it. The cube is only patched
+        when it was current before this write; if anything else was written since it was built, patching and
+        re-stamping it would hide that write, so the cube is dropped instead.
+        :param project_id: The ID of the project.
+        :param df: The calculated depreciation DataFrame (see ProjectService.compute_depreciation).
+        :param versions: The result of current_versions() taken before the project's results were written.
+        """
+        db_service = db_service or DatabaseService()
+        with CubeService._lock:
+            cube = CubeService.cube
+            if cube is None or cube.db_url != db_service.db_url:
+                return
+            if versions is None or cube.versions != versions:
+                print("[INFO] Portfolio cube was stale before the project was recalculated, dropping it.")
+                CubeService.cube = None
+                return
+
+            dimensions = ProjectService.get_portfolio_dimensions(db_service)
+            project = dimensions[dimensions["project_id"] == project_id]
+            if project.empty:
+                cube.remove_project(project_id)
+            else:
+                first = project.iloc[0]
+                cube.set_project(
+                    project_id,
+                    {dimension: first[dimension] for dimension in CATEGORY_DIMENSIONS},
+                    df["year"].to_numpy(),
+                    df["depreciation"].to_numpy(),
+                    df["investment amount"].to_numpy(),
+                )
+            CubeService._stamp(cube, db_service)
+
+    @staticmethod
+    def invalidate():
+        """
+        Drop the cube so the next query rebuilds it.
+        """
+        with CubeService._lock:
+            CubeService.cube = None
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import zlib
+from decimal import Decimal
+
+from db.database_service import DatabaseService, EXPORT_DIMENSION_COLUMNS
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+EXPORT_COLUMNS = ["project_id", "year", "depreciation_value", "remaining_value"]
+
+
+def _plain(value):
+    # NUMERIC columns arrive as Decimal from Postgres, which neither json nor csv should quote
+    return float(value) if isinstance(value, Decimal) else value
+
+
+class ExportService:
+    @staticmethod
+    def iter_depreciations(file_format="ndjson", first_year=None, last_year=None, branch=None, with_dimensions=False, batch_size=5000):
+        """
+        Export the current calculated depreciations as text chunks, one chunk per fetched batch.
+        Rows come from a server-side cursor, so memory use does not grow with the size of the export.
+        :param file_format: 'ndjson' for one JSON object per line or 'csv' with a header row.
+        :param first_year: Leave out earlier years.
+        :param last_year: Leave out later years.
+        :param branch: Only export projects of this branch.
+        :param with_dimensions: Add branch, operations, importance and type columns.
+        :param batch_size: Rows fetched per round trip.
+        :return: A generator of str chunks.
+        """
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {file_format}")
+
+        columns = EXPORT_COLUMNS + (list(EXPORT_DIMENSION_COLUMNS) if with_dimensions else [])
+        batches = DatabaseService().iter_depreciation_export(
+            first_year=first_year, last_year=last_year, branch=branch, with_dimensions=with_dimensions, batch_size=batch_size
+        )
+
+        if file_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue()
+            for rows in batches:
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([_plain(row[column]) for column in columns] for row in rows)
+                yield buffer.getvalue()
+            return
+
+        for rows in batches:
+            yield "".join(json.dumps({column: _plain(row[column]) for column in columns}) + "\n" for row in rows)
+
+    @staticmethod
+    def gzip_chunks(chunks, level=6):
+        """
+        Compress a stream of text chunks into one gzip stream without buffering it.
+        :param chunks: An iterable of str chunks.
+        :param level: The zlib compression level.
+        :return: A generator of bytes chunks.
+        """
+        # wbits=31 writes the gzip header and trailer
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode("utf-8"))
+            if data:
+                yield data
+        yield compressor.flush()
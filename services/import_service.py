@@ -0,0 +1,393 @@
+import glob
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from db.database_service import DatabaseService
+from services.project_service import ProjectService
+from services.validation_service import ValidationService, PROJECT_REFERENCES
+
+# Listed in dependency order: classifications and investments reference projects, depreciation years update investments
+IMPORT_KINDS = ("projects", "classifications", "investments", "depreciation_years")
+
+# Accepted worksheet names of a portfolio workbook, after lower-casing and replacing spaces with underscores
+PORTFOLIO_SHEETS = {
+    "projects": ("projects",),
+    "classifications": ("classifications", "project_classifications"),
+    "investments": ("investments",),
+    "depreciation_years": ("depreciation_years",),
+}
+
+IMPORT_FILE_PATTERNS = ("*.xlsx", "*.xls", "*.csv", "*.parquet")
+
+# Number of leading columns identifying a stored row in each kind's batch tuples
+IMPORT_KEY_WIDTHS = {"projects": 1, "classifications": 1, "investments": 2, "depreciation_years": 2}
+
+
+def _normalize(value):
+    # Compare numbers independently of int/float/Decimal representation
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def _parse_file(file_path, kind, known_project_ids=None):
+    """
+    Parse and validate one file into batch tuples. Runs in a worker process, so it must stay a module-level function.
+    :return: A dictionary with the parsed rows, rejected rows and timing, or the error message.
+    """
+    started = time.perf_counter()
+    try:
+        df = ProjectService.read_table(file_path, kind)
+        source_rows = len(df)
+        if kind == "classifications" and "importance" in df.columns and "type" in df.columns:
+            # Convert missing importance and type to 0 like the single-file import
+            df["importance"] = df["importance"].fillna(0)
+            df["type"] = df["type"].fillna(0)
+        df, rejections = ValidationService.validate(kind, df, known_project_ids)
+        rows = ImportService.prepare_batch(kind, df)
+        return {"file": file_path, "rows": rows, "rejections": rejections, "source_rows": source_rows, "parse_seconds": time.perf_counter() - started, "error": None}
+    except Exception as e:
+        return {"file": file_path, "rows": [], "rejections": None, "source_rows": 0, "parse_seconds": time.perf_counter() - started, "error": str(e)}
+
+
+class ImportService:
+    @staticmethod
+    def prepare_batch(kind, df):
+        """
+        Convert a parsed DataFrame into the tuples expected by the batch save method of an import kind.
+        :param kind: One of IMPORT_KINDS.
+        :param df: The parsed DataFrame.
+        :return: A list of tuples.
+        """
+        if kind == "projects":
+            return ProjectService.prepare_project_batch(df)
+        if kind == "classifications":
+            return ProjectService.prepare_classification_batch(df)
+        if kind == "investments":
+            return ProjectService.prepare_investment_batch(df)
+        if kind == "depreciation_years":
+            return ProjectService.prepare_depreciation_year_batch(df)
+        raise ValueError(f"Unknown import kind: {kind}")
+
+    @staticmethod
+    def save_batch(db_service, kind, rows):
+        """
+        Write prepared tuples with the batch save method of an import kind.
+        """
+        if kind == "projects":
+            db_service.save_projects_batch(rows)
+        elif kind == "classifications":
+            db_service.save_project_classifications_batch(rows)
+        elif kind == "investments":
+            db_service.save_investments_batch(rows)
+        elif kind == "depreciation_years":
+            db_service.save_depreciation_years_batch(rows)
+        else:
+            raise ValueError(f"Unknown import kind: {kind}")
+
+    @staticmethod
+    def resolve_import_files(source):
+        """
+        Expand a directory, a glob pattern or a list of paths into a sorted list of files.
+        :param source: A directory path, a glob pattern such as 'imports/*.xlsx', or a list of paths.
+        """
+        if isinstance(source, (list, tuple)):
+            return sorted(source)
+        if os.path.isdir(source):
+            files = []
+            for pattern in IMPORT_FILE_PATTERNS:
+                files.extend(glob.glob(os.path.join(source, pattern)))
+            return sorted(files)
+        return sorted(glob.glob(source))
+
+    @staticmethod
+    def file_hash(file_path):
+        """
+        Compute the SHA-256 hash of a file's contents.
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as source:
+            for block in iter(lambda: source.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def project_hashes(rows):
+        """
+        Hash the batch rows of every project, independently of row order.
+        :param rows: Batch tuples whose first element is the project_id.
+        :return: A dictionary mapping project IDs to hashes.
+        """
+        per_project = {}
+        for row in rows:
+            per_project.setdefault(str(row[0]), []).append(tuple(_normalize(value) for value in row))
+        return {
+            project_id: hashlib.sha256(repr(sorted(project_rows, key=repr)).encode("utf-8")).hexdigest()
+            for project_id, project_rows in per_project.items()
+        }
+
+    @staticmethod
+    def changed_rows(kind, rows, stored):
+        """
+        Keep only the batch rows that are new or differ from the stored state.
+        :param kind: One of IMPORT_KINDS.
+        :param rows: Batch tuples.
+        :param stored: The dictionary returned by DatabaseService.get_import_state.
+        :return: A list of the changed tuples.
+        """
+        key_width = IMPORT_KEY_WIDTHS[kind]
+        changed = []
+        for row in rows:
+            values = tuple(_normalize(value) for value in row)
+            stored_values = stored.get(values[:key_width])
+            if stored_values is None or tuple(_normalize(value) for value in stored_values) != values[key_width:]:
+                changed.append(row)
+        return changed
+
+    @staticmethod
+    def write_changed(db_service, kind, rows, chunk_size=1000):
+        """
+        Write only the projects and rows that changed since the last import, and record their hashes.
+        :param db_service: The DatabaseService to write through.
+        :param kind: One of IMPORT_KINDS.
+        :param rows: Batch tuples of the whole file.
+        :param chunk_size: Number of rows per database batch.
+        :return: A tuple (changed_rows, changed_project_ids).
+        """
+        hashes = ImportService.project_hashes(rows)
+        stored_hashes = db_service.get_import_hashes(kind, "project")
+        changed_projects = {project_id for project_id, content_hash in hashes.items() if stored_hashes.get(project_id) != content_hash}
+
+        candidates = [row for row in rows if str(row[0]) in changed_projects]
+        changed = ImportService.changed_rows(kind, candidates, db_service.get_import_state(kind)) if candidates else []
+
+        for i in range(0, len(changed), chunk_size):
+            ImportService.save_batch(db_service, kind, changed[i:i + chunk_size])
+        db_service.save_import_hashes(kind, "project", {project_id: hashes[project_id] for project_id in changed_projects})
+
+        changed_project_ids = sorted({str(row[0]) for row in changed})
+        print(f"[INFO] {len(changed)} of {len(rows)} {kind} rows changed in {len(changed_project_ids)} projects.")
+        return changed, changed_project_ids
+
+    @staticmethod
+    def import_file_incremental(file_path, kind, force=False, chunk_size=1000, rejections_file=None):
+        """
+        Import a file idempotently: unchanged files are skipped and only changed rows are upserted.
+        :param file_path: Path to a .xlsx, .xls, .csv or .parquet file.
+        :param kind: One of IMPORT_KINDS.
+        :param force: Import the file even if its content hash matches the last import.
+        :param chunk_size: Number of rows per database batch.
+        :param rejections_file: Optional .csv or .xlsx path the rejected rows are written to.
+        :return: A report dictionary: file, skipped, rows, rejected, changed_rows, changed_projects.
+        """
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f"Unknown import kind: {kind}")
+
+        db_service = DatabaseService()
+        item = os.path.abspath(file_path)
+        content_hash = ImportService.file_hash(file_path)
+        report = {"file": file_path, "skipped": False, "rows": 0, "rejected": 0, "changed_rows": 0, "changed_projects": []}
+
+        if not force and db_service.get_import_hashes(kind, "file").get(item) == content_hash:
+            print(f"[INFO] Skipping unchanged file {file_path}.")
+            report["skipped"] = True
+            return report
+
+        df = ProjectService.read_table(file_path, kind)
+        if kind == "classifications" and "importance" in df.columns and "type" in df.columns:
+            df["importance"] = df["importance"].fillna(0)
+            df["type"] = df["type"].fillna(0)
+        df, rejections = ProjectService.validate_import(kind, df, db_service, rejections_file)
+        report["rejected"] = len(rejections)
+
+        rows = ImportService.prepare_batch(kind, df)
+        with db_service.transaction():
+            changed, changed_project_ids = ImportService.write_changed(db_service, kind, rows, chunk_size)
+            db_service.save_import_hashes(kind, "file", {item: content_hash})
+
+        report.update(rows=len(rows), changed_rows=len(changed), changed_projects=changed_project_ids)
+        return report
+
+    @staticmethod
+    def import_files(source, kind, max_workers=None, chunk_size=1000, incremental=False, rejections_file=None):
+        """
+        Parse many files in a process pool and write them through a single writer.
+        Files are written in sorted order while later files are still being parsed, so results are deterministic.
+        :param source: A directory, a glob pattern or a list of paths (see resolve_import_files).
+        :param kind: One of IMPORT_KINDS.
+        :param max_workers: Number of parser processes; defaults to the number of CPUs.
+        :param chunk_size: Number of rows per database batch.
+        :param incremental: Skip files unchanged since their last import and write only changed rows.
+        :param rejections_file: Optional .csv or .xlsx path the rejected rows of all files are written to.
+        :return: A list with one report dictionary per file: file, rows, rejected, parse_seconds, write_seconds, error, skipped.
+        """
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f"Unknown import kind: {kind}")
+
+        files = ImportService.resolve_import_files(source)
+        if not files:
+            print(f"[INFO] No files to import from {source}.")
+            return []
+
+        started = time.perf_counter()
+        db_service = DatabaseService()
+        reports = []
+        rejections = []
+        # Looked up once and shipped to the parser processes for the unknown project check
+        known_project_ids = set(db_service.get_all_project_ids()) if kind in PROJECT_REFERENCES else None
+
+        file_hashes = {}
+        if incremental:
+            stored_hashes = db_service.get_import_hashes(kind, "file")
+            file_hashes = {os.path.abspath(file_path): ImportService.file_hash(file_path) for file_path in files}
+            unchanged = [file_path for file_path in files if stored_hashes.get(os.path.abspath(file_path)) == file_hashes[os.path.abspath(file_path)]]
+            for file_path in unchanged:
+                print(f"[INFO] Skipping unchanged file {file_path}.")
+                reports.append({"file": file_path, "rows": 0, "rejected": 0, "parse_seconds": 0.0, "write_seconds": 0.0, "error": None, "skipped": True})
+            files = [file_path for file_path in files if file_path not in unchanged]
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_parse_file, file_path, kind, known_project_ids) for file_path in files]
+            for future in futures:
+                parsed = future.result()
+                report = {
+                    "file": parsed["file"],
+                    "rows": 0,
+                    "rejected": 0,
+                    "parse_seconds": round(parsed["parse_seconds"], 3),
+                    "write_seconds": 0.0,
+                    "error": parsed["error"],
+                    "skipped": False,
+                }
+
+                if parsed["rejections"] is not None and not parsed["rejections"].empty:
+                    report["rejected"] = len(parsed["rejections"])
+                    rejections.append(parsed["rejections"].assign(file=parsed["file"]))
+
+                if parsed["error"] is None:
+                    write_started = time.perf_counter()
+                    try:
+                        rows = parsed["rows"]
+                        if incremental:
+                            item = os.path.abspath(parsed["file"])
+                            with db_service.transaction():
+                                changed, _ = ImportService.write_changed(db_service, kind, rows, chunk_size)
+                                db_service.save_import_hashes(kind, "file", {item: file_hashes[item]})
+                            rows = changed
+                        else:
+                            for i in range(0, len(rows), chunk_size):
+                                ImportService.save_batch(db_service, kind, rows[i:i + chunk_size])
+                        report["rows"] = len(rows)
+                    except Exception as e:
+                        report["error"] = str(e)
+                    report["write_seconds"] = round(time.perf_counter() - write_started, 3)
+
+                if report["error"]:
+                    print(f"[ERROR] Failed to import {report['file']}: {report['error']}")
+                else:
+                    print(f"[INFO] Imported {report['rows']} {kind} rows from {report['file']}.")
+                reports.append(report)
+
+        if rejections:
+            rejected = pd.concat(rejections, ignore_index=True)
+            print(f"[WARNING] Rejected {len(rejected)} {kind} entries during validation.")
+            if rejections_file:
+                ValidationService.write_rejections(rejected, rejections_file)
+
+        print(f"[INFO] Imported {len(files)} files in {time.perf_counter() - started:.2f}s.")
+        return reports
+
+    @staticmethod
+    def read_portfolio(source):
+        """
+        Read every part of a portfolio into DataFrames.
+        :param source: Path of a workbook with one sheet per part (see PORTFOLIO_SHEETS), or a dictionary mapping import kinds to file paths.
+        :return: A dictionary mapping import kinds to DataFrames.
+        """
+        if isinstance(source, dict):
+            unknown = set(source) - set(IMPORT_KINDS)
+            if unknown:
+                raise ValueError(f"Unknown import kinds: {sorted(unknown)}")
+            return {kind: ProjectService.read_table(file_path, kind) for kind, file_path in source.items()}
+
+        frames = {}
+        for sheet_name, df in pd.read_excel(source, sheet_name=None).items():
+            key = str(sheet_name).strip().lower().replace(" ", "_")
+            kind = next((kind for kind, names in PORTFOLIO_SHEETS.items() if key in names), None)
+            if kind is None:
+                print(f"[WARNING] Ignoring worksheet '{sheet_name}' in {source}.")
+                continue
+            # Strip column names to remove extra spaces, as create_dataframe_from_excel does
+            df.columns = df.columns.map(lambda x: str(x).strip() if not pd.isna(x) else x)
+            frames[kind] = df
+        return frames
+
+    @staticmethod
+    def import_portfolio(source, chunk_size=1000, rejections_file=None):
+        """
+        Import projects, classifications, investments and depreciation years in one transaction.
+        Everything is read and validated in memory first; project references are checked against the stored
+        projects plus the projects being imported. The tables are then loaded in dependency order, and a failure
+        in any stage rolls the whole import back.
+        :param source: A multi-sheet workbook or a dictionary mapping import kinds to file paths (see read_portfolio).
+        :param chunk_size: Number of rows per database batch.
+        :param rejections_file: Optional .csv or .xlsx path the rejected rows are written to.
+        :return: A dictionary with the imported rows per kind, the number of rejected entries and the seconds spent per stage.
+        """
+        started = time.perf_counter()
+        timings = {}
+
+        frames = ImportService.read_portfolio(source)
+        if not frames:
+            raise ValueError(f"No portfolio data found in {source}")
+        timings["read"] = time.perf_counter() - started
+
+        stage_started = time.perf_counter()
+        db_service = DatabaseService()
+        known_project_ids = set(db_service.get_all_project_ids())
+        # An unknown method would otherwise fail the foreign key and roll the whole import back
+        known_method_ids = set(db_service.fetch_depreciation_methods()) if "projects" in frames else None
+        batches = {}
+        rejections = []
+        for kind in IMPORT_KINDS:
+            if kind not in frames:
+                continue
+            df = frames[kind]
+            if kind == "classifications" and "importance" in df.columns and "type" in df.columns:
+                # Convert missing importance and type to 0 like the single-file import
+                df["importance"] = df["importance"].fillna(0)
+                df["type"] = df["type"].fillna(0)
+            df, kind_rejections = ValidationService.validate(kind, df, known_project_ids, known_method_ids)
+            if not kind_rejections.empty:
+                rejections.append(kind_rejections.assign(kind=kind))
+            batches[kind] = ImportService.prepare_batch(kind, df)
+            if kind == "projects":
+                known_project_ids.update(row[0] for row in batches[kind])
+        timings["validate"] = time.perf_counter() - stage_started
+
+        with db_service.transaction():
+            for kind, rows in batches.items():
+                stage_started = time.perf_counter()
+                for i in range(0, len(rows), chunk_size):
+                    ImportService.save_batch(db_service, kind, rows[i:i + chunk_size])
+                timings[kind] = time.perf_counter() - stage_started
+        timings["total"] = time.perf_counter() - started
+
+        rejected = pd.concat(rejections, ignore_index=True) if rejections else pd.DataFrame()
+        if not rejected.empty:
+            print(f"[WARNING] Rejected {len(rejected)} entries during validation.")
+            if rejections_file:
+                ValidationService.write_rejections(rejected, rejections_file)
+
+        for stage, seconds in timings.items():
+            print(f"[INFO] Portfolio import stage {stage}: {seconds:.2f}s")
+
+        return {
+            "rows": {kind: len(rows) for kind, rows in batches.items()},
+            "rejected": len(rejected),
+            "timings": {stage: round(seconds, 3) for stage, seconds in timings.items()},
+        }
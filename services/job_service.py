@@ -0,0 +1,223 @@
+import inspect
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Finished jobs kept in the registry before the oldest ones are forgotten
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "200"))
+
+# Job outputs are written to a directory per job under this one
+JOB_OUTPUT_DIR = os.path.abspath(os.getenv("JOB_OUTPUT_DIR", "job_output"))
+
+JOB_STATES = ("queued", "running", "completed", "failed")
+
+
+def _timestamp():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _output_file(job, file_name):
+    """
+    Return the path a job writes its output to, so concurrent jobs never overwrite each other's files.
+    """
+    directory = os.path.join(JOB_OUTPUT_DIR, job.job_id)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, file_name)
+
+
+def _depreciation_report(job, by_branch=False):
+    from services.project_service import ProjectService
+
+    output_file = _output_file(job, "depreciation_report.xlsx")
+    ProjectService.create_investment_depreciation_report(output_file, by_branch=by_branch)
+    job.output_path = output_file
+
+
+def _importance_report(job, by_branch=False):
+    from services.project_service import ProjectService
+
+    output_file = _output_file(job, "importance_grouped_data.xlsx")
+    ProjectService.group_projects_by_importance(output_file, by_branch=by_branch)
+    job.output_path = output_file
+
+
+def _project_report(job, transform=False, last_year=None):
+    from services.project_service import ProjectService
+
+    output_file = _output_file(job, "project_report.xlsx")
+    ProjectService.generate_report(transform=transform, last_year=last_year, output_file=output_file)
+    job.output_path = output_file
+
+
+def _calculation(job, in_place=False, publish=True, batch_size=200, workers=1, parameters=None):
+    from services.project_service import ProjectService
+
+    if in_place:
+        ProjectService.calculate_depreciation_for_all_projects()
+        return
+    parameters = {"source": "job", "job_id": job.job_id, **(parameters or {})}
+    job.result = {"run_id": ProjectService.calculate_depreciation_run(
+        parameters=parameters,
+        publish=publish,
+        batch_size=batch_size,
+        workers=workers,
+        progress=job.report_progress,
+    )}
+
+
+# Job types: the function receives the Job and the submitted parameters as keyword arguments
+JOB_TYPES = {
+    "depreciation_report": _depreciation_report,
+    "importance_report": _importance_report,
+    "project_report": _project_report,
+    "calculation": _calculation,
+}
+
+
+class Job:
+    """
+    A unit of background work and its state, progress, duration and output.
+    """
+
+    def __init__(self, job_type, parameters):
+        self.job_id = uuid.uuid4().hex
+        self.job_type = job_type
+        self.parameters = parameters
+        self.state = "queued"
+        self.progress = 0.0
+        self.details = {}
+        self.created_at = _timestamp()
+        self.started_at = None
+        self.finished_at = None
+        self.duration_seconds = None
+        self.output_path = None
+        self.result = None
+        self.error = None
+        self._started = None
+
+    @property
+    def finished(self):
+        return self.state in ("completed", "failed")
+
+    def report_progress(self, done, total, **details):
+        """
+        Record progress from inside a running job.
+        :param done: Units of work finished so far.
+        :param total: Units of work in total.
+        :param details: Further counters shown with the job status, e.g. errors.
+        """
+        self.progress = done / total if total else 1.0
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        self.details = {"done": done, "total": total, "per_second": round(done / elapsed, 2) if elapsed else None, **details}
+
+    def run(self, function):
+        self.state = "running"
+        self.started_at = _timestamp()
+        self._started = time.perf_counter()
+        print(f"[INFO] Job {self.job_id} ({self.job_type}) started.")
+        state = "failed"
+        try:
+            function(self, **self.parameters)
+            self.progress = 1.0
+            state = "completed"
+            print(f"[INFO] Job {self.job_id} ({self.job_type}) completed.")
+        except Exception as e:
+            self.error = str(e)
+            print(f"[ERROR] Job {self.job_id} ({self.job_type}) failed: {e}")
+        finally:
+            self.duration_seconds = round(time.perf_counter() - self._started, 3)
+            self.finished_at = _timestamp()
+            # Set last, so anyone seeing a finished job also sees its timing
+            self.state = state
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "type": self.job_type,
+            "parameters": self.parameters,
+            "state": self.state,
+            "progress": round(self.progress, 4),
+            "details": self.details,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_seconds": self.duration_seconds,
+            "output_path": self.output_path,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobService:
+    """
+    Runs reports and calculations on a small worker pool so the GUI and HTTP requests return immediately.
+    Jobs are tracked in an in-process registry; they do not survive a restart.
+    """
+    _jobs = {}
+    _lock = threading.Lock()
+    _executor = None
+
+    @staticmethod
+    def _get_executor():
+        with JobService._lock:
+            if JobService._executor is None:
+                JobService._executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+            return JobService._executor
+
+    @staticmethod
+    def _forget_old_jobs():
+        # Called with the lock held; the registry keeps insertion order, so the oldest jobs come first
+        finished = [job_id for job_id, job in JobService._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - JOB_HISTORY, 0)]:
+            del JobService._jobs[job_id]
+            shutil.rmtree(os.path.join(JOB_OUTPUT_DIR, job_id), ignore_errors=True)
+
+    @staticmethod
+    def submit(job_type: str, **parameters) -> Job:
+        """
+        Queue a job.
+        :param job_type: One of the JOB_TYPES keys.
+        :param parameters: Keyword arguments passed to the job function.
+        :return: The queued Job.
+        """
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unknown job type: {job_type}")
+        accepted = inspect.signature(JOB_TYPES[job_type]).parameters
+        unknown = sorted(name for name in parameters if name == "job" or name not in accepted)
+        if unknown:
+            raise ValueError(f"Unknown parameters for {job_type} jobs: {', '.join(unknown)}")
+
+        job = Job(job_type, parameters)
+        executor = JobService._get_executor()
+        with JobService._lock:
+            JobService._forget_old_jobs()
+            JobService._jobs[job.job_id] = job
+        print(f"[INFO] Job {job.job_id} ({job_type}) queued.")
+        executor.submit(job.run, JOB_TYPES[job_type])
+        return job
+
+    @staticmethod
+    def get_job(job_id: str):
+        """
+        :return: The Job, or None if it is unknown or was forgotten.
+        """
+        with JobService._lock:
+            return JobService._jobs.get(job_id)
+
+    @staticmethod
+    def list_jobs(state=None, limit=50):
+        """
+        :param state: Only return jobs in this state.
+        :param limit: Maximum number of jobs returned, newest first.
+        :return: A list of Jobs.
+        """
+        with JobService._lock:
+            jobs = list(JobService._jobs.values())
+        jobs = [job for job in reversed(jobs) if state is None or job.state == state]
+        return jobs[:limit]
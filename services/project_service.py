@@ -1,10 +1,39 @@
 from models.project_model import Project
-from db.database_service import DatabaseService
+from db.database_service import DatabaseService, CACHE_TTL
+from db.cache import TTLCache, data_versions
+from services.validation_service import ValidationService, PROJECT_REFERENCES, REQUIRED_COLUMNS
+import os
 import pandas as pd
-import tkinter as tk
-from tkinter import filedialog
+# tkinter is imported inside the file dialog functions, so headless entry points never load it
+
+# Workbooks larger than this are imported in streaming mode instead of being loaded whole
+STREAMING_IMPORT_THRESHOLD_MB = float(os.getenv("STREAMING_IMPORT_THRESHOLD_MB", "50"))
+
+# Column types used when reading CSV feeds, so IDs keep leading zeros and numbers are not guessed per file
+CSV_DTYPES = {
+    "projects": {"project_id": str, "branch": str, "operations": str, "description": str, "depreciation_method": "Int64"},
+    "classifications": {"project_id": str, "importance": "Int64", "type": "Int64"},
+    "investments": {"project_id": str},
+    "depreciation_years": {"project_id": str, "depreciation_years": str},
+}
+
+# Projects written per statement by the bulk project API
+BULK_PROJECT_BATCH_SIZE = int(os.getenv("BULK_PROJECT_BATCH_SIZE", "500"))
+
+# Page size of the project search API and the largest page a client may ask for
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "100"))
+SEARCH_PAGE_SIZE_MAX = int(os.getenv("SEARCH_PAGE_SIZE_MAX", "1000"))
+
+# Tables the portfolio dimension frame is built from
+DIMENSION_TABLES = ("projects", "project_classifications", "classification_descriptions")
+
+# Columns of the portfolio dimension frame stored as categoricals
+DIMENSION_CATEGORIES = ("branch", "operations", "importance", "type")
 
 class ProjectService:
+    # Portfolio dimension frames keyed on the database URL and the data versions of DIMENSION_TABLES
+    dimensions_cache = TTLCache(maxsize=4, ttl=CACHE_TTL)
+
     @staticmethod
     def save_to_database(project: Project):
         db_service = DatabaseService()
@@ -20,7 +49,8 @@ class ProjectService:
                 project_id=project_data['project_id'],
                 branch=project_data['branch'],
                 operations=project_data['operations'],
-                description=project_data['description']
+                description=project_data['description'],
+                depreciation_method=project_data['depreciation_method']
             )
         return None
 
@@ -34,6 +64,24 @@ class ProjectService:
             description=description
         )
 
+    @staticmethod
+    def search_projects_page(fields=None, after=None, limit=None, with_total=False, **filters):
+        """
+        Fetch one keyset-paginated page of matching projects.
+        :param fields: The columns to return; project_id is always included.
+        :param after: The next_cursor of the previous page, or None for the first page.
+        :param limit: The page size, capped at SEARCH_PAGE_SIZE_MAX, or None for SEARCH_PAGE_SIZE.
+        :param with_total: Also count every matching project.
+        :param filters: project_id, branch, operations and description.
+        :return: A dictionary with items, next_cursor and, if requested, total.
+        """
+        limit = SEARCH_PAGE_SIZE if limit is None else int(limit)
+        if limit < 1:
+            raise ValueError("limit must be at least 1.")
+        limit = min(limit, SEARCH_PAGE_SIZE_MAX)
+        db_service = DatabaseService()
+        return db_service.search_projects_page(fields=fields, after=after, limit=limit, with_total=with_total, **filters)
+
     @staticmethod
     def get_depreciation_method_type(project_id: str) -> str:
         """
@@ -43,6 +91,15 @@ class ProjectService:
         """
         db_service = DatabaseService()
         method_details = db_service.get_depreciation_method_details(project_id)
+        return ProjectService.depreciation_method_type(method_details)
+
+    @staticmethod
+    def depreciation_method_type(method_details) -> str:
+        """
+        Determine the type of a depreciation method from its details.
+        :param method_details: A dictionary containing depreciation_percentage and depreciation_years.
+        :return: "percentage" if the method is percentage-based, "years" if it is years-based.
+        """
         if method_details['depreciation_percentage'] is not None and method_details['depreciation_years'] is None:
             return "percentage"
         elif method_details['depreciation_years'] is not None:
@@ -54,18 +111,25 @@ class ProjectService:
     def handle_depreciation_calculation(project_id: str):
         """
         Handle the depreciation calculation by determining the method type and calling the appropriate function.
+        The project's totals in the portfolio cube are replaced afterwards.
         :param project_id: The ID of the project.
         """
+        from services.cube_service import CubeService
+
+        versions = CubeService.current_versions()
         method_type = ProjectService.get_depreciation_method_type(project_id)
         if method_type == "percentage":
             print(f"Calculating depreciation using percentage method for project ID: {project_id}")
-            ProjectService.calculate_depreciation_percentage(project_id)
+            df = ProjectService.calculate_depreciation_percentage(project_id)
         elif method_type == "years":
             print(f"Calculating depreciation using years method for project ID: {project_id}")
-            ProjectService.calculate_depreciation_years(project_id)
+            df = ProjectService.calculate_depreciation_years(project_id)
         else:
             raise ValueError("Unknown depreciation method type.")
 
+        if df is not None:
+            CubeService.update_project(project_id, df, versions=versions)
+
     @staticmethod
     def get_investment_dataframe(project_id: str) -> pd.DataFrame:
         """
@@ -74,11 +138,20 @@ class ProjectService:
         :return: A pandas DataFrame containing the investment data.
         """
         from db.database_service import DatabaseService
-        from decimal import Decimal
         db_service = DatabaseService()
 
         # Fetch investment data for the project using DatabaseService
         investment_data = db_service.get_investment_data(project_id)
+        return ProjectService.build_investment_dataframe(investment_data)
+
+    @staticmethod
+    def build_investment_dataframe(investment_data) -> pd.DataFrame:
+        """
+        Build the investment DataFrame used by the depreciation calculations from investment rows.
+        :param investment_data: An iterable of dictionaries with year, investment_amount and depreciation_start_year.
+        :return: A pandas DataFrame with Year, Investment Amount and Depreciation Start Year columns.
+        """
+        from decimal import Decimal
 
         # Preprocess the data to handle Decimal and None values
         processed_data = [
@@ -90,8 +163,8 @@ class ProjectService:
             for row in investment_data
         ]
 
-        # Create and return a DataFrame from the processed data
-        return pd.DataFrame(processed_data)
+        # Create and return a DataFrame from the processed data; the columns are named even without investments
+        return pd.DataFrame(processed_data, columns=["Year", "Investment Amount", "Depreciation Start Year"])
 
     @staticmethod
     def calculate_depreciation_percentage(project_id: str):
@@ -128,41 +201,7 @@ class ProjectService:
         depreciation_percentage = method_details["depreciation_percentage"]
         print(f"[DEBUG] Depreciation Percentage for Project {project_id}: {depreciation_percentage}%")
 
-        # Convert percentage to a float for calculations
-        depreciation_factor = float(depreciation_percentage) / 100
-
-        # Extend the DataFrame to include years up to 2040
-        last_year = df["year"].max()
-        for year in range(last_year + 1, 2041):
-            df = pd.concat([df, pd.DataFrame({"year": [year], "investment amount": [0.0], "depreciation start year": [False]})], ignore_index=True)
-
-        # Initialize variables
-        depreciation_started = False
-        remaining_asset_value = 0.0
-
-        # Iterate through each row to calculate depreciation
-        for i in range(len(df)):
-            # Add new investments to the remaining asset value
-            remaining_asset_value += df.loc[i, "investment amount"]
-
-            # Check if depreciation should start
-            if not depreciation_started and df.loc[i, "depreciation start year"]:
-                depreciation_started = True
-
-            if depreciation_started:
-                # Calculate depreciation for the year
-                df.loc[i, "depreciation"] = remaining_asset_value * depreciation_factor
-                remaining_asset_value -= df.loc[i, "depreciation"]
-
-            # Update the remaining asset value for the current year
-            df.loc[i, "remaining asset value"] = remaining_asset_value
-
-        # If depreciation never started, raise a warning
-        if not depreciation_started:
-            print("[WARNING] Depreciation never started for project. Ensure at least one row has 'Depreciation Start Year' set to True.")
-
-        # Reorder columns to place 'Depreciation' before 'Remaining Asset Value'
-        df = df[["year", "investment amount", "depreciation start year", "depreciation", "remaining asset value"]]
+        df = ProjectService.compute_percentage_depreciation(df, depreciation_percentage)
 
         # Debug: Print the DataFrame
         print("[DEBUG] Investment DataFrame for Percentage Depreciation:")
@@ -170,6 +209,7 @@ class ProjectService:
 
         # Save the calculated depreciation results to the database
         db_service.save_calculated_depreciations(project_id, df)
+        return df
 
     @staticmethod
     def calculate_depreciation_years(project_id: str):
@@ -206,6 +246,80 @@ class ProjectService:
         depreciation_years = method_details["depreciation_years"]
         print(f"[DEBUG] Depreciation Years for Project {project_id}: {depreciation_years}")
 
+        df = ProjectService.compute_years_depreciation(df, depreciation_years)
+
+        # Debug: Print the DataFrame
+        print("[DEBUG] Investment DataFrame for Years Depreciation:")
+        print(df)
+
+        # Save the calculated depreciation results to the database
+        db_service.save_calculated_depreciations(project_id, df)
+        return df
+
+    @staticmethod
+    def compute_percentage_depreciation(df: pd.DataFrame, depreciation_percentage) -> pd.DataFrame:
+        """
+        Calculate percentage-based depreciation up to the year 2040 without touching the database.
+        :param df: A DataFrame with lowercase year, investment amount and depreciation start year columns.
+        :param depreciation_percentage: The yearly depreciation percentage.
+        :return: The DataFrame extended to 2040 with depreciation and remaining asset value columns.
+        """
+        # Ensure the required columns are initialized
+        if "depreciation" not in df.columns:
+            df["depreciation"] = 0.0
+        if "remaining asset value" not in df.columns:
+            df["remaining asset value"] = 0.0
+
+        # Convert percentage to a float for calculations
+        depreciation_factor = float(depreciation_percentage) / 100
+
+        # Extend the DataFrame to include years up to 2040
+        last_year = df["year"].max()
+        for year in range(last_year + 1, 2041):
+            df = pd.concat([df, pd.DataFrame({"year": [year], "investment amount": [0.0], "depreciation start year": [False]})], ignore_index=True)
+
+        # Initialize variables
+        depreciation_started = False
+        remaining_asset_value = 0.0
+
+        # Iterate through each row to calculate depreciation
+        for i in range(len(df)):
+            # Add new investments to the remaining asset value
+            remaining_asset_value += df.loc[i, "investment amount"]
+
+            # Check if depreciation should start
+            if not depreciation_started and df.loc[i, "depreciation start year"]:
+                depreciation_started = True
+
+            if depreciation_started:
+                # Calculate depreciation for the year
+                df.loc[i, "depreciation"] = remaining_asset_value * depreciation_factor
+                remaining_asset_value -= df.loc[i, "depreciation"]
+
+            # Update the remaining asset value for the current year
+            df.loc[i, "remaining asset value"] = remaining_asset_value
+
+        # If depreciation never started, raise a warning
+        if not depreciation_started:
+            print("[WARNING] Depreciation never started for project. Ensure at least one row has 'Depreciation Start Year' set to True.")
+
+        # Reorder columns to place 'Depreciation' before 'Remaining Asset Value'
+        return df[["year", "investment amount", "depreciation start year", "depreciation", "remaining asset value"]]
+
+    @staticmethod
+    def compute_years_depreciation(df: pd.DataFrame, depreciation_years) -> pd.DataFrame:
+        """
+        Calculate years-based depreciation up to the year 2040 without touching the database.
+        :param df: A DataFrame with lowercase year, investment amount and depreciation start year columns.
+        :param depreciation_years: The number of years over which investments are depreciated.
+        :return: The DataFrame extended to 2040 with depreciation and remaining asset value columns.
+        """
+        # Ensure the required columns are initialized
+        if "depreciation" not in df.columns:
+            df["depreciation"] = 0.0
+        if "remaining asset value" not in df.columns:
+            df["remaining asset value"] = 0.0
+
         # Extend the DataFrame to include years up to 2040
         min_year, max_year = df["year"].min(), 2040
         for year in range(min_year, max_year + 1):
@@ -243,20 +357,35 @@ class ProjectService:
             print("[WARNING] Depreciation never started for project. Ensure at least one row has 'Depreciation Start Year' set to True.")
 
         # Reorder columns to place 'Depreciation' before 'Remaining Asset Value'
-        df = df[["year", "investment amount", "depreciation start year", "depreciation", "remaining asset value"]]
+        return df[["year", "investment amount", "depreciation start year", "depreciation", "remaining asset value"]]
 
-        # Debug: Print the DataFrame
-        print("[DEBUG] Investment DataFrame for Years Depreciation:")
-        print(df)
-
-        # Save the calculated depreciation results to the database
-        db_service.save_calculated_depreciations(project_id, df)
+    @staticmethod
+    def compute_depreciation(df: pd.DataFrame, method_details) -> pd.DataFrame:
+        """
+        Calculate depreciation for an investment DataFrame using the given method details.
+        :param df: A DataFrame as returned by build_investment_dataframe.
+        :param method_details: A dictionary containing depreciation_percentage and depreciation_years.
+        :return: The DataFrame with depreciation and remaining asset value columns.
+        """
+        df.columns = df.columns.str.lower()
+        method_type = ProjectService.depreciation_method_type(method_details)
+        if df.empty:
+            # A project without investments has nothing to depreciate
+            return df.assign(depreciation=pd.Series(dtype=float), **{"remaining asset value": pd.Series(dtype=float)})
+        if method_type == "percentage":
+            return ProjectService.compute_percentage_depreciation(df, method_details["depreciation_percentage"])
+        return ProjectService.compute_years_depreciation(df, method_details["depreciation_years"])
 
     @staticmethod
-    def calculate_depreciation_for_all_projects():
+    def calculate_depreciation_for_all_projects(record_run=False, parameters=None):
         """
         Calculate depreciation for all projects sequentially.
+        :param record_run: Append the results to a new versioned calculation run instead of overwriting them in place.
+        :param parameters: Run metadata stored with the calculation run.
         """
+        if record_run:
+            return ProjectService.calculate_depreciation_run(parameters=parameters)
+
         print("[INFO] Starting depreciation calculation for all projects...")
 
         db_service = DatabaseService()
@@ -275,96 +404,341 @@ class ProjectService:
         print("[INFO] Completed depreciation calculation for all projects.")
 
     @staticmethod
-    def create_investment_depreciation_report(output_file="depreciation_report.xlsx"):
+    def calculate_project_depreciation(project_id: str, db_service=None) -> pd.DataFrame:
+        """
+        Calculate depreciation for a project from the database without saving the results.
+        :param project_id: The ID of the project.
+        :param db_service: An optional DatabaseService to reuse.
+        :return: The DataFrame with depreciation and remaining asset value columns.
+        """
+        db_service = db_service or DatabaseService()
+        df = ProjectService.build_investment_dataframe(db_service.get_investment_data(project_id))
+        method_details = db_service.get_depreciation_method_details(project_id)
+        if not method_details:
+            raise ValueError(f"Depreciation method not found for project ID: {project_id}")
+        return ProjectService.compute_depreciation(df, method_details)
+
+    @staticmethod
+    def recalculate_project(project_id: str) -> pd.DataFrame:
+        """
+        Recalculate one project's depreciation, save it as the current result and update the portfolio cube.
+        :param project_id: The ID of the project.
+        :return: The calculated depreciation DataFrame.
+        """
+        from services.cube_service import CubeService
+
         db_service = DatabaseService()
+        versions = CubeService.current_versions()
+        df = ProjectService.calculate_project_depreciation(project_id, db_service)
+        db_service.save_calculated_depreciations(project_id, df)
+        CubeService.update_project(project_id, df, db_service, versions)
+        return df
+
+    @staticmethod
+    def depreciation_result_rows(project_id: str, df: pd.DataFrame):
+        """
+        Convert a calculated depreciation DataFrame into result tuples.
+        :return: A list of tuples (project_id, year, depreciation_value, remaining_value).
+        """
+        return [
+            (project_id, int(year), float(depreciation), float(remaining))
+            for year, depreciation, remaining in zip(df["year"].tolist(), df["depreciation"].tolist(), df["remaining asset value"].tolist())
+        ]
 
-        # Fetch classifications and projects data from the database
-        classifications = db_service.get_project_classifications()
-        projects_data = pd.DataFrame(db_service.get_projects_data())
+    @staticmethod
+    def save_project_investments(project_id: str, investments, recalculate=False):
+        """
+        Save a project's edited investments in one statement and optionally recalculate its depreciation.
+        The recalculation reads the project's whole investment schedule back inside the same transaction, so
+        stored years the caller did not edit are included.
+        :param project_id: The ID of the project.
+        :param investments: A dictionary where the key is the year and the value is a tuple of (investment_amount, depreciation_start_year).
+        :param recalculate: Whether to recalculate and save the project's depreciation in the same transaction.
+        :return: The calculated depreciation DataFrame if recalculated, otherwise None.
+        """
+        from services.cube_service import CubeService
 
-        # Convert classifications to a DataFrame
-        classifications_df = pd.DataFrame(classifications)
+        db_service = DatabaseService()
+        versions = CubeService.current_versions()
+        with db_service.transaction():
+            db_service.save_investment_details_batch(project_id, investments)
+            if not recalculate:
+                return None
 
-        # Fetch classification descriptions from the database
-        classification_descriptions = pd.DataFrame(db_service.execute_query("SELECT classification_id, description FROM classification_descriptions", fetch=True))
+            df = ProjectService.calculate_project_depreciation(project_id, db_service)
+            db_service.save_calculated_depreciations(project_id, df)
 
-        # Merge classifications with descriptions
-        classifications_df = classifications_df.merge(classification_descriptions, left_on="importance", right_on="classification_id", how="left")
+        # Patched only once the transaction committed, so the cube is stamped with the new data versions
+        CubeService.update_project(project_id, df, db_service, versions)
+        return df
 
-        # Replace importance with description
-        classifications_df.drop(columns=["importance", "classification_id"], inplace=True)
-        classifications_df.rename(columns={"description": "importance"}, inplace=True)
+    @staticmethod
+    def calculate_depreciation_run(parameters=None, publish=True, batch_size=200, workers=1, progress=None):
+        """
+        Calculate depreciation for all projects as a new append-only calculation run.
+        :param parameters: Run metadata stored with the calculation run.
+        :param publish: Whether to make the run's results the current calculated depreciations afterwards.
+        :param batch_size: Number of projects whose results are inserted per statement.
+        :param workers: Number of threads calculating projects concurrently; results are still written by one writer.
+        :param progress: An optional callable receiving (projects done, project count, errors=error count, run_id=run ID)
+            when the run starts and after each written batch.
+        :return: The ID of the calculation run.
+        """
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from services.cube_service import CubeService
 
-        # Fetch depreciation data from the database
-        depreciation_data = pd.DataFrame(db_service.execute_query("SELECT project_id, year, depreciation_value FROM calculated_depreciations", fetch=True))
+        if batch_size < 1 or workers < 1:
+            raise ValueError("batch_size and workers must be at least 1.")
 
-        # Merge classifications with projects_data and depreciation_data
-        merged_data = projects_data.merge(classifications_df, on="project_id", how="left")
-        merged_data = merged_data.merge(depreciation_data, on="project_id", how="left")
+        db_service = DatabaseService()
+        started = time.perf_counter()
+        run_id = db_service.start_calculation_run(parameters)
 
-        # Ensure depreciation_value is numeric
-        merged_data["depreciation_value"] = pd.to_numeric(merged_data["depreciation_value"], errors="coerce").fillna(0)
+        project_ids, error_count = [], 0
+        try:
+            project_ids = db_service.get_all_project_ids()
+            print(f"[INFO] Calculation run {run_id}: processing {len(project_ids)} projects.")
+            if progress:
+                progress(0, len(project_ids), errors=0, run_id=run_id)
+
+            def calculate(project_id):
+                try:
+                    df = ProjectService.calculate_project_depreciation(project_id, db_service)
+                    return ProjectService.depreciation_result_rows(project_id, df), df["investment amount"].tolist(), None
+                except Exception as e:
+                    return [], [], e
+
+            executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+            try:
+                # Results arrive in project order whether or not they are calculated concurrently
+                results = executor.map(calculate, project_ids) if executor else map(calculate, project_ids)
+
+                pending = []
+                # Published results are also aggregated into the portfolio cube, without reading them back
+                cube_results = []
+                for index, (project_id, (rows, investments, error)) in enumerate(zip(project_ids, results), start=1):
+                    if error is not None:
+                        error_count += 1
+                        print(f"[ERROR] Failed to calculate depreciation for project ID {project_id}: {error}")
+                    pending.extend(rows)
+                    if publish:
+                        cube_results.extend(
+                            (row[0], row[1], row[2], investment) for row, investment in zip(rows, investments)
+                        )
+
+                    if index % batch_size == 0 or index == len(project_ids):
+                        if pending:
+                            db_service.save_calculation_run_results(run_id, pending)
+                            pending = []
+                        if progress:
+                            progress(index, len(project_ids), errors=error_count, run_id=run_id)
+            finally:
+                if executor:
+                    executor.shutdown()
+
+            duration = time.perf_counter() - started
+            db_service.finish_calculation_run(run_id, duration, len(project_ids), error_count)
+        except Exception:
+            # Otherwise the run would stay 'running' forever
+            db_service.finish_calculation_run(run_id, time.perf_counter() - started, len(project_ids), error_count, status="failed")
+            raise
+
+        if publish:
+            db_service.publish_calculation_run(run_id)
+            if error_count:
+                # Failed projects keep their stored results, which only the database has
+                cube_results = CubeService.load_results(db_service)
+            else:
+                cube_results = pd.DataFrame(cube_results, columns=["project_id", "year", "depreciation", "investment"])
+            CubeService.publish_results(cube_results, db_service)
 
-        # Group by importance, branch, operations, and year, and calculate total depreciations
-        grouped_data = merged_data.groupby(["importance", "branch", "operations", "year"]).agg(
-            Total_Depreciations=("depreciation_value", "sum")
-        ).reset_index()
+        print(f"[INFO] Calculation run {run_id} completed in {duration:.2f}s with {error_count} errors.")
+        return run_id
 
-        # Pivot the data to show years as columns
-        pivoted_data = grouped_data.pivot(index=["importance", "branch", "operations"], columns="year", values="Total_Depreciations").fillna(0)
+    @staticmethod
+    def create_investment_depreciation_report(output_file="depreciation_report.xlsx", by_branch=False):
+        """
+        Write total depreciations by importance, branch, operations and year to an Excel file.
+        The yearly sums are grouped by the database and streamed into the workbook row by row.
+        :param output_file: The .xlsx file to write.
+        :param by_branch: Write one worksheet per branch instead of a single sheet.
+        """
+        from services.report_writer import StreamingReportWriter
+
+        db_service = DatabaseService()
+        key_columns = ["importance", "branch", "operations"]
+
+        with StreamingReportWriter(output_file) as writer:
+            if db_service.result_storage == "compact":
+                # Compact results can only be grouped after expanding them
+                depreciation_data = pd.DataFrame(db_service.get_all_calculated_depreciations(), columns=["project_id", "year", "depreciation_value"])
+                pivoted_data = ProjectService.build_depreciation_report(ProjectService.get_portfolio_dimensions(db_service), depreciation_data)
+                if by_branch:
+                    for branch, branch_data in pivoted_data.groupby(level="branch", sort=True, observed=True):
+                        writer.write_frame(branch_data, branch)
+                else:
+                    writer.write_frame(pivoted_data, "Depreciation Report")
+            else:
+                years = db_service.get_report_years("depreciation")
+                rows = db_service.iter_grouped_report("depreciation", split_by="branch" if by_branch else None)
+                writer.write_pivot(rows, key_columns, years, "Depreciation Report", split_by="branch" if by_branch else None)
 
-        # Save the pivoted data to an Excel file
-        pivoted_data.to_excel(output_file, sheet_name="Depreciation Report", index=True)
         print(f"[INFO] Depreciation data grouped by importance (with descriptions), branch, operations, and year saved to {output_file}")
 
     @staticmethod
-    def group_projects_by_importance(output_file="importance_grouped_data.xlsx"):
+    def group_projects_by_importance(output_file="importance_grouped_data.xlsx", by_branch=False):
+        """
+        Write total investments by importance, branch, operations, project description and year to an Excel file.
+        The yearly sums are grouped by the database and streamed into the workbook row by row.
+        :param output_file: The .xlsx file to write.
+        :param by_branch: Write one worksheet per branch instead of a single sheet.
+        """
+        from services.report_writer import StreamingReportWriter
+
         db_service = DatabaseService()
+        years = db_service.get_report_years("importance")
+        rows = db_service.iter_grouped_report("importance", split_by="branch" if by_branch else None)
 
-        # Fetch classifications and projects data from the database
-        classifications = db_service.get_project_classifications()
-        projects_data = pd.DataFrame(db_service.get_projects_data())
+        with StreamingReportWriter(output_file) as writer:
+            writer.write_pivot(rows, ["importance", "branch", "operations", "description"], years, "Grouped by Importance", split_by="branch" if by_branch else None)
 
-        # Convert classifications to a DataFrame
-        classifications_df = pd.DataFrame(classifications)
+        print(f"[INFO] Grouped data by importance, branch, operations, project description, and year saved to {output_file}")
 
-        # Fetch classification descriptions from the database
-        classification_descriptions = pd.DataFrame(db_service.execute_query("SELECT classification_id, description FROM classification_descriptions", fetch=True))
+    @staticmethod
+    def generate_report(transform=False, last_year=None, output_file="project_report.xlsx") -> pd.DataFrame:
+        """
+        Report investment and depreciation totals per project up to a last year.
+        The totals are aggregated by the database in one query; only the aggregated rows are read.
+        :param transform: Pivot the years into columns instead of reporting one total per project.
+        :param last_year: The last year included in the report, or None for every year.
+        :param output_file: The Excel file the report is written to, or None to only return it.
+        :return: The report DataFrame.
+        """
+        db_service = DatabaseService()
+        index_columns = ["project_id", "branch", "operations", "description"]
+        rows = db_service.get_report_totals(last_year=last_year, by_year=transform)
+
+        if transform:
+            df = pd.DataFrame(rows, columns=[*index_columns, "year", "investment_amount", "depreciation_value"])
+            df[["investment_amount", "depreciation_value"]] = df[["investment_amount", "depreciation_value"]].astype(float)
+            # One column per value and year, e.g. ('depreciation_value', 2030)
+            report = df.pivot(index=index_columns, columns="year", values=["investment_amount", "depreciation_value"]).fillna(0)
+        else:
+            df = pd.DataFrame(rows, columns=[*index_columns, "investment_amount", "depreciation_value"])
+            df[["investment_amount", "depreciation_value"]] = df[["investment_amount", "depreciation_value"]].astype(float)
+            df["remaining_value"] = df["investment_amount"] - df["depreciation_value"]
+            report = df.set_index(index_columns)
 
+        if output_file:
+            report.to_excel(output_file, sheet_name="Project Report", index=True)
+            print(f"[INFO] Project report up to {last_year or 'the last year'} saved to {output_file}")
+        return report
+
+    @staticmethod
+    def describe_classifications(classifications_df: pd.DataFrame, classification_descriptions: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replace classification importance IDs with their descriptions.
+        :param classifications_df: A DataFrame with project_id, importance and type columns.
+        :param classification_descriptions: A DataFrame with classification_id and description columns.
+        :return: The classifications with importance holding the description text.
+        """
         # Merge classifications with descriptions
         classifications_df = classifications_df.merge(classification_descriptions, left_on="importance", right_on="classification_id", how="left")
 
         # Replace importance with description
         classifications_df.drop(columns=["importance", "classification_id"], inplace=True)
         classifications_df.rename(columns={"description": "importance"}, inplace=True)
+        return classifications_df
+
+    @staticmethod
+    def build_portfolio_dimensions(projects_data, classifications_df, classification_descriptions) -> pd.DataFrame:
+        """
+        Build the portfolio dimension frame: one row per project with its branch, operations, description,
+        importance description and type. Repeated labels are stored as categoricals.
+        :return: A DataFrame with project_id, branch, operations, description, importance and type columns.
+        """
+        classifications_df = ProjectService.describe_classifications(
+            classifications_df[["project_id", "importance", "type"]], classification_descriptions[["classification_id", "description"]]
+        )
+        dimensions = projects_data[["project_id", "branch", "operations", "description"]].merge(classifications_df, on="project_id", how="left")
+        for column in DIMENSION_CATEGORIES:
+            dimensions[column] = dimensions[column].astype("category")
+        return dimensions
+
+    @staticmethod
+    def get_portfolio_dimensions(db_service=None) -> pd.DataFrame:
+        """
+        Return the shared portfolio dimension frame, reading the dimension tables only after they were written to.
+        The frame is shared between callers and must not be modified in place.
+        :param db_service: An optional DatabaseService to read through.
+        """
+        db_service = db_service or DatabaseService()
+        key = (db_service.db_url, data_versions.get(*DIMENSION_TABLES))
+
+        def load():
+            results = db_service.fetch_consistent({
+                "projects": "SELECT project_id, branch, operations, description FROM projects",
+                "classifications": "SELECT project_id, importance, type FROM project_classifications",
+                "descriptions": "SELECT classification_id, description FROM classification_descriptions",
+            })
+            return ProjectService.build_portfolio_dimensions(
+                pd.DataFrame(results["projects"], columns=["project_id", "branch", "operations", "description"]),
+                pd.DataFrame(results["classifications"], columns=["project_id", "importance", "type"]),
+                pd.DataFrame(results["descriptions"], columns=["classification_id", "description"]),
+            )
+
+        return ProjectService.dimensions_cache.get_or_load(key, load)
+
+    @staticmethod
+    def build_depreciation_report(dimensions, depreciation_data) -> pd.DataFrame:
+        """
+        Build the depreciation report pivot.
+        :param dimensions: The portfolio dimension frame (see build_portfolio_dimensions).
+        :param depreciation_data: A DataFrame with project_id, year and depreciation_value columns.
+        :return: Total depreciations by importance, branch and operations with years as columns.
+        """
+        merged_data = dimensions.merge(depreciation_data, on="project_id", how="left")
+
+        # Ensure depreciation_value is numeric
+        merged_data["depreciation_value"] = pd.to_numeric(merged_data["depreciation_value"], errors="coerce").fillna(0)
 
-        # Fetch investments data from the database
-        investments_data = pd.DataFrame(db_service.execute_query("SELECT project_id, year, investment_amount FROM investments", fetch=True))
+        # Group by importance, branch, operations, and year, and calculate total depreciations
+        grouped_data = merged_data.groupby(["importance", "branch", "operations", "year"], observed=True).agg(
+            Total_Depreciations=("depreciation_value", "sum")
+        ).reset_index()
+
+        # Pivot the data to show years as columns
+        return grouped_data.pivot(index=["importance", "branch", "operations"], columns="year", values="Total_Depreciations").fillna(0)
 
-        # Merge classifications with projects_data and investments_data
-        merged_data = projects_data.merge(classifications_df, on="project_id", how="left")
-        merged_data = merged_data.merge(investments_data, on="project_id", how="left")
+    @staticmethod
+    def build_importance_report(dimensions, investments_data) -> pd.DataFrame:
+        """
+        Build the importance grouping pivot.
+        :param dimensions: The portfolio dimension frame (see build_portfolio_dimensions).
+        :param investments_data: A DataFrame with project_id, year and investment_amount columns.
+        :return: Total investments by importance, branch, operations and project description with years as columns.
+        """
+        merged_data = dimensions.merge(investments_data, on="project_id", how="left")
 
         # Ensure investment_amount is numeric
         merged_data["investment_amount"] = pd.to_numeric(merged_data["investment_amount"], errors="coerce").fillna(0)
 
         # Group by importance, branch, operations, project description, and year, and calculate total investments
-        grouped_data = merged_data.groupby(["importance", "branch", "operations", "description", "year"]).agg(
+        grouped_data = merged_data.groupby(["importance", "branch", "operations", "description", "year"], observed=True).agg(
             Total_Investments=("investment_amount", "sum")
         ).reset_index()
 
         # Pivot the data to show years as columns
-        pivoted_data = grouped_data.pivot(index=["importance", "branch", "operations", "description"], columns="year", values="Total_Investments").fillna(0)
-
-        # Save the pivoted data to an Excel file
-        pivoted_data.to_excel(output_file, sheet_name="Grouped by Importance", index=True)
-        print(f"[INFO] Grouped data by importance, branch, operations, project description, and year saved to {output_file}")
+        return grouped_data.pivot(index=["importance", "branch", "operations", "description"], columns="year", values="Total_Investments").fillna(0)
 
     @staticmethod
     def read_projects_from_excel():
         """
         Read and save project data from an Excel file to the 'projects' table.
         """
+        from tkinter import filedialog
+
         try:
             file_path = filedialog.askopenfilename(
                 title="Select Excel File",
@@ -375,6 +749,10 @@ class ProjectService:
                 print("[INFO] No file selected.")
                 return
 
+            if ProjectService.should_stream_excel(file_path):
+                ProjectService.import_excel_streaming(file_path, "projects")
+                return
+
             df = pd.read_excel(file_path)
 
             print("[INFO] Project data from Excel:")
@@ -392,6 +770,8 @@ class ProjectService:
         """
         Read and save project classifications from an Excel file to the 'project_classifications' table.
         """
+        from tkinter import filedialog
+
         try:
             file_path = filedialog.askopenfilename(
                 title="Select Excel File",
@@ -402,15 +782,17 @@ class ProjectService:
                 print("[INFO] No file selected.")
                 return
 
-            df = pd.read_excel(file_path)
+            if ProjectService.should_stream_excel(file_path):
+                ProjectService.import_excel_streaming(file_path, "classifications")
+                return
 
-            # Convert importance and type to integers while reading
-            df["importance"] = df["importance"].fillna(0).astype(int)
-            df["type"] = df["type"].fillna(0).astype(int)
+            df = pd.read_excel(file_path)
 
             if "importance" in df.columns and "type" in df.columns:
-                classifications = df[["project_id", "importance", "type"]].dropna()
-                ProjectService.create_project_classifications_from_dataframe(classifications)
+                # Treat missing importance and type as 0; other invalid values are rejected by the validation stage
+                df["importance"] = df["importance"].fillna(0)
+                df["type"] = df["type"].fillna(0)
+                ProjectService.create_project_classifications_from_dataframe(df[["project_id", "importance", "type"]])
             else:
                 print("[WARNING] 'importance' or 'type' columns not found in the Excel file.")
 
@@ -424,6 +806,8 @@ class ProjectService:
         """
         Read and save investment data from an Excel file to the 'investments' table.
         """
+        from tkinter import filedialog
+
         try:
             file_path = filedialog.askopenfilename(
                 title="Select Excel File",
@@ -434,6 +818,10 @@ class ProjectService:
                 print("[INFO] No file selected.")
                 return
 
+            if ProjectService.should_stream_excel(file_path):
+                ProjectService.import_excel_streaming(file_path, "investments")
+                return
+
             # Use the new create_dataframe_from_excel method to process the Excel file
             df = ProjectService.create_dataframe_from_excel(file_path)
 
@@ -454,6 +842,8 @@ class ProjectService:
         """
         Read and save depreciation years from an Excel file to the investments table.
         """
+        from tkinter import filedialog
+
         try:
             file_path = filedialog.askopenfilename(
                 title="Select Excel File",
@@ -464,6 +854,10 @@ class ProjectService:
                 print("[INFO] No file selected.")
                 return
 
+            if ProjectService.should_stream_excel(file_path):
+                ProjectService.import_excel_streaming(file_path, "depreciation_years")
+                return
+
             df = ProjectService.create_dataframe_from_excel(file_path)
 
             print("[INFO] Depreciation years data from Excel:")
@@ -478,106 +872,236 @@ class ProjectService:
             print(f"[ERROR] Failed to read depreciation years from Excel: {e}")
 
     @staticmethod
-    def update_investments_with_depreciation_years(df: pd.DataFrame):
+    def validate_import(kind: str, df: pd.DataFrame, db_service=None, rejections_file=None, known_project_ids=None):
+        """
+        Run the validation stage of an import before anything is written.
+        :param kind: One of the ValidationService REQUIRED_COLUMNS keys, e.g. 'investments'.
+        :param df: The parsed DataFrame.
+        :param db_service: Used to look up existing project IDs for kinds that reference projects.
+        :param rejections_file: Optional .csv or .xlsx path the rejected rows are written to.
+        :param known_project_ids: Existing project IDs, if already known; read from the database otherwise.
+        :return: A tuple (valid_df, rejections).
+        """
+        if kind in PROJECT_REFERENCES and known_project_ids is None:
+            known_project_ids = set((db_service or DatabaseService()).get_all_project_ids())
+
+        valid, rejections = ValidationService.validate(kind, df, known_project_ids)
+        if not rejections.empty:
+            print(f"[WARNING] Rejected {len(rejections)} {kind} entries during validation.")
+            if rejections_file:
+                ValidationService.write_rejections(rejections, rejections_file)
+        return valid, rejections
+
+    @staticmethod
+    def read_portfolio_from_excel():
+        """
+        Read a workbook with projects, classifications, investments and depreciation years sheets
+        and import all of them in one transaction.
+        """
+        from services.import_service import ImportService
+
+        from tkinter import filedialog
+
+        try:
+            file_path = filedialog.askopenfilename(
+                title="Select Portfolio Workbook",
+                filetypes=[("Excel Files", "*.xlsx *.xls")]
+            )
+
+            if not file_path:
+                print("[INFO] No file selected.")
+                return
+
+            report = ImportService.import_portfolio(file_path)
+            print(f"[INFO] Portfolio imported: {report['rows']}")
+
+        except FileNotFoundError:
+            print(f"[ERROR] File not found: {file_path}")
+        except Exception as e:
+            print(f"[ERROR] Failed to import portfolio workbook: {e}")
+
+    @staticmethod
+    def update_investments_with_depreciation_years(df: pd.DataFrame, rejections_file=None):
         """
         Update the investments table with depreciation start years from a DataFrame.
-        :param df: A pandas DataFrame with columns: project_id, year, depreciation_start_year.
+        :param df: A pandas DataFrame with columns: project_id, year, depreciation_start_year (a year or a list of years).
+        :param rejections_file: Optional .csv or .xlsx path the rejected rows are written to.
+        :return: The DataFrame of rejected rows.
         """
         from db.database_service import DatabaseService
         db_service = DatabaseService()
 
-        for _, row in df.iterrows():
-            try:
-                project_id = row['project_id']
-                year = int(row['year'])
-                depreciation_start_years = row['depreciation_start_year']
-
-                # Ensure depreciation_start_years is a list
-                if not isinstance(depreciation_start_years, list):
-                    depreciation_start_years = [depreciation_start_years]
-
-                for depreciation_start_year in depreciation_start_years:
-                    # Update the investments table for each year in the list
-                    db_service.update_investment_depreciation_start_year(
-                        project_id=project_id,
-                        year=year,
-                        depreciation_start_year=depreciation_start_year
-                    )
-            except Exception as e:
-                print(f"[WARNING] Skipping row due to error: {e}")
+        valid, rejections = ProjectService.validate_import("depreciation_start_years", df, db_service, rejections_file)
+
+        # A list of start years for the same investment leaves the last one in place
+        valid = valid.drop_duplicates(subset=["project_id", "year"], keep="last")
+        db_service.save_depreciation_years_batch(list(zip(
+            valid["project_id"].tolist(),
+            valid["year"].astype(int).tolist(),
+            valid["depreciation_start_year"].astype(int).tolist()
+        )))
 
         print("[INFO] Depreciation start years updated successfully in the investments table.")
+        return rejections
 
     @staticmethod
-    def create_depreciation_years_from_dataframe(df: pd.DataFrame):
+    def create_depreciation_years_from_dataframe(df: pd.DataFrame, rejections_file=None):
         """
         Create depreciation years in the database from a DataFrame.
-        :param df: A pandas DataFrame with columns: project_id, year, depreciation_years.
+        :param df: A pandas DataFrame with columns: project_id, depreciation_years.
+        :param rejections_file: Optional .csv or .xlsx path the rejected rows are written to.
+        :return: The DataFrame of rejected rows.
         """
         from db.database_service import DatabaseService
         db_service = DatabaseService()
 
-        # Ensure project_id is treated as a string
-        df['project_id'] = df['project_id'].astype(str)
-
-        # Prepare depreciation years data for batch processing
-        depreciation_years_data = []
-        for _, row in df.iterrows():
-            try:
-                project_id = row['project_id']
-                depreciation_years = row['depreciation_years']
-
-                # Ensure depreciation_years is processed correctly
-                if pd.isna(depreciation_years):
-                    depreciation_years = []
-                elif isinstance(depreciation_years, str):
-                    depreciation_years = [int(y.strip()) for y in depreciation_years.split(';') if y.strip().isdigit()]
-                elif isinstance(depreciation_years, int):
-                    depreciation_years = [depreciation_years]
-
-                for depreciation_year in depreciation_years:
-                    # Add to batch data
-                    depreciation_years_data.append((project_id, depreciation_year, depreciation_year))
-            except Exception as e:
-                print(f"[WARNING] Skipping row due to error: {e}")
+        valid, rejections = ProjectService.validate_import("depreciation_years", df, db_service, rejections_file)
+        depreciation_years_data = ProjectService.prepare_depreciation_year_batch(valid)
 
         # Save depreciation years in batch
         db_service.save_depreciation_years_batch(depreciation_years_data)
         print("[INFO] Depreciation years updated successfully in the investments table.")
+        return rejections
 
     @staticmethod
-    def create_projects_from_dataframe(df: pd.DataFrame):
+    def prepare_depreciation_year_batch(df: pd.DataFrame):
+        """
+        Build the save_depreciation_years_batch tuples from a depreciation years DataFrame.
+        Entries that are not a valid year are skipped; run validate_import first to report them.
+        :param df: A pandas DataFrame with columns: project_id, depreciation_years (a year or ';'-separated years).
+        :return: A list of tuples (project_id, year, depreciation_year).
+        """
+        years = ValidationService.split_depreciation_years(df)
+        years = years[ValidationService.valid_depreciation_years(years)]
+
+        project_ids = years["project_id"].astype(str).tolist()
+        year_values = years["year"].astype(int).tolist()
+        return list(zip(project_ids, year_values, year_values))
+
+    @staticmethod
+    def create_projects_from_dataframe(df: pd.DataFrame, rejections_file=None):
         """
         Create new projects in the database from a DataFrame in batches.
         :param df: A pandas DataFrame with columns: project_id, branch, operations, description, depreciation_method.
+        :param rejections_file: Optional .csv or .xlsx path the rejected rows are written to.
+        :return: The DataFrame of rejected rows.
         """
         from db.database_service import DatabaseService
         db_service = DatabaseService()
 
-        # Deduplicate the project data by project_id
-        project_data = list({row['project_id']: (
-            row['project_id'],
-            row['branch'],
-            row['operations'],
-            row['description'],
-            row['depreciation_method']
-        ) for _, row in df.iterrows()}.values())
+        df, rejections = ProjectService.validate_import("projects", df, db_service, rejections_file)
+        project_data = ProjectService.prepare_project_batch(df)
 
         # Save projects in a single batch
         db_service.save_projects_batch(project_data)
 
         print("[INFO] Projects created successfully from DataFrame in batches.")
+        return rejections
 
     @staticmethod
-    def create_investments_from_dataframe(df: pd.DataFrame, chunk_size=100):
+    def save_projects_bulk(items, batch_size=BULK_PROJECT_BATCH_SIZE):
+        """
+        Validate and save a stream of projects in batches, yielding one result per item.
+        Each batch is one statement and commits on its own, so a failing batch does not undo earlier ones.
+        :param items: An iterable of project dictionaries; an Exception item (e.g. a malformed NDJSON line) is rejected with its message.
+        :param batch_size: Number of items written per statement.
+        :return: A generator of dictionaries with index, project_id, status ('saved', 'rejected' or 'failed') and error.
+        """
+        db_service = DatabaseService()
+        columns = REQUIRED_COLUMNS["projects"]
+        # Loaded once, so an unknown method rejects its item instead of failing the whole batch on the foreign key
+        known_method_ids = set(db_service.fetch_depreciation_methods())
+
+        def flush(batch):
+            results = {}
+            records = {}
+            for index, item in batch:
+                if isinstance(item, dict):
+                    records[index] = item
+                else:
+                    reason = str(item) if isinstance(item, Exception) else "expected a JSON object"
+                    results[index] = {"index": index, "project_id": None, "status": "rejected", "error": reason}
+
+            if records:
+                df = pd.DataFrame.from_dict(records, orient="index").reindex(columns=columns)
+                valid, rejections = ValidationService.validate("projects", df, known_method_ids=known_method_ids)
+                for rejection in rejections.itertuples(index=False):
+                    results[int(rejection.row)] = {
+                        "index": int(rejection.row),
+                        "project_id": rejection.project_id,
+                        "status": "rejected",
+                        "error": f"{rejection.column}: {rejection.reason}",
+                    }
+
+                status, error = "saved", None
+                if not valid.empty:
+                    try:
+                        db_service.save_projects_batch(ProjectService.prepare_project_batch(valid))
+                    except Exception as e:
+                        status, error = "failed", str(e)
+                for index, project_id in zip(valid.index.tolist(), valid["project_id"]):
+                    results[index] = {"index": index, "project_id": project_id, "status": status, "error": error}
+
+            for index, _ in batch:
+                yield results[index]
+
+        batch = []
+        for index, item in enumerate(items):
+            batch.append((index, item))
+            if len(batch) >= batch_size:
+                yield from flush(batch)
+                batch = []
+        if batch:
+            yield from flush(batch)
+
+    @staticmethod
+    def prepare_project_batch(df: pd.DataFrame):
+        """
+        Build the save_projects_batch tuples from a projects DataFrame.
+        :param df: A pandas DataFrame with columns: project_id, branch, operations, description, depreciation_method.
+        :return: A list of tuples (project_id, branch, operations, description, depreciation_method), one per project_id.
+        """
+        columns = ["project_id", "branch", "operations", "description", "depreciation_method"]
+
+        # Deduplicate the project data by project_id, the last row of a project wins
+        deduplicated = df[columns].drop_duplicates(subset="project_id", keep="last")
+
+        # Store missing values as NULL
+        deduplicated = deduplicated.astype(object).where(deduplicated.notna(), None)
+        return list(zip(*(deduplicated[column].tolist() for column in columns)))
+
+    @staticmethod
+    def create_investments_from_dataframe(df: pd.DataFrame, chunk_size=100, rejections_file=None):
         """
         Create investments in the database for projects from a DataFrame in chunks.
         :param df: A pandas DataFrame with columns: project_id and yearly investment data.
         :param chunk_size: Number of rows to process in each chunk.
+        :param rejections_file: Optional .csv or .xlsx path the rejected rows are written to.
+        :return: The DataFrame of rejected rows.
         """
         from db.database_service import DatabaseService
         db_service = DatabaseService()
 
+        df, rejections = ProjectService.validate_import("investments", df, db_service, rejections_file)
+        deduplicated_data = ProjectService.prepare_investment_batch(df)
+
+        # Ensure all chunks are processed
+        total_chunks = (len(deduplicated_data) + chunk_size - 1) // chunk_size
+        for i in range(total_chunks):
+            chunk = deduplicated_data[i * chunk_size:(i + 1) * chunk_size]
+            db_service.save_investments_batch(chunk)
+
+        print(f"[INFO] Investments created successfully for {len(deduplicated_data)} rows in chunks of {chunk_size}.")
+        return rejections
+
+    @staticmethod
+    def prepare_investment_batch(df: pd.DataFrame):
+        """
+        Build the save_investments_batch tuples from a wide investments DataFrame.
+        Every column whose name is a number is a year; amounts of duplicate (project_id, year) pairs are summed.
+        :param df: A pandas DataFrame with columns: project_id and yearly investment data.
+        :return: A list of tuples (project_id, year, investment_amount).
+        """
         # Strip column names to remove extra spaces
         df.columns = df.columns.str.strip()
 
@@ -586,66 +1110,230 @@ class ProjectService:
 
         # Convert year columns to numeric
         year_columns = [col for col in df.columns if col.isdigit()]
-        for col in year_columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        amounts = df[year_columns].apply(pd.to_numeric, errors='coerce').fillna(0)
 
         # Debugging: Print a sample of the year columns
         print("[DEBUG] Sample year columns:")
-        print(df[year_columns].head())
-
-        # Prepare investment data for batch processing
-        investment_data = []
-        for _, row in df.iterrows():
-            project_id = row['project_id']
-            yearly_investments = {
-                int(year): float(row.get(year, 0)) for year in year_columns
-            }
-            for year, amount in yearly_investments.items():
-                investment_data.append((project_id, year, amount))
-
-        # Group by project_id and year to handle duplicates
-        grouped_data = {}
-        for project_id, year, amount in investment_data:
-            if (project_id, year) in grouped_data:
-                grouped_data[(project_id, year)] += amount
-            else:
-                grouped_data[(project_id, year)] = amount
+        print(amounts.head())
 
-        # Convert grouped data back to a list of tuples
-        deduplicated_data = [(project_id, year, amount) for (project_id, year), amount in grouped_data.items()]
-
-        # Ensure all chunks are processed
-        total_chunks = (len(deduplicated_data) + chunk_size - 1) // chunk_size
-        for i in range(total_chunks):
-            chunk = deduplicated_data[i * chunk_size:(i + 1) * chunk_size]
-            db_service.save_investments_batch(chunk)
+        # Reshape to one row per (project_id, year) and sum duplicates
+        long_data = amounts.assign(project_id=df['project_id'].values).melt(
+            id_vars="project_id", var_name="year", value_name="investment_amount"
+        )
+        long_data["year"] = long_data["year"].astype(int)
+        grouped_data = long_data.groupby(["project_id", "year"], sort=False, dropna=False)["investment_amount"].sum().reset_index()
 
-        print(f"[INFO] Investments created successfully for {len(deduplicated_data)} rows in chunks of {chunk_size}.")
+        return list(zip(
+            grouped_data["project_id"].tolist(),
+            grouped_data["year"].tolist(),
+            grouped_data["investment_amount"].astype(float).tolist()
+        ))
 
     @staticmethod
-    def create_project_classifications_from_dataframe(df: pd.DataFrame):
+    def create_project_classifications_from_dataframe(df: pd.DataFrame, rejections_file=None):
         """
         Create project classifications in the database from a DataFrame.
         :param df: A pandas DataFrame with columns: project_id, importance, type.
+        :param rejections_file: Optional .csv or .xlsx path the rejected rows are written to.
+        :return: The DataFrame of rejected rows.
         """
         from db.database_service import DatabaseService
         db_service = DatabaseService()
 
-        # Prepare project classifications data for batch processing
-        classifications = []
-        for _, row in df.iterrows():
-            project_id = row["project_id"]
-            importance = row["importance"]
-            classification_type = row["type"]
-
-            if isinstance(importance, int) and isinstance(classification_type, int):
-                classifications.append((project_id, importance, classification_type))
-            else:
-                print(f"[WARNING] Skipping invalid classification for project {project_id}: Importance={importance}, Type={classification_type}")
+        df, rejections = ProjectService.validate_import("classifications", df, db_service, rejections_file)
+        classifications = ProjectService.prepare_classification_batch(df)
 
         # Save project classifications in batch
         db_service.save_project_classifications_batch(classifications)
         print("[INFO] Project classifications saved successfully in batch.")
+        return rejections
+
+    @staticmethod
+    def prepare_classification_batch(df: pd.DataFrame):
+        """
+        Build the save_project_classifications_batch tuples from a classifications DataFrame.
+        Rows whose importance or type is not a whole number are skipped.
+        :param df: A pandas DataFrame with columns: project_id, importance, type.
+        :return: A list of tuples (project_id, importance, type).
+        """
+        importance = pd.to_numeric(df["importance"], errors="coerce")
+        classification_type = pd.to_numeric(df["type"], errors="coerce")
+        valid = importance.notna() & classification_type.notna() & (importance % 1 == 0) & (classification_type % 1 == 0)
+
+        for project_id, invalid_importance, invalid_type in df.loc[~valid, ["project_id", "importance", "type"]].itertuples(index=False):
+            print(f"[WARNING] Skipping invalid classification for project {project_id}: Importance={invalid_importance}, Type={invalid_type}")
+
+        return list(zip(
+            df.loc[valid, "project_id"].tolist(),
+            importance[valid].astype(int).tolist(),
+            classification_type[valid].astype(int).tolist()
+        ))
+
+    @staticmethod
+    def read_table(file_path: str, kind: str) -> pd.DataFrame:
+        """
+        Read an import file into a DataFrame, choosing the parser from the file extension.
+        :param file_path: Path to a .csv, .parquet, .xlsx or .xls file.
+        :param kind: One of 'projects', 'classifications', 'investments' or 'depreciation_years'; selects the CSV dtype map.
+        :return: A pandas DataFrame with stripped string column names.
+        """
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == ".csv":
+            df = pd.read_csv(file_path, dtype=CSV_DTYPES.get(kind))
+        elif extension in (".parquet", ".pq"):
+            df = pd.read_parquet(file_path)
+        elif extension in (".xlsx", ".xls"):
+            return ProjectService.create_dataframe_from_excel(file_path)
+        else:
+            raise ValueError(f"Unsupported import file format: {extension}")
+
+        # Strip column names to remove extra spaces, as create_dataframe_from_excel does
+        df.columns = df.columns.map(lambda x: str(x).strip() if not pd.isna(x) else x)
+        return df
+
+    @staticmethod
+    def import_file(file_path: str, kind: str, rejections_file=None):
+        """
+        Import a CSV, Parquet or Excel file through the batch save paths.
+        :param file_path: Path to the file; the format is detected from its extension.
+        :param kind: One of 'projects', 'classifications', 'investments' or 'depreciation_years'.
+        :param rejections_file: Optional .csv or .xlsx path the rejected rows are written to.
+        """
+        if ProjectService.should_stream_excel(file_path):
+            return ProjectService.import_excel_streaming(file_path, kind, rejections_file=rejections_file)
+
+        df = ProjectService.read_table(file_path, kind)
+        print(f"[INFO] Read {len(df)} {kind} rows from {file_path}.")
+
+        if kind == "projects":
+            ProjectService.create_projects_from_dataframe(df, rejections_file=rejections_file)
+        elif kind == "classifications":
+            if "importance" in df.columns and "type" in df.columns:
+                df["importance"] = df["importance"].fillna(0)
+                df["type"] = df["type"].fillna(0)
+            ProjectService.create_project_classifications_from_dataframe(df, rejections_file=rejections_file)
+        elif kind == "investments":
+            ProjectService.create_investments_from_dataframe(df, rejections_file=rejections_file)
+        elif kind == "depreciation_years":
+            ProjectService.create_depreciation_years_from_dataframe(df, rejections_file=rejections_file)
+        else:
+            raise ValueError(f"Unknown import kind: {kind}")
+        return len(df)
+
+    @staticmethod
+    def import_projects(file_path: str):
+        return ProjectService.import_file(file_path, "projects")
+
+    @staticmethod
+    def import_project_classifications(file_path: str):
+        return ProjectService.import_file(file_path, "classifications")
+
+    @staticmethod
+    def import_investments(file_path: str):
+        return ProjectService.import_file(file_path, "investments")
+
+    @staticmethod
+    def import_depreciation_years(file_path: str):
+        return ProjectService.import_file(file_path, "depreciation_years")
+
+    @staticmethod
+    def should_stream_excel(file_path: str) -> bool:
+        """
+        Decide whether a workbook is large enough to be imported in streaming mode.
+        :param file_path: Path to the Excel file.
+        """
+        return file_path.lower().endswith(".xlsx") and os.path.getsize(file_path) > STREAMING_IMPORT_THRESHOLD_MB * 1024 * 1024
+
+    @staticmethod
+    def iter_excel_chunks(file_path: str, chunk_size=5000, sheet_name=None):
+        """
+        Read an .xlsx worksheet row by row in read-only mode and yield it as DataFrame chunks.
+        Only one chunk is held in memory at a time, whatever the size of the workbook.
+        :param file_path: Path to the Excel file.
+        :param chunk_size: Number of data rows per chunk.
+        :param sheet_name: The worksheet to read; defaults to the active sheet.
+        :return: A generator of pandas DataFrames with cleaned column names.
+        """
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet_name] if sheet_name else workbook.active
+            rows = worksheet.iter_rows(values_only=True)
+
+            header = next(rows, None)
+            if header is None:
+                return
+            # Strip column names to remove extra spaces, as create_dataframe_from_excel does
+            columns = [str(column).strip() if column is not None else column for column in header]
+
+            chunk = []
+            for row in rows:
+                # Skip rows without any values
+                if all(value is None for value in row):
+                    continue
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield pd.DataFrame(chunk, columns=columns)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=columns)
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def import_excel_streaming(file_path: str, kind: str, chunk_size=5000, rejections_file=None):
+        """
+        Import a large workbook chunk by chunk; each chunk is written to the database before the next is parsed.
+        Investment chunks are staged and merged into the investments table in one transaction at the end.
+        :param file_path: Path to the Excel file.
+        :param kind: One of 'projects', 'classifications', 'investments' or 'depreciation_years'.
+        :param chunk_size: Number of worksheet rows per chunk.
+        :param rejections_file: Optional .csv or .xlsx path the rejected rows of all chunks are written to.
+        :return: The number of worksheet rows imported.
+        """
+        from contextlib import nullcontext
+
+        db_service = DatabaseService()
+        total_rows = 0
+        known_project_ids = set(db_service.get_all_project_ids()) if kind in PROJECT_REFERENCES else None
+        rejections = []
+
+        # Investments are staged in the database, so duplicates in later chunks are summed as in a full import
+        staging = db_service.staged_investments() if kind == "investments" else nullcontext()
+        with staging as stage_investments:
+            for chunk in ProjectService.iter_excel_chunks(file_path, chunk_size):
+                # Number rows across chunks so rejections point at the source row
+                chunk.index += total_rows
+                source_rows = len(chunk)
+                if kind == "classifications" and "importance" in chunk.columns and "type" in chunk.columns:
+                    chunk["importance"] = chunk["importance"].fillna(0)
+                    chunk["type"] = chunk["type"].fillna(0)
+                chunk, chunk_rejections = ValidationService.validate(kind, chunk, known_project_ids)
+                rejections.append(chunk_rejections)
+
+                if kind == "projects":
+                    db_service.save_projects_batch(ProjectService.prepare_project_batch(chunk))
+                elif kind == "classifications":
+                    db_service.save_project_classifications_batch(ProjectService.prepare_classification_batch(chunk))
+                elif kind == "investments":
+                    stage_investments(ProjectService.prepare_investment_batch(chunk))
+                elif kind == "depreciation_years":
+                    db_service.save_depreciation_years_batch(ProjectService.prepare_depreciation_year_batch(chunk))
+                else:
+                    raise ValueError(f"Unknown import kind: {kind}")
+
+                total_rows += source_rows
+                print(f"[INFO] Streamed {total_rows} rows of {kind} from {file_path}.")
+
+        rejections = pd.concat(rejections, ignore_index=True) if rejections else pd.DataFrame()
+        if not rejections.empty:
+            print(f"[WARNING] Rejected {len(rejections)} {kind} entries during validation.")
+            if rejections_file:
+                ValidationService.write_rejections(rejections, rejections_file)
+
+        print(f"[INFO] Streaming import of {kind} completed: {total_rows} rows.")
+        return total_rows
 
     @staticmethod
     def create_dataframe_from_excel(file_path: str) -> pd.DataFrame:
@@ -0,0 +1,144 @@
+import math
+import re
+
+NUMBER_FORMAT = "#,##0.00"
+
+# Characters Excel does not allow in worksheet names
+INVALID_SHEET_CHARACTERS = re.compile(r"[\[\]:*?/\\]")
+MAX_SHEET_NAME_LENGTH = 31
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _number(value):
+    # Decimal values from NUMERIC columns and missing values are written as plain floats
+    return 0.0 if _is_blank(value) else float(value)
+
+
+class ReportSheet:
+    """
+    A worksheet written strictly top to bottom, as constant-memory mode requires.
+    """
+
+    def __init__(self, worksheet, key_count, number_format):
+        self.worksheet = worksheet
+        self.key_count = key_count
+        self.number_format = number_format
+        self.row = 1
+
+    def write(self, keys, values):
+        """
+        Append one row of key cells followed by number cells.
+        """
+        for column, key in enumerate(keys):
+            if not _is_blank(key):
+                self.worksheet.write(self.row, column, key)
+        for column, value in enumerate(values, start=self.key_count):
+            self.worksheet.write_number(self.row, column, _number(value), self.number_format)
+        self.row += 1
+
+
+class StreamingReportWriter:
+    """
+    Writes reports row by row with xlsxwriter's constant_memory mode, so only the current row of each
+    sheet is held in memory whatever the size of the report.
+    """
+
+    def __init__(self, output_file):
+        """
+        :param output_file: The .xlsx file to write.
+        """
+        import xlsxwriter
+
+        self.output_file = output_file
+        self.workbook = xlsxwriter.Workbook(output_file, {"constant_memory": True})
+        self.header_format = self.workbook.add_format({"bold": True, "bottom": 1})
+        self.number_format = self.workbook.add_format({"num_format": NUMBER_FORMAT})
+        self._sheet_names = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.workbook.close()
+
+    def _sheet_name(self, name):
+        # Excel limits names to 31 characters and requires them to be unique regardless of case
+        base = INVALID_SHEET_CHARACTERS.sub("_", str(name if name is not None else "Blank"))[:MAX_SHEET_NAME_LENGTH] or "Sheet"
+        candidate, number = base, 1
+        while candidate.lower() in self._sheet_names:
+            number += 1
+            suffix = f" ({number})"
+            candidate = base[:MAX_SHEET_NAME_LENGTH - len(suffix)] + suffix
+        self._sheet_names.add(candidate.lower())
+        return candidate
+
+    def add_sheet(self, name, key_columns, value_columns) -> ReportSheet:
+        """
+        Add a worksheet with a frozen, bold header row.
+        :param name: The worksheet name; invalid characters are replaced and duplicates numbered.
+        :param key_columns: Names of the leading text columns.
+        :param value_columns: Names of the number columns, e.g. years.
+        """
+        worksheet = self.workbook.add_worksheet(self._sheet_name(name))
+        key_count = len(key_columns)
+        worksheet.set_column(0, key_count - 1, 24)
+        if value_columns:
+            worksheet.set_column(key_count, key_count + len(value_columns) - 1, 14)
+        worksheet.write_row(0, 0, [*key_columns, *[str(column) for column in value_columns]], self.header_format)
+        worksheet.freeze_panes(1, key_count)
+        return ReportSheet(worksheet, key_count, self.number_format)
+
+    def write_pivot(self, rows, key_columns, years, sheet_name, split_by=None):
+        """
+        Write grouped (keys..., year, value) rows as a pivot with one column per year.
+        :param rows: An iterable of dictionaries with the key columns, year and value, sorted by the keys.
+        :param key_columns: The grouping columns, in sort order.
+        :param years: Every year shown as a column, in order.
+        :param sheet_name: The worksheet name; only used for an empty report when split_by is set.
+        :param split_by: A key column; a new worksheet named after its value is started whenever it changes.
+        :return: The number of pivot rows written.
+        """
+        year_positions = {year: position for position, year in enumerate(years)}
+        sheet = None
+        sheet_key = object()
+        current_keys, values = None, None
+        written = 0
+
+        for row in rows:
+            keys = tuple(row[column] for column in key_columns)
+            if keys != current_keys:
+                if current_keys is not None:
+                    sheet.write(current_keys, values)
+                    written += 1
+                if split_by is not None and row[split_by] != sheet_key:
+                    sheet_key = row[split_by]
+                    sheet = self.add_sheet(sheet_key, key_columns, years)
+                elif sheet is None:
+                    sheet = self.add_sheet(sheet_name, key_columns, years)
+                current_keys, values = keys, [0.0] * len(years)
+
+            values[year_positions[row['year']]] += _number(row['value'])
+
+        if current_keys is not None:
+            sheet.write(current_keys, values)
+            written += 1
+        elif sheet is None:
+            # Still write the header so an empty report opens cleanly
+            self.add_sheet(sheet_name, key_columns, years)
+        return written
+
+    def write_frame(self, df, sheet_name):
+        """
+        Write a pivot DataFrame whose index holds the key columns and whose columns are years.
+        """
+        key_columns = [str(name) for name in df.index.names]
+        sheet = self.add_sheet(sheet_name, key_columns, list(df.columns))
+        for keys, values in zip(df.index, df.itertuples(index=False, name=None)):
+            sheet.write(keys if isinstance(keys, tuple) else (keys,), values)
+        return len(df)
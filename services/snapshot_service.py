@@ -0,0 +1,262 @@
+import json
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from db.database_service import DatabaseService
+from services.project_service import ProjectService
+
+# Tables captured in a snapshot, with the query used to read them and the column types stored in the file
+SNAPSHOT_TABLES = {
+    "projects": (
+        "SELECT project_id, branch, operations, description, depreciation_method FROM projects ORDER BY project_id",
+        {"project_id": "string", "branch": "string", "operations": "string", "description": "string", "depreciation_method": "int64"},
+    ),
+    "project_classifications": (
+        "SELECT project_id, importance, type FROM project_classifications ORDER BY project_id",
+        {"project_id": "string", "importance": "int64", "type": "int64"},
+    ),
+    "classification_descriptions": (
+        "SELECT classification_id, description FROM classification_descriptions ORDER BY classification_id",
+        {"classification_id": "int64", "description": "string"},
+    ),
+    "depreciation_schedules": (
+        "SELECT depreciation_id, depreciation_percentage, depreciation_years, method_description FROM depreciation_schedules ORDER BY depreciation_id",
+        {"depreciation_id": "int64", "depreciation_percentage": "float64", "depreciation_years": "int64", "method_description": "string"},
+    ),
+    "investments": (
+        "SELECT project_id, year, investment_amount, depreciation_start_year FROM investments ORDER BY project_id, year",
+        {"project_id": "string", "year": "int64", "investment_amount": "float64", "depreciation_start_year": "int64"},
+    ),
+}
+
+CALCULATED_DEPRECIATIONS_TYPES = {"project_id": "string", "year": "int64", "depreciation_value": "float64", "remaining_value": "float64"}
+
+SNAPSHOT_FORMATS = {"arrow": ".arrow", "parquet": ".parquet"}
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _arrow_table(rows, column_types):
+    """
+    Convert database rows to a pyarrow Table with an explicit schema.
+    """
+    import pyarrow as pa
+
+    schema = pa.schema([(name, pa.type_for_alias(alias)) for name, alias in column_types.items()])
+    columns = {name: [] for name in column_types}
+    for row in rows:
+        for name, alias in column_types.items():
+            value = row[name]
+            # NUMERIC columns arrive as Decimal from Postgres
+            if value is not None and alias == "float64":
+                value = float(value)
+            columns[name].append(value)
+    return pa.table(columns, schema=schema)
+
+
+def _write_table(table, file_path, file_format):
+    import pyarrow as pa
+
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, file_path)
+    else:
+        with pa.OSFile(file_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+class PortfolioSnapshot:
+    """
+    A frozen, read-only copy of the portfolio stored as one columnar file per table.
+    Tables are memory-mapped on first access, so opening a snapshot costs next to nothing.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The snapshot directory written by SnapshotService.export_snapshot.
+        """
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as manifest_file:
+            self.manifest = json.load(manifest_file)
+        self.format = self.manifest["format"]
+        self._tables = {}
+        # Portfolio dimension frame, built on first use by SnapshotService.portfolio_dimensions
+        self.dimensions = None
+
+    def file_path(self, name):
+        return os.path.join(self.path, name + SNAPSHOT_FORMATS[self.format])
+
+    def has_table(self, name):
+        return os.path.exists(self.file_path(name))
+
+    def write_table(self, name, rows, column_types):
+        """
+        Add or replace a table in the snapshot.
+        :param name: The table name.
+        :param rows: An iterable of dictionaries keyed by column name.
+        :param column_types: A dictionary mapping column names to Arrow type aliases.
+        """
+        _write_table(_arrow_table(rows, column_types), self.file_path(name), self.format)
+        self._tables.pop(name, None)
+
+    def table(self, name):
+        """
+        Return a table as a memory-mapped pyarrow Table.
+        :param name: The table name, e.g. 'projects'.
+        """
+        if name not in self._tables:
+            import pyarrow as pa
+
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+                self._tables[name] = pq.read_table(self.file_path(name), memory_map=True)
+            else:
+                source = pa.memory_map(self.file_path(name), "r")
+                self._tables[name] = pa.ipc.open_file(source).read_all()
+        return self._tables[name]
+
+    def frame(self, name) -> pd.DataFrame:
+        """
+        Return a table as a pandas DataFrame.
+        :param name: The table name, e.g. 'investments'.
+        """
+        return self.table(name).to_pandas()
+
+
+class SnapshotService:
+    @staticmethod
+    def export_snapshot(path, file_format="arrow"):
+        """
+        Export a consistent snapshot of projects, classifications, schedules and investments.
+        :param path: The directory the snapshot is written to.
+        :param file_format: 'arrow' for Arrow IPC files or 'parquet'.
+        :return: The manifest describing the snapshot.
+        """
+        if file_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Unsupported snapshot format: {file_format}")
+
+        db_service = DatabaseService()
+        queries = {name: query for name, (query, _) in SNAPSHOT_TABLES.items()}
+
+        # Read every table inside one transaction so the snapshot is consistent
+        results = db_service.fetch_consistent(queries)
+
+        os.makedirs(path, exist_ok=True)
+        row_counts = {}
+        for name, (_, column_types) in SNAPSHOT_TABLES.items():
+            table = _arrow_table(results[name], column_types)
+            _write_table(table, os.path.join(path, name + SNAPSHOT_FORMATS[file_format]), file_format)
+            row_counts[name] = table.num_rows
+
+        manifest = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "format": file_format,
+            "tables": row_counts,
+        }
+        with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+        print(f"[INFO] Portfolio snapshot with {row_counts} rows written to {path}")
+        return manifest
+
+    @staticmethod
+    def open_snapshot(path) -> PortfolioSnapshot:
+        return PortfolioSnapshot(path)
+
+    @staticmethod
+    def calculate_depreciations(snapshot: PortfolioSnapshot, save=True) -> pd.DataFrame:
+        """
+        Calculate depreciation for every project in a snapshot without touching the database.
+        :param snapshot: The snapshot to calculate from.
+        :param save: Whether to store the results in the snapshot as calculated_depreciations.
+        :return: A DataFrame with project_id, year, depreciation_value and remaining_value.
+        """
+        projects = snapshot.frame("projects")
+        schedules = snapshot.frame("depreciation_schedules")
+        investments = snapshot.frame("investments")
+
+        # Resolve each project's depreciation method once
+        methods = projects.merge(schedules, left_on="depreciation_method", right_on="depreciation_id", how="left")
+        method_details = {
+            row.project_id: {
+                "depreciation_percentage": None if pd.isna(row.depreciation_percentage) else row.depreciation_percentage,
+                "depreciation_years": None if pd.isna(row.depreciation_years) else int(row.depreciation_years),
+            }
+            for row in methods.itertuples(index=False)
+        }
+
+        results = []
+        for project_id, project_investments in investments.groupby("project_id", sort=False):
+            try:
+                df = ProjectService.build_investment_dataframe(
+                    {
+                        "year": int(row.year),
+                        "investment_amount": row.investment_amount,
+                        "depreciation_start_year": None if pd.isna(row.depreciation_start_year) else row.depreciation_start_year,
+                    }
+                    for row in project_investments.itertuples(index=False)
+                )
+                df = ProjectService.compute_depreciation(df, method_details[project_id])
+                results.append(pd.DataFrame({
+                    "project_id": project_id,
+                    "year": df["year"].astype("int64"),
+                    "depreciation_value": df["depreciation"].astype("float64"),
+                    "remaining_value": df["remaining asset value"].astype("float64"),
+                }))
+            except Exception as e:
+                print(f"[ERROR] Failed to calculate depreciation for project ID {project_id}: {e}")
+
+        calculated = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=list(CALCULATED_DEPRECIATIONS_TYPES))
+        print(f"[INFO] Calculated {len(calculated)} depreciation rows for {len(results)} projects from snapshot.")
+
+        if save:
+            snapshot.write_table("calculated_depreciations", calculated.to_dict("records"), CALCULATED_DEPRECIATIONS_TYPES)
+        return calculated
+
+    @staticmethod
+    def _calculated_depreciations(snapshot: PortfolioSnapshot) -> pd.DataFrame:
+        if snapshot.has_table("calculated_depreciations"):
+            return snapshot.frame("calculated_depreciations")
+        return SnapshotService.calculate_depreciations(snapshot)
+
+    @staticmethod
+    def portfolio_dimensions(snapshot: PortfolioSnapshot) -> pd.DataFrame:
+        """
+        Return the portfolio dimension frame of a snapshot; a snapshot never changes, so it is built once per instance.
+        """
+        if snapshot.dimensions is None:
+            snapshot.dimensions = ProjectService.build_portfolio_dimensions(
+                snapshot.frame("projects"),
+                snapshot.frame("project_classifications"),
+                snapshot.frame("classification_descriptions"),
+            )
+        return snapshot.dimensions
+
+    @staticmethod
+    def create_investment_depreciation_report(snapshot: PortfolioSnapshot, output_file="depreciation_report.xlsx"):
+        """
+        Write the investment depreciation report from a snapshot instead of the database.
+        """
+        pivoted_data = ProjectService.build_depreciation_report(
+            SnapshotService.portfolio_dimensions(snapshot),
+            SnapshotService._calculated_depreciations(snapshot)[["project_id", "year", "depreciation_value"]],
+        )
+        pivoted_data.to_excel(output_file, sheet_name="Depreciation Report", index=True)
+        print(f"[INFO] Snapshot depreciation report saved to {output_file}")
+        return pivoted_data
+
+    @staticmethod
+    def group_projects_by_importance(snapshot: PortfolioSnapshot, output_file="importance_grouped_data.xlsx"):
+        """
+        Write the importance grouping report from a snapshot instead of the database.
+        """
+        pivoted_data = ProjectService.build_importance_report(
+            SnapshotService.portfolio_dimensions(snapshot),
+            snapshot.frame("investments")[["project_id", "year", "investment_amount"]],
+        )
+        pivoted_data.to_excel(output_file, sheet_name="Grouped by Importance", index=True)
+        print(f"[INFO] Snapshot importance report saved to {output_file}")
+        return pivoted_data
@@ -0,0 +1,168 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+IMPORT_MIN_YEAR = int(os.getenv("IMPORT_MIN_YEAR", "1900"))
+IMPORT_MAX_YEAR = int(os.getenv("IMPORT_MAX_YEAR", "2200"))
+
+REQUIRED_COLUMNS = {
+    "projects": ["project_id", "branch", "operations", "description", "depreciation_method"],
+    "classifications": ["project_id", "importance", "type"],
+    "investments": ["project_id"],
+    "depreciation_years": ["project_id", "depreciation_years"],
+    "depreciation_start_years": ["project_id", "year", "depreciation_start_year"],
+}
+
+# Kinds whose rows must reference an existing project
+PROJECT_REFERENCES = ("classifications", "investments", "depreciation_years", "depreciation_start_years")
+
+REJECTION_COLUMNS = ["row", "project_id", "column", "value", "reason"]
+
+
+def _whole_numbers(series):
+    """
+    Convert a column to numbers and flag the entries holding a whole number.
+    :return: A tuple (numbers, valid) where valid is a boolean NumPy array.
+    """
+    numbers = pd.to_numeric(series, errors="coerce")
+    return numbers, (numbers.notna() & (numbers % 1 == 0)).to_numpy(dtype=bool, na_value=False)
+
+
+def _valid_years(series):
+    numbers, whole = _whole_numbers(series)
+    return numbers, whole & numbers.between(IMPORT_MIN_YEAR, IMPORT_MAX_YEAR).to_numpy(dtype=bool, na_value=False)
+
+
+def _normalize_project_ids(series):
+    """
+    Convert project IDs to stripped strings, keeping numeric IDs free of a trailing '.0'.
+    """
+    if pd.api.types.is_numeric_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype("Int64")
+    return series.astype("string").str.strip().astype(object).where(series.notna(), None)
+
+
+def _rejections(df, mask, column, reason):
+    """
+    Build rejection rows for the rows of df selected by a boolean array.
+    """
+    rejected = df.loc[mask]
+    return pd.DataFrame({
+        "row": rejected.index,
+        "project_id": rejected["project_id"].to_numpy(),
+        "column": column,
+        "value": rejected[column].astype(object).to_numpy(),
+        "reason": reason,
+    }, columns=REJECTION_COLUMNS)
+
+
+class ValidationService:
+    @staticmethod
+    def split_depreciation_years(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Split ';'-separated depreciation_years strings into one row per year.
+        :param df: A DataFrame with columns project_id and depreciation_years.
+        :return: A DataFrame indexed by source row with columns project_id, value (the raw entry) and year (numeric, NaN if unparsable).
+        """
+        values = df["depreciation_years"]
+        tokens = values.where(values.isna(), values.astype(str).str.split(";")).explode()
+        tokens = tokens.where(tokens.isna(), tokens.astype(str).str.strip())
+        # Empty entries, e.g. from a trailing ';', are ignored like missing values
+        tokens = tokens[tokens.notna() & (tokens != "")]
+
+        years = pd.DataFrame({"project_id": df.loc[tokens.index, "project_id"].to_numpy(), "value": tokens.to_numpy()}, index=tokens.index)
+        years["year"] = pd.to_numeric(years["value"], errors="coerce")
+        return years
+
+    @staticmethod
+    def valid_depreciation_years(years: pd.DataFrame) -> np.ndarray:
+        """
+        Flag the rows of split_depreciation_years holding a whole year within the accepted range.
+        """
+        return _valid_years(years["year"])[1]
+
+    @staticmethod
+    def validate(kind: str, df: pd.DataFrame, known_project_ids=None, known_method_ids=None):
+        """
+        Validate an import DataFrame in one vectorized pass before anything is written.
+        :param kind: One of the REQUIRED_COLUMNS keys.
+        :param df: The parsed DataFrame.
+        :param known_project_ids: A set of existing project IDs; rows referencing other projects are rejected.
+        :param known_method_ids: A set of existing depreciation method IDs; projects using other methods are rejected.
+        :return: A tuple (valid_df, rejections) where rejections has the columns row, project_id, column, value and reason.
+        """
+        missing = [column for column in REQUIRED_COLUMNS[kind] if column not in df.columns]
+        if missing:
+            rejections = pd.DataFrame(
+                [{"row": None, "project_id": None, "column": column, "value": None, "reason": "missing required column"} for column in missing],
+                columns=REJECTION_COLUMNS,
+            )
+            # Keep every expected column so the batch builders still accept the empty result
+            return df.iloc[0:0].reindex(columns=[*df.columns, *missing]), rejections
+
+        df = df.copy()
+        df["project_id"] = _normalize_project_ids(df["project_id"])
+        if kind == "depreciation_start_years":
+            # A cell may hold a list of start years
+            df = df.explode("depreciation_start_year")
+
+        rejected = np.zeros(len(df), dtype=bool)
+        parts = []
+
+        def reject(mask, column, reason):
+            nonlocal rejected
+            mask = mask & ~rejected
+            if mask.any():
+                parts.append(_rejections(df, mask, column, reason))
+                rejected |= mask
+
+        blank = (df["project_id"].isna() | (df["project_id"] == "")).to_numpy()
+        reject(blank, "project_id", "missing project_id")
+        if kind in PROJECT_REFERENCES and known_project_ids is not None:
+            reject(~df["project_id"].isin(known_project_ids).to_numpy(), "project_id", "unknown project_id")
+
+        if kind == "projects":
+            methods, whole = _whole_numbers(df["depreciation_method"])
+            reject(~whole & df["depreciation_method"].notna().to_numpy(), "depreciation_method", "depreciation method is not a whole number")
+            if known_method_ids is not None:
+                reject(whole & ~methods.isin(known_method_ids).to_numpy(), "depreciation_method", "unknown depreciation method")
+        elif kind == "classifications":
+            for column in ("importance", "type"):
+                _, whole = _whole_numbers(df[column])
+                reject(~whole, column, f"{column} is not a whole number")
+        elif kind == "investments":
+            year_columns = [column for column in df.columns if str(column).isdigit()]
+            out_of_range = [column for column in year_columns if not IMPORT_MIN_YEAR <= int(column) <= IMPORT_MAX_YEAR]
+            if out_of_range:
+                parts.append(pd.DataFrame(
+                    [{"row": None, "project_id": None, "column": column, "value": None, "reason": "year out of range"} for column in out_of_range],
+                    columns=REJECTION_COLUMNS,
+                ))
+                df = df.drop(columns=out_of_range)
+                year_columns = [column for column in year_columns if column not in out_of_range]
+            for column in year_columns:
+                amounts = pd.to_numeric(df[column], errors="coerce")
+                reject((amounts.isna() & df[column].notna()).to_numpy(dtype=bool), column, "investment amount is not a number")
+        elif kind == "depreciation_years":
+            years = ValidationService.split_depreciation_years(df)
+            invalid_rows = years.index[~ValidationService.valid_depreciation_years(years)]
+            reject(df.index.isin(invalid_rows), "depreciation_years", "invalid depreciation year")
+        elif kind == "depreciation_start_years":
+            for column in ("year", "depreciation_start_year"):
+                _, valid = _valid_years(df[column])
+                reject(~valid, column, f"{column} is not a valid year")
+
+        rejections = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=REJECTION_COLUMNS)
+        return df.loc[~rejected], rejections
+
+    @staticmethod
+    def write_rejections(rejections: pd.DataFrame, output_file: str):
+        """
+        Write a rejection report as CSV or, for .xlsx files, as a workbook.
+        """
+        if output_file.lower().endswith((".xlsx", ".xls")):
+            rejections.to_excel(output_file, sheet_name="Rejected Rows", index=False)
+        else:
+            rejections.to_csv(output_file, index=False)
+        print(f"[INFO] Rejected rows written to {output_file}")
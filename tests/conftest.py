@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# Ensure the project root is in sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set TEST_POSTGRES_URL to an empty, disposable database to run the checks against Postgres as well
+BACKEND_URLS = ["sqlite"] + (["postgres"] if os.getenv("TEST_POSTGRES_URL") else [])
+
+
+@pytest.fixture(params=BACKEND_URLS)
+def db_service(request, tmp_path):
+    from db.database_service import DatabaseService
+
+    if request.param == "sqlite":
+        db_url = f"sqlite:///{tmp_path / 'test.db'}"
+    else:
+        db_url = os.environ["TEST_POSTGRES_URL"]
+    service = DatabaseService(db_url=db_url, result_storage="rows")
+    if request.param == "postgres":
+        service.execute_query(
+            "DROP TABLE IF EXISTS import_hashes, calculation_run_results, calculation_runs, calculated_depreciation_arrays, "
+            "calculated_depreciations, investments, classification_descriptions, project_classifications, projects, "
+            "depreciation_schedules CASCADE"
+        )
+    service.setup_database()
+    # Project rows are cached per process; a fresh database must not see another test's projects
+    DatabaseService.project_cache.invalidate()
+    DatabaseService.method_details_cache.invalidate()
+    DatabaseService.depreciation_methods_cache.invalidate()
+    yield service
@@ -0,0 +1,118 @@
+import pytest
+
+
+@pytest.fixture
+def client(db_service, monkeypatch):
+    import run
+    from services import project_service
+
+    # Never fall through to the database configured in .env
+    monkeypatch.setattr(run, "DatabaseService", lambda: db_service)
+    monkeypatch.setattr(project_service, "DatabaseService", lambda: db_service)
+    run.REPORT_CACHE.invalidate()
+    return run.app.test_client()
+
+
+def test_get_project_returns_the_project_with_an_etag(db_service, client):
+    db_service.save_projects_batch([("P1", "North", "Ops", "First", None)])
+
+    response = client.get("/api/projects/P1")
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "project_id": "P1", "branch": "North", "operations": "Ops", "description": "First", "depreciation_method": None,
+    }
+    assert client.get("/api/projects/P1", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    assert client.get("/api/projects/P2").status_code == 404
+
+
+def test_etag_without_cache_ttl(db_service, client, monkeypatch):
+    import run
+
+    monkeypatch.setattr(run, "CACHE_TTL", 0)
+    db_service.save_projects_batch([("P1", "North", "Ops", "First", None)])
+    assert client.get("/api/projects/P1").status_code == 200
+
+
+def test_depreciation_of_a_project_without_investments(db_service, client):
+    db_service.execute_query(
+        "INSERT INTO depreciation_schedules (depreciation_percentage, depreciation_years, method_description) "
+        "VALUES (NULL, 5, 'Straight line 5 years')"
+    )
+    method_id = db_service.execute_query("SELECT depreciation_id FROM depreciation_schedules", fetch=True)[0]["depreciation_id"]
+    db_service.save_projects_batch([("P1", "North", "Ops", "First", method_id)])
+
+    response = client.post("/api/projects/P1/depreciation")
+    assert response.status_code == 200
+    assert response.get_json() == {"project_id": "P1", "schedule": []}
+
+
+@pytest.mark.parametrize("body", [{"batch_size": 0}, {"workers": 0}, {"batch_size": "many"}, {"publish": "false"}, {"publish": 0}])
+def test_depreciation_run_rejects_invalid_sizes(client, body):
+    assert client.post("/api/depreciation/runs", json=body).status_code == 400
+
+
+def test_project_writes_are_invisible_to_etags_until_commit(db_service, monkeypatch):
+    import run
+    from db.database_service import DatabaseService
+    from services import project_service
+
+    # The API reads through its own connection, like a concurrent request
+    reader = DatabaseService(db_url=db_service.db_url, result_storage="rows")
+    monkeypatch.setattr(run, "DatabaseService", lambda: reader)
+    monkeypatch.setattr(project_service, "DatabaseService", lambda: reader)
+    client = run.app.test_client()
+    db_service.save_projects_batch([("P1", "North", "Ops", "Before", None)])
+    etag = client.get("/api/projects/P1").headers["ETag"]
+
+    with db_service.transaction():
+        db_service.save_projects_batch([("P1", "North", "Ops", "After", None)])
+        response = client.get("/api/projects/P1")
+        assert response.headers["ETag"] == etag
+        assert response.get_json()["description"] == "Before"
+
+    response = client.get("/api/projects/P1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["description"] == "After"
+
+
+@pytest.mark.parametrize("accept_encoding, compressed", [("gzip, deflate", True), ("gzip;q=0, identity", False), ("", False)])
+def test_export_is_gzipped_only_when_accepted(db_service, client, monkeypatch, accept_encoding, compressed):
+    import gzip
+    from services import export_service
+
+    monkeypatch.setattr(export_service, "DatabaseService", lambda: db_service)
+    db_service.save_projects_batch([("P1", "North", "Ops", "First", None)])
+    db_service.execute_query(
+        "INSERT INTO calculated_depreciations (project_id, year, depreciation_value, remaining_value) VALUES ('P1', 2024, 10, 90)"
+    )
+
+    response = client.get("/api/exports/depreciations?format=csv", headers={"Accept-Encoding": accept_encoding})
+    assert response.status_code == 200
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert (response.headers.get("Content-Encoding") == "gzip") == compressed
+    body = gzip.decompress(response.data) if compressed else response.data
+    assert body.decode("utf-8").splitlines()[0].startswith("project_id")
+
+
+@pytest.mark.parametrize("limit", ["0", "-5", "many"])
+def test_search_rejects_invalid_limits(client, limit):
+    assert client.get(f"/api/projects/search?limit={limit}").status_code == 400
+
+
+def test_search_pages_cover_every_match_once(db_service, client):
+    project_ids = [f"P{number:03d}" for number in range(23)]
+    db_service.save_projects_batch([
+        (project_id, "North" if number % 3 else "South", "Ops", f"Project {number}", None)
+        for number, project_id in enumerate(project_ids)
+    ])
+
+    seen, url = [], "/api/projects/search?branch=North&limit=4&fields=project_id,branch"
+    while url:
+        page = client.get(url).get_json()
+        assert len(page["items"]) <= 4
+        assert all(item["branch"] == "North" for item in page["items"])
+        seen.extend(item["project_id"] for item in page["items"])
+        url = page.get("next")
+
+    expected = [project_id for number, project_id in enumerate(project_ids) if number % 3]
+    assert seen == expected
@@ -0,0 +1,142 @@
+import os
+
+import pandas as pd
+import pytest
+
+
+def _load_portfolio(db_service):
+    db_service.execute_query(
+        "INSERT INTO depreciation_schedules (depreciation_percentage, depreciation_years, method_description) "
+        "VALUES (NULL, 5, 'Straight line 5 years')"
+    )
+    method_id = db_service.execute_query("SELECT depreciation_id FROM depreciation_schedules", fetch=True)[0]["depreciation_id"]
+    db_service.save_projects_batch([
+        ("P1", "North", "Ops", "First", method_id),
+        ("P2", "South", "Ops", "Second", method_id),
+        ("P3", "South", "Maintenance", "Third", method_id),
+    ])
+    db_service.execute_query(
+        "INSERT INTO classification_descriptions (classification_id, description) VALUES (1, 'High'), (2, 'Low'), (11, 'Capex')"
+    )
+    db_service.execute_query("INSERT INTO project_classifications (project_id, importance, type) VALUES ('P1', 1, 11), ('P2', 2, 11)")
+    db_service.save_investment_details_batch("P1", {2024: (1000.0, 2024), 2026: (200.0, None)})
+    db_service.save_investment_details_batch("P2", {2025: (500.0, 2025)})
+    db_service.save_investment_details_batch("P3", {2025: (300.0, 2026)})
+
+
+@pytest.mark.parametrize("file_format", ["arrow", "parquet"])
+def test_snapshot_command_matches_the_database_reports(db_service, monkeypatch, tmp_path, file_format):
+    import cli
+    from services import project_service, snapshot_service
+    from services.project_service import ProjectService
+    from services.snapshot_service import SnapshotService
+
+    pytest.importorskip("pyarrow")
+    _load_portfolio(db_service)
+    monkeypatch.setattr(project_service, "DatabaseService", lambda: db_service)
+    monkeypatch.setattr(snapshot_service, "DatabaseService", lambda: db_service)
+    # main() points DATABASE_URL at --db-url; restored after the test
+    monkeypatch.setenv("DATABASE_URL", db_service.db_url)
+
+    path = tmp_path / "snapshot"
+    assert cli.main(["--db-url", db_service.db_url, "snapshot", str(path), "--format", file_format, "--calculate"]) == 0
+    snapshot = SnapshotService.open_snapshot(str(path))
+    assert snapshot.manifest["tables"]["investments"] == 4
+
+    ProjectService.calculate_depreciation_run(publish=True)
+    stored = pd.DataFrame(db_service.get_all_calculated_depreciations(), columns=["project_id", "year", "depreciation_value"])
+    calculated = snapshot.frame("calculated_depreciations")[["project_id", "year", "depreciation_value"]]
+    pd.testing.assert_frame_equal(
+        calculated.astype({"project_id": object}).sort_values(["project_id", "year"]).reset_index(drop=True),
+        stored.astype({"year": "int64", "depreciation_value": float}).sort_values(["project_id", "year"]).reset_index(drop=True),
+    )
+
+    database_report = tmp_path / "database.xlsx"
+    ProjectService.group_projects_by_importance(str(database_report))
+    snapshot_report = SnapshotService.group_projects_by_importance(snapshot, str(tmp_path / "snapshot.xlsx"))
+    streamed = pd.read_excel(database_report, index_col=[0, 1, 2, 3])
+    streamed.columns = [int(column) for column in streamed.columns]
+    assert streamed.to_numpy().tolist() == snapshot_report.to_numpy().tolist()
+    assert list(streamed.columns) == [int(column) for column in snapshot_report.columns]
+    assert [tuple(str(label) for label in key) for key in streamed.index] == [
+        tuple(str(label) for label in key) for key in snapshot_report.index
+    ]
+
+
+def _clear_portfolio(db_service):
+    for table in ("calculation_run_results", "calculation_runs", "calculated_depreciations", "investments", "project_classifications", "projects"):
+        db_service.execute_query(f"DELETE FROM {table}")
+
+
+def _stored_depreciations(db_service):
+    rows = db_service.execute_query("SELECT project_id, year, depreciation_value FROM calculated_depreciations ORDER BY project_id, year", fetch=True)
+    return [
+        (row["project_id"], row["year"], None if pd.isna(row["depreciation_value"]) else round(float(row["depreciation_value"]), 6))
+        for row in rows
+    ]
+
+
+def test_cli_import_calculate_and_report_match_the_services(db_service, monkeypatch, tmp_path):
+    import cli
+    from services.project_service import ProjectService
+
+    db_service.save_depreciation_schedule(None, 5, "Straight line 5 years")
+    db_service.save_depreciation_schedule(20, None, "Declining 20 %")
+    straight_line, declining = [row["depreciation_id"] for row in db_service.execute_query(
+        "SELECT depreciation_id FROM depreciation_schedules ORDER BY depreciation_id", fetch=True
+    )]
+    db_service.execute_query("INSERT INTO classification_descriptions (classification_id, description) VALUES (1, 'High'), (2, 'Low'), (11, 'Capex')")
+    files = {
+        "projects": tmp_path / "projects.csv",
+        "classifications": tmp_path / "classifications.csv",
+        "investments": tmp_path / "investments.xlsx",
+        "depreciation_years": tmp_path / "depreciation_years.csv",
+    }
+    pd.DataFrame({
+        "project_id": ["P1", "P2", "P3"],
+        "branch": ["North", "South", "South"],
+        "operations": ["Ops", "Ops", "Maintenance"],
+        "description": ["First", "Second", "Third"],
+        "depreciation_method": [straight_line, declining, straight_line],
+    }).to_csv(files["projects"], index=False)
+    pd.DataFrame({"project_id": ["P1", "P2", "P3"], "importance": [1, 2, 1], "type": [11, 11, 11]}).to_csv(files["classifications"], index=False)
+    pd.DataFrame({"project_id": ["P1", "P2", "P3"], "2024": [1000.0, 500.0, None], "2025": [200.0, None, 300.0]}).to_excel(files["investments"], index=False)
+    pd.DataFrame({"project_id": ["P1", "P2", "P3"], "depreciation_years": ["2024;2025", "2025", "2026"]}).to_csv(files["depreciation_years"], index=False)
+    # main() points DATABASE_URL at --db-url; restored after the test
+    monkeypatch.setenv("DATABASE_URL", db_service.db_url)
+
+    for kind, path in files.items():
+        assert cli.main(["--db-url", db_service.db_url, "import", kind, str(path), "--workers", "1"]) == 0
+    assert cli.main(["--db-url", db_service.db_url, "calculate", "--batch-size", "2"]) == 0
+    assert cli.main(["--db-url", db_service.db_url, "report", "depreciation", "--output", str(tmp_path / "cli.xlsx")]) == 0
+    from_cli = _stored_depreciations(db_service)
+    assert {project_id for project_id, _, _ in from_cli} == {"P1", "P2", "P3"}
+
+    # The same files through the GUI's service calls and the in-place calculation
+    _clear_portfolio(db_service)
+    for kind, path in files.items():
+        ProjectService.import_file(str(path), kind)
+    ProjectService.calculate_depreciation_for_all_projects()
+    ProjectService.create_investment_depreciation_report(str(tmp_path / "service.xlsx"))
+
+    assert _stored_depreciations(db_service) == from_cli
+    pd.testing.assert_frame_equal(
+        pd.read_excel(tmp_path / "cli.xlsx", index_col=[0, 1, 2]), pd.read_excel(tmp_path / "service.xlsx", index_col=[0, 1, 2])
+    )
+
+
+def test_cli_does_not_load_the_gui_or_web_modules(tmp_path):
+    import subprocess
+    import sys
+
+    db_url = f"sqlite:///{tmp_path / 'cli.db'}"
+    script = (
+        "import sys, cli\n"
+        f"assert cli.main(['--db-url', {db_url!r}, 'setup']) == 0\n"
+        f"assert cli.main(['--db-url', {db_url!r}, 'calculate']) == 0\n"
+        "import services.import_service, services.project_service\n"
+        "assert not {'tkinter', 'flask'} & set(sys.modules), sorted({'tkinter', 'flask'} & set(sys.modules))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
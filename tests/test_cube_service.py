@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from services.cube_service import PortfolioCube
+
+
+def _dimensions(branch, importance="High"):
+    return {"importance": importance, "type": "Capex", "branch": branch, "operations": "Ops"}
+
+
+def test_earlier_year_shifts_existing_contributions():
+    cube = PortfolioCube()
+    cube.set_project("P1", _dimensions("North"), [2024, 2025], [10.0, 20.0], [100.0, 0.0])
+    cube.set_project("P2", _dimensions("South"), [2022], [5.0], [50.0])
+
+    assert cube.years == [2022, 2023, 2024, 2025]
+    assert cube.rollup("year") == {2022: 5.0, 2024: 10.0, 2025: 20.0}
+
+    # Replacing the first project must subtract its old totals at their shifted positions
+    cube.set_project("P1", _dimensions("North"), [2025], [7.0], [0.0])
+    assert cube.rollup("year") == {2022: 5.0, 2025: 7.0}
+    assert cube.values[:, ..., 2].sum() == 0.0
+
+
+def test_rollup_follows_the_requested_dimension_order():
+    cube = PortfolioCube()
+    cube.set_project("P1", _dimensions("North", "High"), [2024], [10.0], [0.0])
+    cube.set_project("P2", _dimensions("South", "Low"), [2025], [20.0], [0.0])
+
+    assert cube.rollup(("importance", "branch")) == {("High", "North"): 10.0, ("Low", "South"): 20.0}
+    assert cube.rollup(("branch", "importance")) == {("North", "High"): 10.0, ("South", "Low"): 20.0}
+    assert cube.rollup(("year", "branch")) == {(2024, "North"): 10.0, (2025, "South"): 20.0}
+    assert cube.total("depreciation", branch="South", year=[2024, 2025]) == 20.0
+    with pytest.raises(ValueError):
+        cube.rollup("region")
+
+
+def test_update_project_drops_a_cube_made_stale_by_another_write(db_service, monkeypatch):
+    from services import cube_service, project_service
+    from services.cube_service import CubeService
+    from services.project_service import ProjectService
+
+    monkeypatch.setattr(project_service, "DatabaseService", lambda: db_service)
+    monkeypatch.setattr(cube_service, "DatabaseService", lambda: db_service)
+    monkeypatch.setattr(CubeService, "cube", None)
+    db_service.execute_query(
+        "INSERT INTO depreciation_schedules (depreciation_percentage, depreciation_years, method_description) "
+        "VALUES (NULL, 5, 'Straight line 5 years')"
+    )
+    method_id = db_service.execute_query("SELECT depreciation_id FROM depreciation_schedules", fetch=True)[0]["depreciation_id"]
+    db_service.save_projects_batch([("A", "North", "Ops", "First", method_id), ("B", "South", "Ops", "Second", method_id)])
+    db_service.save_investment_details_batch("A", {2025: (1000.0, 2025)})
+    db_service.save_investment_details_batch("B", {2025: (1000.0, 2025)})
+
+    assert CubeService.get_cube(db_service).total("investment") == 2000.0
+    ProjectService.save_project_investments("A", {2025: (5000.0, 2025)})
+    ProjectService.recalculate_project("B")
+
+    assert CubeService.get_cube(db_service).total("investment") == 6000.0
+    assert np.isclose(CubeService.get_cube(db_service).total("investment", branch="North"), 5000.0)
+
+
+def test_published_cube_keeps_projects_that_failed_to_calculate(db_service, monkeypatch):
+    from services import cube_service, project_service
+    from services.cube_service import CubeService
+    from services.project_service import ProjectService
+
+    monkeypatch.setattr(project_service, "DatabaseService", lambda: db_service)
+    monkeypatch.setattr(cube_service, "DatabaseService", lambda: db_service)
+    monkeypatch.setattr(CubeService, "cube", None)
+    db_service.execute_query(
+        "INSERT INTO depreciation_schedules (depreciation_percentage, depreciation_years, method_description) "
+        "VALUES (NULL, 5, 'Straight line 5 years')"
+    )
+    method_id = db_service.execute_query("SELECT depreciation_id FROM depreciation_schedules", fetch=True)[0]["depreciation_id"]
+    db_service.save_projects_batch([("A", "North", "Ops", "First", method_id), ("B", "South", "Ops", "Second", method_id)])
+    db_service.save_investment_details_batch("A", {2025: (1000.0, 2025)})
+    db_service.save_investment_details_batch("B", {2025: (500.0, 2025)})
+    db_service.execute_query(
+        "INSERT INTO calculated_depreciations (project_id, year, depreciation_value, remaining_value) VALUES ('B', 2025, 50, 450)"
+    )
+
+    calculate = ProjectService.calculate_project_depreciation
+
+    def fail_for_b(project_id, db_service=None):
+        if project_id == "B":
+            raise ValueError("broken schedule")
+        return calculate(project_id, db_service)
+
+    monkeypatch.setattr(ProjectService, "calculate_project_depreciation", staticmethod(fail_for_b))
+    ProjectService.calculate_depreciation_run()
+
+    published = CubeService.cube
+    rebuilt = CubeService.build_cube(ProjectService.get_portfolio_dimensions(db_service), CubeService.load_results(db_service))
+    for measure in ("investment", "depreciation"):
+        assert published.rollup(("branch", "year"), measure) == rebuilt.rollup(("branch", "year"), measure)
+    assert published.total("investment", branch="South") == 500.0
@@ -0,0 +1,79 @@
+from models.project_model import Project
+
+
+def _load_project(db_service):
+    db_service.execute_query(
+        "INSERT INTO depreciation_schedules (depreciation_percentage, depreciation_years, method_description) "
+        "VALUES (NULL, 5, 'Straight line 5 years')"
+    )
+    method_id = db_service.execute_query("SELECT depreciation_id FROM depreciation_schedules", fetch=True)[0]["depreciation_id"]
+    db_service.save_projects_batch([("P1", "North", "Ops", "First", method_id)])
+    return method_id
+
+
+def test_save_project_invalidates_the_cached_project(db_service):
+    method_id = _load_project(db_service)
+    assert db_service.load_project("P1")["description"] == "First"
+
+    # A write that bypasses the save methods leaves the cached row in place
+    db_service.execute_query("UPDATE projects SET description = 'Stale' WHERE project_id = 'P1'")
+    assert db_service.load_project("P1")["description"] == "First"
+
+    db_service.save_project(Project("P1", "North", "Ops", "Second", method_id))
+    assert db_service.load_project("P1")["description"] == "Second"
+
+
+def test_save_projects_batch_invalidates_cached_projects_and_method_details(db_service):
+    method_id = _load_project(db_service)
+    db_service.execute_query(
+        "INSERT INTO depreciation_schedules (depreciation_percentage, depreciation_years, method_description) "
+        "VALUES (25, NULL, 'Declining 25 %')"
+    )
+    declining_id = db_service.execute_query(
+        "SELECT depreciation_id FROM depreciation_schedules WHERE depreciation_id <> %s", (method_id,), fetch=True
+    )[0]["depreciation_id"]
+    assert db_service.load_project("P1")["branch"] == "North"
+    assert db_service.get_depreciation_method_details("P1")["depreciation_years"] == 5
+
+    db_service.save_projects_batch([("P1", "South", "Ops", "First", declining_id)])
+
+    assert db_service.load_project("P1")["branch"] == "South"
+    details = db_service.get_depreciation_method_details("P1")
+    assert (float(details["depreciation_percentage"]), details["depreciation_years"]) == (25.0, None)
+
+
+def test_save_depreciation_schedule_invalidates_cached_methods(db_service):
+    method_id = _load_project(db_service)
+    assert db_service.fetch_depreciation_methods() == {method_id: "Straight line 5 years"}
+    assert db_service.get_depreciation_method_details("P1")["depreciation_years"] == 5
+
+    db_service.save_depreciation_schedule(None, 5, "Five years")
+
+    assert db_service.fetch_depreciation_methods() == {method_id: "Five years"}
+    db_service.execute_query("UPDATE depreciation_schedules SET depreciation_years = 7")
+    db_service.save_depreciation_schedule(None, 7, "Seven years")
+    assert db_service.get_depreciation_method_details("P1")["depreciation_years"] == 7
+
+
+def test_invalidate_caches_drops_every_cached_read(db_service):
+    from db.cache import data_versions
+    from db.database_service import SCHEMA_TABLES
+
+    method_id = _load_project(db_service)
+    db_service.load_project("P1")
+    db_service.get_depreciation_method_details("P1")
+    db_service.fetch_depreciation_methods()
+    before = data_versions.get(*SCHEMA_TABLES)
+
+    # Tables dropped outside DatabaseService, as the GUI's clean database window does
+    db_service.execute_query("DELETE FROM projects")
+    db_service.execute_query("DELETE FROM depreciation_schedules")
+    assert db_service.load_project("P1") is not None
+    assert db_service.fetch_depreciation_methods() == {method_id: "Straight line 5 years"}
+
+    db_service.invalidate_caches()
+
+    assert data_versions.get(*SCHEMA_TABLES) != before
+    assert db_service.load_project("P1") is None
+    assert db_service.get_depreciation_method_details("P1") is None
+    assert db_service.fetch_depreciation_methods() == {}
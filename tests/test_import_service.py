@@ -0,0 +1,92 @@
+import os
+
+import pandas as pd
+
+
+def test_import_portfolio_rejects_unknown_methods_without_rolling_back(db_service, monkeypatch):
+    from services import import_service
+    from services.import_service import ImportService
+
+    db_service.execute_query(
+        "INSERT INTO depreciation_schedules (depreciation_percentage, depreciation_years, method_description) "
+        "VALUES (NULL, 5, 'Straight line 5 years')"
+    )
+    method_id = db_service.execute_query("SELECT depreciation_id FROM depreciation_schedules", fetch=True)[0]["depreciation_id"]
+    frames = {
+        "projects": pd.DataFrame({
+            "project_id": ["P1", "P2"],
+            "branch": ["North", "South"],
+            "operations": ["Ops", "Ops"],
+            "description": ["Known", "Unknown"],
+            "depreciation_method": [method_id, method_id + 1],
+        }),
+        "investments": pd.DataFrame({"project_id": ["P1", "P2"], "2025": [100.0, 200.0]}),
+    }
+    monkeypatch.setattr(import_service, "DatabaseService", lambda: db_service)
+    monkeypatch.setattr(ImportService, "read_portfolio", staticmethod(lambda source: frames))
+
+    result = ImportService.import_portfolio("portfolio.xlsx")
+
+    assert result["rows"]["projects"] == 1
+    # The unknown method rejects the project, and with it the project's investments
+    assert result["rejected"] == 2
+    assert db_service.get_all_project_ids() == ["P1"]
+
+
+def _load_projects(db_service, *project_ids):
+    db_service.save_projects_batch([(project_id, "North", "Ops", project_id, None) for project_id in project_ids])
+
+
+def _stored_investments(db_service):
+    rows = db_service.execute_query("SELECT project_id, year, investment_amount FROM investments ORDER BY project_id, year", fetch=True)
+    return [(row["project_id"], row["year"], float(row["investment_amount"])) for row in rows]
+
+
+def test_import_files_matches_importing_each_file(db_service, monkeypatch, tmp_path):
+    from services.import_service import ImportService
+    from services.project_service import ProjectService
+
+    _load_projects(db_service, "P1", "P2", "P3")
+    # ImportService and the single-file import both create their own DatabaseService
+    monkeypatch.setenv("DATABASE_URL", db_service.db_url)
+    pd.DataFrame({"project_id": ["P1", "P2", "P1"], "2024": [10.0, 20.0, 5.0], "2025": [1.0, None, 2.0]}).to_excel(tmp_path / "a.xlsx", index=False)
+    pd.DataFrame({"project_id": ["P3", "P9"], "2025": [30.0, 40.0]}).to_csv(tmp_path / "b.csv", index=False)
+    pd.DataFrame({"project_id": ["P2"], "2026": [7.5]}).to_parquet(tmp_path / "c.parquet", index=False)
+    (tmp_path / "d.xlsx").write_bytes(b"not a workbook")
+
+    reports = ImportService.import_files(str(tmp_path), "investments", max_workers=2)
+
+    assert [(os.path.basename(report["file"]), report["rows"], report["rejected"], bool(report["error"])) for report in reports] == [
+        ("a.xlsx", 4, 0, False), ("b.csv", 1, 1, False), ("c.parquet", 1, 0, False), ("d.xlsx", 0, 0, True),
+    ]
+    imported = _stored_investments(db_service)
+
+    db_service.execute_query("DELETE FROM investments")
+    for name in ("a.xlsx", "b.csv", "c.parquet"):
+        ProjectService.import_file(str(tmp_path / name), "investments")
+    assert imported == _stored_investments(db_service)
+    assert imported == [("P1", 2024, 15.0), ("P1", 2025, 3.0), ("P2", 2024, 20.0), ("P2", 2025, 0.0), ("P2", 2026, 7.5), ("P3", 2025, 30.0)]
+
+
+def test_incremental_import_matches_a_full_import(db_service, monkeypatch, tmp_path):
+    from services.import_service import ImportService
+    from services.project_service import ProjectService
+
+    _load_projects(db_service, "P1", "P2", "P3")
+    monkeypatch.setenv("DATABASE_URL", db_service.db_url)
+    path = str(tmp_path / "investments.csv")
+    pd.DataFrame({"project_id": ["P1", "P2", "P1"], "2024": [10.0, 20.0, 5.0], "2025": [1.0, 2.0, None]}).to_csv(path, index=False)
+
+    first = ImportService.import_file_incremental(path, "investments")
+    assert (first["skipped"], first["changed_rows"], first["changed_projects"]) == (False, 4, ["P1", "P2"])
+    assert ImportService.import_file_incremental(path, "investments")["skipped"]
+
+    # P2 changes one amount and P3 is new; P1 is unchanged and not rewritten
+    pd.DataFrame({"project_id": ["P1", "P2", "P1", "P3"], "2024": [10.0, 20.0, 5.0, 3.0], "2025": [1.0, 4.0, None, None]}).to_csv(path, index=False)
+    second = ImportService.import_file_incremental(path, "investments")
+    assert (second["skipped"], second["rows"], second["changed_rows"], second["changed_projects"]) == (False, 6, 3, ["P2", "P3"])
+    incremental = _stored_investments(db_service)
+
+    db_service.execute_query("DELETE FROM investments")
+    ProjectService.import_file(path, "investments")
+    assert incremental == _stored_investments(db_service)
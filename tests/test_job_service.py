@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from services import job_service
+from services.job_service import Job, JobService
+
+
+def test_job_outputs_are_written_per_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_service, "JOB_OUTPUT_DIR", str(tmp_path))
+    first, second = Job("project_report", {}), Job("project_report", {})
+
+    paths = {job_service._output_file(job, "project_report.xlsx") for job in (first, second)}
+    assert len(paths) == 2
+    assert all(os.path.dirname(os.path.dirname(path)) == str(tmp_path) for path in paths)
+
+
+def test_submit_rejects_unknown_parameters():
+    with pytest.raises(ValueError, match="output_file"):
+        JobService.submit("project_report", output_file="/etc/passwd")
+    with pytest.raises(ValueError):
+        JobService.submit("unknown")
+
+
+def test_api_rejects_caller_supplied_output_paths():
+    import run
+
+    response = run.app.test_client().post(
+        "/api/jobs", json={"type": "depreciation_report", "parameters": {"output_file": "../../report.xlsx"}}
+    )
+    assert response.status_code == 400
+
+
+def test_job_timing_is_set_before_it_is_finished():
+    job = Job("project_report", {})
+    seen = []
+
+    def function(job):
+        seen.append((job.state, job.duration_seconds))
+
+    job.run(function)
+    assert seen == [("running", None)]
+    assert job.state == "completed" and job.duration_seconds is not None and job.finished_at is not None
+
+    job = Job("project_report", {})
+
+    def fail(job):
+        raise RuntimeError("disk full")
+
+    job.run(fail)
+    assert (job.state, job.error) == ("failed", "disk full")
+    assert job.duration_seconds is not None
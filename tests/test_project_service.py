@@ -0,0 +1,243 @@
+import pandas as pd
+import pytest
+
+
+def _load_project(db_service):
+    db_service.execute_query(
+        "INSERT INTO depreciation_schedules (depreciation_percentage, depreciation_years, method_description) "
+        "VALUES (NULL, 5, 'Straight line 5 years')"
+    )
+    method_id = db_service.execute_query("SELECT depreciation_id FROM depreciation_schedules", fetch=True)[0]["depreciation_id"]
+    db_service.save_projects_batch([("P1", "North", "Ops", "First", method_id)])
+    db_service.save_investment_details_batch("P1", {2020: (1000.0, 2020)})
+
+
+def test_save_project_investments_recalculates_stored_years(db_service, monkeypatch):
+    from services import project_service
+    from services.cube_service import CubeService
+    from services.project_service import ProjectService
+
+    _load_project(db_service)
+    monkeypatch.setattr(project_service, "DatabaseService", lambda: db_service)
+    monkeypatch.setattr(CubeService, "update_project", staticmethod(lambda *args, **kwargs: None))
+
+    df = ProjectService.save_project_investments("P1", {2025: (100.0, 2025)}, recalculate=True)
+
+    assert int(df["year"].min()) == 2020
+    stored = db_service.execute_query(
+        "SELECT SUM(depreciation_value) AS total FROM calculated_depreciations WHERE project_id = 'P1'", fetch=True
+    )
+    assert round(float(stored[0]["total"]), 2) == round(float(df["depreciation"].sum()), 2)
+    assert float(df["depreciation"].sum()) > 1000.0
+
+
+def test_failed_calculation_run_is_marked_failed(db_service, monkeypatch):
+    from services import project_service
+    from services.project_service import ProjectService
+
+    _load_project(db_service)
+    monkeypatch.setattr(project_service, "DatabaseService", lambda: db_service)
+    with pytest.raises(ValueError):
+        ProjectService.calculate_depreciation_run(batch_size=0)
+    assert db_service.get_calculation_runs() == []
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(db_service, "save_calculation_run_results", fail)
+    with pytest.raises(RuntimeError):
+        ProjectService.calculate_depreciation_run(publish=False)
+    assert [(run["status"], run["project_count"]) for run in db_service.get_calculation_runs()] == [("failed", 1)]
+
+
+def test_save_projects_bulk_rejects_unknown_methods_per_item(db_service, monkeypatch):
+    from services import project_service
+    from services.project_service import ProjectService
+
+    _load_project(db_service)
+    method_id = db_service.load_project("P1")["depreciation_method"]
+    monkeypatch.setattr(project_service, "DatabaseService", lambda: db_service)
+
+    results = list(ProjectService.save_projects_bulk([
+        {"project_id": "P2", "branch": "North", "operations": "Ops", "description": "Known", "depreciation_method": method_id},
+        {"project_id": "P3", "branch": "North", "operations": "Ops", "description": "Unknown", "depreciation_method": method_id + 1},
+        {"project_id": "P4", "branch": "North", "operations": "Ops", "description": "None", "depreciation_method": None},
+    ]))
+
+    assert [(result["project_id"], result["status"]) for result in results] == [("P2", "saved"), ("P3", "rejected"), ("P4", "saved")]
+    assert results[1]["error"] == "depreciation_method: unknown depreciation method"
+    assert db_service.load_project("P3") is None
+
+
+def test_streaming_investment_import_sums_duplicates_across_chunks(db_service, monkeypatch, tmp_path):
+    from services import project_service
+    from services.project_service import ProjectService
+
+    _load_project(db_service)
+    db_service.save_projects_batch([("P2", "South", "Ops", "Second", None)])
+    db_service.save_investments_batch([("P2", 2024, 999.0)])
+    workbook = tmp_path / "investments.xlsx"
+    pd.DataFrame({
+        "project_id": ["P1", "P2", "P1", "P2"],
+        "2024": [10.0, 20.0, 30.0, 40.0],
+        "2025": [1.0, None, 2.0, None],
+    }).to_excel(workbook, index=False)
+    monkeypatch.setattr(project_service, "DatabaseService", lambda: db_service)
+
+    assert ProjectService.import_excel_streaming(str(workbook), "investments", chunk_size=1) == 4
+
+    stored = db_service.execute_query(
+        "SELECT project_id, year, investment_amount FROM investments ORDER BY project_id, year", fetch=True
+    )
+    # Amounts from the file replace the stored ones; duplicates within the file are summed
+    assert [(row["project_id"], row["year"], float(row["investment_amount"])) for row in stored] == [
+        ("P1", 2020, 1000.0), ("P1", 2024, 40.0), ("P1", 2025, 3.0), ("P2", 2024, 60.0), ("P2", 2025, 0.0),
+    ]
+
+
+def test_staged_investments_recover_from_a_failed_import():
+    from db.database_service import DatabaseService
+
+    # An in-memory database keeps one shared connection, so temporary tables outlive a transaction
+    db_service = DatabaseService(db_url="sqlite:///:memory:", result_storage="rows")
+    db_service.setup_database()
+    db_service.save_projects_batch([("P1", "North", "Ops", "First", None)])
+
+    with pytest.raises(RuntimeError):
+        with db_service.staged_investments() as stage:
+            stage([("P1", 2024, 10.0)])
+            raise RuntimeError("bad chunk")
+
+    with db_service.staged_investments() as stage:
+        stage([("P1", 2025, 5.0)])
+
+    stored = db_service.execute_query("SELECT year, investment_amount FROM investments", fetch=True)
+    assert [(row["year"], float(row["investment_amount"])) for row in stored] == [(2025, 5.0)]
+
+
+def _loop_project_batch(df):
+    # The iterrows builders the prepare_*_batch methods replaced, kept as the reference
+    return list({row['project_id']: (
+        row['project_id'], row['branch'], row['operations'], row['description'], row['depreciation_method']
+    ) for _, row in df.iterrows()}.values())
+
+
+def _loop_investment_batch(df):
+    df.columns = df.columns.str.strip()
+    year_columns = [col for col in df.columns if col.isdigit()]
+    for col in year_columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    grouped_data = {}
+    for _, row in df.iterrows():
+        for year in year_columns:
+            key = (row['project_id'], int(year))
+            grouped_data[key] = grouped_data.get(key, 0) + float(row.get(year, 0))
+    return [(project_id, year, amount) for (project_id, year), amount in grouped_data.items()]
+
+
+def _loop_classification_batch(df):
+    return [
+        (row["project_id"], row["importance"], row["type"])
+        for _, row in df.iterrows()
+        if isinstance(row["importance"], int) and isinstance(row["type"], int)
+    ]
+
+
+def test_batch_builders_match_the_row_loops(db_service, monkeypatch):
+    from services.project_service import ProjectService
+
+    _load_project(db_service)
+    method_id = db_service.load_project("P1")["depreciation_method"]
+    projects = pd.DataFrame({
+        "project_id": ["P2", "P3", "P2"],
+        "branch": ["North", "South", "East"],
+        "operations": ["Ops", "Ops", "Maintenance"],
+        "description": ["Second", "Third", "Second again"],
+        "depreciation_method": [method_id, method_id, method_id],
+    })
+    investments = pd.DataFrame({
+        "project_id": ["P2", "P3", "P2"],
+        " 2024": [10.0, 20.0, 5.0],
+        "2025 ": ["1.5", "n/a", None],
+        "note": ["a", "b", "c"],
+    })
+    classifications = pd.DataFrame({"project_id": ["P2", "P3", "P1"], "importance": [1, "high", 2], "type": [3, 1, "2.5"]})
+
+    # Only the order of the tuples differs
+    assert sorted(ProjectService.prepare_project_batch(projects)) == sorted(_loop_project_batch(projects))
+    assert sorted(ProjectService.prepare_investment_batch(investments.copy())) == sorted(_loop_investment_batch(investments.copy()))
+    assert ProjectService.prepare_classification_batch(classifications) == _loop_classification_batch(classifications)
+
+    # The DataFrame entry points store what the row loops built; they create their own DatabaseService
+    monkeypatch.setenv("DATABASE_URL", db_service.db_url)
+    ProjectService.create_projects_from_dataframe(projects)
+    valid_investments = investments.assign(**{"2025 ": ["1.5", "2", None]})
+    ProjectService.create_investments_from_dataframe(valid_investments.copy())
+    ProjectService.create_project_classifications_from_dataframe(classifications.iloc[:1])
+
+    stored_projects = db_service.execute_query(
+        "SELECT project_id, branch, operations, description, depreciation_method FROM projects WHERE project_id <> 'P1' ORDER BY project_id",
+        fetch=True,
+    )
+    assert [tuple(row.values()) for row in stored_projects] == sorted(_loop_project_batch(projects))
+    stored_investments = db_service.execute_query(
+        "SELECT project_id, year, investment_amount FROM investments WHERE project_id <> 'P1' ORDER BY project_id, year", fetch=True
+    )
+    assert [(row["project_id"], row["year"], float(row["investment_amount"])) for row in stored_investments] == sorted(
+        _loop_investment_batch(valid_investments.copy())
+    )
+    stored_classifications = db_service.execute_query("SELECT project_id, importance, type FROM project_classifications", fetch=True)
+    assert [tuple(row.values()) for row in stored_classifications] == _loop_classification_batch(classifications.iloc[:1])
+
+
+def _stored_portfolio(db_service):
+    queries = {
+        "projects": "SELECT project_id, branch, operations, description, depreciation_method FROM projects ORDER BY project_id",
+        "classifications": "SELECT project_id, importance, type FROM project_classifications ORDER BY project_id",
+        "investments": "SELECT project_id, year, investment_amount, depreciation_start_year FROM investments ORDER BY project_id, year",
+    }
+    return {kind: [tuple(row.values()) for row in db_service.execute_query(query, fetch=True)] for kind, query in queries.items()}
+
+
+@pytest.mark.parametrize("extension", [".csv", ".parquet"])
+def test_csv_and_parquet_imports_match_excel(db_service, monkeypatch, tmp_path, extension):
+    from services.project_service import ProjectService
+
+    db_service.execute_query(
+        "INSERT INTO depreciation_schedules (depreciation_percentage, depreciation_years, method_description) "
+        "VALUES (NULL, 5, 'Straight line 5 years')"
+    )
+    method_id = db_service.execute_query("SELECT depreciation_id FROM depreciation_schedules", fetch=True)[0]["depreciation_id"]
+    tables = {
+        "projects": pd.DataFrame({
+            "project_id": ["007", "P2"],
+            "branch": ["North", "South"],
+            "operations": ["Ops", "Ops"],
+            "description": ["Leading zeros", "Second"],
+            "depreciation_method": [method_id, None],
+        }),
+        "classifications": pd.DataFrame({"project_id": ["007", "P2"], "importance": [1, None], "type": [2, 3]}),
+        "investments": pd.DataFrame({"project_id": ["007", "P2", "007"], "2024": [100.0, 50.0, 25.0], "2025": [None, 10.0, 5.0]}),
+        "depreciation_years": pd.DataFrame({"project_id": ["007", "P2"], "depreciation_years": ["2024;2025", 2025]}),
+    }
+    # The import entry points create their own DatabaseService
+    monkeypatch.setenv("DATABASE_URL", db_service.db_url)
+
+    def import_all(file_extension):
+        for kind, df in tables.items():
+            path = str(tmp_path / f"{kind}{file_extension}")
+            if file_extension == ".xlsx":
+                df.to_excel(path, index=False)
+            elif file_extension == ".csv":
+                df.to_csv(path, index=False)
+            else:
+                df.astype({"depreciation_years": str} if kind == "depreciation_years" else {}).to_parquet(path, index=False)
+            ProjectService.import_file(path, kind)
+        stored = _stored_portfolio(db_service)
+        for table in ("project_classifications", "investments", "projects"):
+            db_service.execute_query(f"DELETE FROM {table}")
+        return stored
+
+    expected = import_all(".xlsx")
+    assert [row[0] for row in expected["projects"]] == ["007", "P2"]
+    assert import_all(extension) == expected
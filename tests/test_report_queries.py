@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+
+def _load_portfolio(db_service):
+    db_service.save_projects_batch([
+        ("P1", "North", "Ops", "First", None),
+        ("P2", "South", "Ops", "Second", None),
+    ])
+    db_service.save_investments_batch([("P1", 2024, 100.0), ("P1", 2025, 50.0), ("P2", 2025, 80.0)])
+    db_service.execute_query(
+        "INSERT INTO calculated_depreciations (project_id, year, depreciation_value, remaining_value) VALUES "
+        "('P1', 2024, 10, 90), ('P1', 2026, 9, 81), ('P2', 2025, 8, 72)"
+    )
+
+
+def _plain(batches):
+    return [
+        (project_id, int(year), float(investment), float(depreciation))
+        for batch in batches
+        for project_id, year, investment, depreciation in batch
+    ]
+
+
+EXPECTED_ROWS = [
+    ("P1", 2024, 100.0, 10.0),
+    ("P1", 2025, 50.0, 0.0),
+    ("P1", 2026, 0.0, 9.0),
+    ("P2", 2025, 80.0, 8.0),
+]
+
+
+def test_iter_depreciation_reports_keyset_pages(db_service):
+    _load_portfolio(db_service)
+    assert _plain(db_service.iter_depreciation_reports(batch_size=2)) == EXPECTED_ROWS
+
+
+def test_iter_depreciation_reports_server_side_cursor(db_service):
+    _load_portfolio(db_service)
+    assert _plain(db_service.iter_depreciation_reports(batch_size=3, use_cursor=True)) == EXPECTED_ROWS
+
+
+def test_report_totals_by_year_stop_at_last_year(db_service):
+    _load_portfolio(db_service)
+    rows = db_service.get_report_totals(last_year=2025, by_year=True)
+    assert [
+        (row["project_id"], int(row["year"]), float(row["investment_amount"]), float(row["depreciation_value"]))
+        for row in rows
+    ] == [("P1", 2024, 100.0, 10.0), ("P1", 2025, 50.0, 0.0), ("P2", 2025, 80.0, 8.0)]
+    assert all(isinstance(row["investment_amount"], (int, float, Decimal)) for row in rows)
+
+
+def test_generate_report_transform_pivots_years(db_service, monkeypatch):
+    from services import project_service
+    from services.project_service import ProjectService
+
+    _load_portfolio(db_service)
+    monkeypatch.setattr(project_service, "DatabaseService", lambda: db_service)
+    report = ProjectService.generate_report(transform=True, last_year=2025, output_file=None)
+
+    assert list(report.index.get_level_values("project_id")) == ["P1", "P2"]
+    assert report.loc["P1"][("investment_amount", 2025)].iloc[0] == 50.0
+    assert report.loc["P2"][("depreciation_value", 2025)].iloc[0] == 8.0
+    assert 2026 not in report.columns.get_level_values("year")
+
+
+def _load_classified_portfolio(db_service):
+    db_service.save_projects_batch([
+        ("P1", "North", "Ops", "First", None),
+        ("P2", "South", "Ops", "Second", None),
+        ("P3", "South", "Maintenance", "Unclassified", None),
+    ])
+    db_service.execute_query("INSERT INTO classification_descriptions (classification_id, description) VALUES (1, 'High'), (2, 'Low')")
+    db_service.execute_query("INSERT INTO project_classifications (project_id, importance, type) VALUES ('P1', 1, 1), ('P2', 2, 1)")
+    # P3 is left out of the reports, so its years must not become report columns
+    db_service.save_investments_batch([("P1", 2024, 100.0), ("P2", 2025, 80.0), ("P3", 2030, 70.0)])
+    db_service.execute_query(
+        "INSERT INTO calculated_depreciations (project_id, year, depreciation_value, remaining_value) VALUES "
+        "('P1', 2024, 10, 90), ('P2', 2026, 8, 72), ('P3', 2031, 7, 63)"
+    )
+
+
+def _read_report(path, key_count):
+    report = pd.read_excel(path, index_col=list(range(key_count)))
+    report.columns = [int(column) for column in report.columns]
+    return report
+
+
+@pytest.mark.parametrize("report, key_count", [("depreciation", 3), ("importance", 4)])
+def test_streamed_reports_match_the_pandas_pivots(db_service, monkeypatch, tmp_path, report, key_count):
+    from services import project_service
+    from services.project_service import ProjectService
+
+    _load_classified_portfolio(db_service)
+    monkeypatch.setattr(project_service, "DatabaseService", lambda: db_service)
+    dimensions = ProjectService.get_portfolio_dimensions(db_service)
+    output_file = str(tmp_path / f"{report}.xlsx")
+    if report == "depreciation":
+        ProjectService.create_investment_depreciation_report(output_file)
+        data = pd.DataFrame(db_service.get_all_calculated_depreciations(), columns=["project_id", "year", "depreciation_value"])
+        expected = ProjectService.build_depreciation_report(dimensions, data)
+    else:
+        ProjectService.group_projects_by_importance(output_file)
+        data = pd.DataFrame(db_service.get_all_investments(), columns=["project_id", "year", "investment_amount"])
+        expected = ProjectService.build_importance_report(dimensions, data)
+
+    streamed = _read_report(output_file, key_count)
+    assert list(streamed.columns) == [int(year) for year in expected.columns]
+    assert streamed.to_numpy().tolist() == expected.to_numpy().tolist()
+    assert [tuple(map(str, key)) for key in streamed.index] == [tuple(map(str, key)) for key in expected.index]
@@ -0,0 +1,54 @@
+import pytest
+
+
+def _load_rows(db_service):
+    db_service.save_projects_batch([("P1", "North", "Ops", "First", None)])
+    db_service.execute_query(
+        "INSERT INTO calculated_depreciations (project_id, year, depreciation_value, remaining_value) VALUES "
+        "('P1', 2024, 10, 90), ('P1', 2025, 9, 81)"
+    )
+
+
+def test_compact_requires_compact_storage(db_service):
+    _load_rows(db_service)
+    with pytest.raises(ValueError):
+        db_service.compact_calculated_depreciations()
+    assert len(db_service.execute_query("SELECT * FROM calculated_depreciations", fetch=True)) == 2
+
+
+def test_compact_moves_rows_in_one_transaction(db_service, monkeypatch):
+    _load_rows(db_service)
+    monkeypatch.setattr(db_service, "result_storage", "compact")
+
+    def fail(results):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(db_service, "save_calculated_depreciation_arrays", fail)
+    with pytest.raises(RuntimeError):
+        db_service.compact_calculated_depreciations()
+    assert len(db_service.execute_query("SELECT * FROM calculated_depreciations", fetch=True)) == 2
+
+    monkeypatch.undo()
+    monkeypatch.setattr(db_service, "result_storage", "compact")
+    assert db_service.compact_calculated_depreciations() == 1
+    assert db_service.execute_query("SELECT * FROM calculated_depreciations", fetch=True) == []
+    assert [(int(row["year"]), float(row["depreciation_value"])) for row in db_service.get_calculated_depreciations("P1")] == [(2024, 10.0), (2025, 9.0)]
+
+
+def test_diff_refuses_compacted_runs(db_service):
+    db_service.save_projects_batch([("P1", "North", "Ops", "First", None)])
+    run_ids = []
+    for value in (10.0, 12.0, 12.0):
+        run_id = db_service.start_calculation_run()
+        db_service.save_calculation_run_results(run_id, [("P1", 2024, value, 100.0 - value)])
+        db_service.finish_calculation_run(run_id, 0.1, 1)
+        run_ids.append(run_id)
+
+    assert [row["project_id"] for row in db_service.diff_calculation_runs(run_ids[0], run_ids[1])] == ["P1"]
+    assert db_service.compact_calculation_runs(keep_last=2) == [run_ids[0]]
+
+    assert db_service.diff_calculation_runs(run_ids[1], run_ids[2]) == []
+    with pytest.raises(ValueError, match="compacted"):
+        db_service.diff_calculation_runs(run_ids[0], run_ids[2])
+    with pytest.raises(ValueError, match="compacted"):
+        db_service.diff_calculation_run_projects(run_ids[2], run_ids[0])
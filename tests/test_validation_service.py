@@ -0,0 +1,71 @@
+import pandas as pd
+
+
+def _loop_depreciation_year_batch(df):
+    # The per-row parser the validation stage replaced, kept as the reference
+    depreciation_years_data = []
+    for _, row in df.astype({"project_id": str}).iterrows():
+        depreciation_years = row['depreciation_years']
+        if pd.isna(depreciation_years):
+            depreciation_years = []
+        elif isinstance(depreciation_years, str):
+            depreciation_years = [int(y.strip()) for y in depreciation_years.split(';') if y.strip().isdigit()]
+        elif isinstance(depreciation_years, int):
+            depreciation_years = [depreciation_years]
+        for depreciation_year in depreciation_years:
+            depreciation_years_data.append((row['project_id'], depreciation_year, depreciation_year))
+    return depreciation_years_data
+
+
+def _stored_start_years(db_service):
+    rows = db_service.execute_query("SELECT project_id, year, depreciation_start_year FROM investments ORDER BY project_id, year", fetch=True)
+    return [tuple(row.values()) for row in rows]
+
+
+def test_depreciation_years_validation_matches_the_row_parser(db_service, monkeypatch):
+    from services.project_service import ProjectService
+    from services.validation_service import ValidationService
+
+    db_service.save_projects_batch([(project_id, "North", "Ops", project_id, None) for project_id in ("P1", "P2", "P3")])
+    db_service.save_investments_batch([(project_id, year, 100.0) for project_id in ("P1", "P2", "P3") for year in (2024, 2025)])
+    df = pd.DataFrame({
+        "project_id": ["P1", "P2", "P3", "P9", "P1", ""],
+        "depreciation_years": ["2024; 2025;", 2025, "2024;abc", "2024", None, "2025"],
+    }, dtype=object)
+
+    valid, rejections = ValidationService.validate("depreciation_years", df, {"P1", "P2", "P3"})
+
+    # Rows the old parser silently cut short or that reference no project are reported instead
+    assert [tuple(rejection) for rejection in rejections[["row", "project_id", "column", "reason"]].itertuples(index=False)] == [
+        (5, "", "project_id", "missing project_id"),
+        (3, "P9", "project_id", "unknown project_id"),
+        (2, "P3", "depreciation_years", "invalid depreciation year"),
+    ]
+    assert ProjectService.prepare_depreciation_year_batch(valid) == _loop_depreciation_year_batch(df.loc[valid.index])
+
+    # The import entry point creates its own DatabaseService
+    monkeypatch.setenv("DATABASE_URL", db_service.db_url)
+    ProjectService.create_depreciation_years_from_dataframe(df)
+    imported = _stored_start_years(db_service)
+    db_service.execute_query("UPDATE investments SET depreciation_start_year = NULL")
+    db_service.save_depreciation_years_batch(_loop_depreciation_year_batch(df.loc[valid.index]))
+    assert imported == _stored_start_years(db_service)
+    assert imported == [("P1", 2024, 2024), ("P1", 2025, 2025), ("P2", 2024, None), ("P2", 2025, 2025), ("P3", 2024, None), ("P3", 2025, None)]
+
+
+def test_validation_reports_rejected_investments_and_start_years():
+    from services.validation_service import ValidationService
+
+    investments = pd.DataFrame({"project_id": [" P1 ", "P1", 7], "2024": [10.0, "ten", 5.0], "1850": [1.0, 2.0, 3.0]})
+    valid, rejections = ValidationService.validate("investments", investments, {"P1", "7"})
+    assert list(valid.columns) == ["project_id", "2024"]
+    assert valid["project_id"].tolist() == ["P1", "7"]
+    assert rejections[["row", "column", "reason"]].values.tolist() == [
+        [None, "1850", "year out of range"],
+        [1, "2024", "investment amount is not a number"],
+    ]
+
+    start_years = pd.DataFrame({"project_id": ["P1", "P1"], "year": [2024, 2025], "depreciation_start_year": [[2024, 2026], [3000]]})
+    valid, rejections = ValidationService.validate("depreciation_start_years", start_years, {"P1"})
+    assert valid["depreciation_start_year"].tolist() == [2024, 2026]
+    assert rejections[["row", "column", "value"]].values.tolist() == [[1, "depreciation_start_year", 3000]]